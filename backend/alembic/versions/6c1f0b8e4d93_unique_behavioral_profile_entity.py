@@ -0,0 +1,34 @@
+"""Unique BehavioralProfile per entity
+
+Revision ID: 6c1f0b8e4d93
+Revises: a3e9d5f1c27b
+Create Date: 2026-10-18 18:05:44.217630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c1f0b8e4d93'
+down_revision: Union[str, None] = 'a3e9d5f1c27b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Concurrent first logins could insert a second profile for the same
+    # entity; keep the oldest row, which is the one every reader used
+    op.execute(
+        "DELETE FROM behavioral_profiles WHERE id NOT IN ("
+        "SELECT MIN(id) FROM behavioral_profiles GROUP BY org_id, entity_type, entity_id)"
+    )
+    with op.batch_alter_table('behavioral_profiles') as batch_op:
+        batch_op.create_unique_constraint('uq_behavioral_profiles_entity', ['org_id', 'entity_type', 'entity_id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('behavioral_profiles') as batch_op:
+        batch_op.drop_constraint('uq_behavioral_profiles_entity', type_='unique')
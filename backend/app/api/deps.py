@@ -6,6 +6,7 @@ from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core import security
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.token import TokenPayload
@@ -22,33 +23,52 @@ async def get_current_user(
     db: AsyncSession = Depends(get_db),
     token: str = Depends(reusable_oauth2)
 ) -> User:
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
-    except (JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Could not validate credentials",
-        )
-    
-    result = await db.execute(select(User).where(User.id == int(token_data.sub)))
-    user = result.scalars().first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if not user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
+    """
+    The authenticated user, usually served from principal_cache.
+
+    The returned User is a detached copy of the cached column snapshot, not
+    a row of `db`: read its columns freely, but do not lazy-load
+    relationships and do not `db.add()` it. To modify the user, select it
+    again through the session.
+    """
+    # Warm path: cached principal, no JWT verification and no queries
+    cache_key = principal_cache.key(token)
+    principal = principal_cache.get(cache_key)
+
+    if principal is None:
+        generation = principal_cache.generation
+        try:
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+            token_data = TokenPayload(**payload)
+        except (JWTError, ValidationError):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
+        
+        result = await db.execute(select(User).where(User.id == int(token_data.sub)))
+        user = result.scalars().first()
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        if not user.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
+
+        principal = principal_cache.put(cache_key, payload, user, generation)
+
+    # Handlers read principal.org via check_subscription_active
+    request.state.principal = principal
 
     # IP Check
     client_ip = request.client.host
-    # Check if blocked
+    # Check if blocked (in-memory index, no query)
     from app.services.defense import defense_service
-    if await defense_service.is_ip_blocked(db, user.organization_id, client_ip):
+    if await defense_service.is_ip_blocked(db, principal.org_id, client_ip):
         raise HTTPException(status_code=403, detail="Access Denied: IP Blocked by Security Policy")
 
-    return user
+    return principal.user()
 
 async def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
@@ -1,25 +1,34 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from app.api import deps
 from app.models.user import User
 from app.models.organization import Organization
 from app.core.subscriptions import get_plan_features, SubscriptionTier
+from app.core.principal_cache import principal_cache
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from sqlalchemy import select
 
 async def check_subscription_active(
+    request: Request,
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Organization:
     """
     Dependency to verify if the organization's subscription/trial is active.
     """
-    result = await db.execute(select(Organization).where(Organization.id == current_user.organization_id))
-    org = result.scalars().first()
+    # The org snapshot rides on the cached principal after the first load
+    principal = getattr(request.state, "principal", None)
+    org = principal.org() if principal is not None else None
+
+    if org is None:
+        result = await db.execute(select(Organization).where(Organization.id == current_user.organization_id))
+        org = result.scalars().first()
     
-    if not org:
-        raise HTTPException(status_code=404, detail="Organization not found")
+        if not org:
+            raise HTTPException(status_code=404, detail="Organization not found")
+        if principal is not None:
+            principal_cache.attach_org(principal, org)
 
     # Check Trial Expiry
     if org.subscription_plan == SubscriptionTier.TRIAL:
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_db, get_current_user
-from app.services.anomaly import AnomalyService
+from app.api.deps import get_db, get_current_user, get_current_active_superuser
+from app.services.anomaly import AnomalyService, ANOMALY_DETECTORS, BaselineConflict
 from app.models.user import User
+from app.models.organization import Organization
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -31,24 +32,43 @@ async def analyze_login(
     # Use current time if not provided
     ts = request.timestamp or datetime.utcnow()
     
-    # 1. Detect
-    result = await service.detect_login_anomaly(
-        org_id=current_user.org_id,
-        user_id=request.user_id,
-        login_time=ts,
-        ip_address=request.ip_address
-    )
-    
-    # 2. Update Baseline (Async mostly, but for now sync to ensure data flow)
-    await service.update_login_baseline(
-        org_id=current_user.org_id,
-        user_id=request.user_id,
-        login_time=ts,
-        ip_address=request.ip_address
-    )
+    # Detect and update the baseline in one transaction
+    try:
+        result = await service.analyze_and_learn(
+            org_id=current_user.organization_id,
+            user_id=request.user_id,
+            login_time=ts,
+            ip_address=request.ip_address
+        )
+    except BaselineConflict:
+        raise HTTPException(status_code=409, detail="Baseline is being updated concurrently, retry")
     
     return result
 
+class DetectorRequest(BaseModel):
+    detector: str
+
+@router.put("/detector", status_code=200)
+async def set_detector(
+    request: DetectorRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Select the login-time anomaly detector for the current organization.
+    """
+    if current_user.role not in ["super_admin", "org_admin"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if request.detector not in ANOMALY_DETECTORS:
+        raise HTTPException(status_code=400, detail=f"Unknown detector. Choose one of: {', '.join(ANOMALY_DETECTORS)}")
+
+    org = await db.get(Organization, current_user.organization_id)
+    if not org:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    org.anomaly_detector = request.detector
+    await db.commit()
+    return {"detector": org.anomaly_detector}
+
 @router.post("/train/simulate", status_code=200)
 async def simulate_training_data(
     current_user: User = Depends(get_current_user),
@@ -65,10 +85,55 @@ async def simulate_training_data(
         # Vary slightly
         ts = base_time.replace(minute=i % 60)
         await service.update_login_baseline(
-            org_id=current_user.org_id,
+            org_id=current_user.organization_id,
             user_id=current_user.id,
             login_time=ts,
             ip_address="127.0.0.1"
         )
         
     return {"message": "Simulated 30 normal logins for baseline."}
+
+@router.get("/models/stats")
+async def get_model_stats(
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Fitted-model cache hit ratio, memory use and fit-time histogram.
+    """
+    from app.services.model_registry import model_registry
+    return model_registry.stats()
+
+@router.get("/features/stats")
+async def get_feature_store_stats(
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Per-entity feature store occupancy and evictions.
+    """
+    from app.services.feature_store import feature_store
+    return feature_store.stats()
+
+@router.get("/features/{entity_type}/{entity_id}")
+async def get_entity_features(
+    entity_type: str,
+    entity_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Live behavioral aggregates of one user ("user"), monitored account ("account") or source IP ("ip").
+    """
+    from app.services.feature_store import feature_store
+    features = feature_store.get(current_user.organization_id, entity_type, entity_id)
+    if features is None:
+        raise HTTPException(status_code=404, detail="No features recorded for this entity")
+    return features.snapshot()
+
+@router.get("/peer-groups/stats")
+async def get_peer_group_stats(
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Loaded peer-group cohorts: members and distinct network prefixes per cohort.
+    """
+    from app.services.peer_groups import peer_groups
+    return peer_groups.stats()
@@ -51,7 +51,7 @@ async def google_login(
     # 3. Issue Token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        user.id, expires_delta=access_token_expires
+        user.id, expires_delta=access_token_expires, org_id=user.organization_id
     )
     return {
         "access_token": access_token, 
@@ -144,7 +144,7 @@ async def login_verify(
     # Issue Token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        user.id, expires_delta=access_token_expires
+        user.id, expires_delta=access_token_expires, org_id=user.organization_id
     )
     return {
         "access_token": access_token, 
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_current_user, get_current_active_superuser
 from app.api.v1.deps_subscription import check_subscription_active
 from app.models.defense_rule import DefenseRule
 from app.services.defense import BlockedIP
@@ -75,3 +75,13 @@ async def get_blocked_ips(
         select(BlockedIP).where(BlockedIP.organization_id == org.id)
     )
     return result.scalars().all()
+
+@router.get("/middleware/stats")
+async def get_middleware_stats(
+    current_user = Depends(get_current_active_superuser)
+):
+    """
+    DefenseMiddleware latency histogram and block counters.
+    """
+    from app.middleware.defense import defense_metrics
+    return defense_metrics.snapshot()
@@ -1,13 +1,20 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from app.api import deps
 from app.api.v1.deps_subscription import check_subscription_active, require_feature
 from app.models.user import User
-from app.models.email_event import EmailEvent
+from app.models.email_event import EmailCampaign, EmailEvent
 from app.services.email_detection import email_detector
+from app.services.email_batch import email_batch_analyzer, ingest_mailbox
+from app.services.email_campaigns import campaign_tracker
+from app.services.mail_parser import MAIL_FORMATS, guess_mail_format, iter_mail
 from app.db.session import get_db
+from app.core.event_sink import event_sink
+from app.core.config import settings
+from datetime import datetime
 
 router = APIRouter()
 
@@ -18,6 +25,9 @@ class EmailIngest(BaseModel):
     body: str
     links: List[str] = []
 
+class EmailBatchIngest(BaseModel):
+    messages: List[EmailIngest]
+
 @router.post("/ingest", status_code=201)
 async def ingest_email(
     email_data: EmailIngest,
@@ -31,27 +41,164 @@ async def ingest_email(
     Ingest and analyze an email.
     """
     # 1. Detect
-    attack_type, confidence, severity = email_detector.analyze_email(
+    verdict = email_detector.analyze_email(
         sender=email_data.sender,
         subject=email_data.subject,
         body=email_data.body,
         links=email_data.links
     )
+
+    # 1b. Near-duplicates of a detected campaign share its verdict
+    (attack_type, confidence, severity), campaign_id = campaign_tracker.observe(
+        org.id, email_data.sender, email_data.subject, email_data.body, verdict
+    )
     
     # 2. Store if malicious (or even if clean, depending on policy. storing only attacks for now)
     if attack_type:
-        event = EmailEvent(
-            organization_id=org.id,
-            sender_email=email_data.sender,
-            recipient_email=email_data.recipient,
-            subject=email_data.subject,
-            body_snippet=email_data.body[:200],
-            attack_type=attack_type,
-            confidence_score=confidence,
-            severity=severity
-        )
-        db.add(event)
-        await db.commit()
-        return {"status": "detected", "type": attack_type, "severity": severity}
+        await event_sink.put(EmailEvent, {
+            "organization_id": org.id,
+            "sender_email": email_data.sender,
+            "recipient_email": email_data.recipient,
+            "subject": email_data.subject,
+            "body_snippet": email_data.body[:200],
+            "attack_type": attack_type,
+            "confidence_score": confidence,
+            "severity": severity,
+            "detected_at": datetime.utcnow(),
+            "campaign_id": campaign_id
+        })
+        return {"status": "detected", "type": attack_type, "severity": severity, "campaign_id": campaign_id}
     
     return {"status": "clean"}
+
+@router.post("/ingest/batch", status_code=201)
+async def ingest_email_batch(
+    batch: EmailBatchIngest,
+    org = Depends(check_subscription_active)
+) -> Any:
+    """
+    Ingest and analyze a burst of emails (e.g. a gateway flush). Analysis
+    runs on a process pool in chunks; messages are then grouped into
+    campaigns and the detected ones stored with one bulk insert. Returns one
+    result per message, in order.
+    """
+    if len(batch.messages) > settings.EMAIL_BATCH_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.EMAIL_BATCH_MAX_MESSAGES} messages per batch"
+        )
+
+    verdicts = await email_batch_analyzer.analyze([
+        (m.sender, m.subject, m.body, m.links) for m in batch.messages
+    ])
+
+    now = datetime.utcnow()
+    records = []
+    results = []
+    for message, verdict in zip(batch.messages, verdicts):
+        (attack_type, confidence, severity), campaign_id = campaign_tracker.observe(
+            org.id, message.sender, message.subject, message.body, verdict, now
+        )
+        if attack_type:
+            records.append({
+                "organization_id": org.id,
+                "sender_email": message.sender,
+                "recipient_email": message.recipient,
+                "subject": message.subject,
+                "body_snippet": message.body[:200],
+                "attack_type": attack_type,
+                "confidence_score": confidence,
+                "severity": severity,
+                "detected_at": now,
+                "campaign_id": campaign_id
+            })
+            results.append({"status": "detected", "type": attack_type, "severity": severity,
+                            "campaign_id": campaign_id})
+        else:
+            results.append({"status": "clean"})
+
+    if records:
+        await event_sink.put_many(EmailEvent, records)
+    return {"received": len(results), "detected": len(records), "results": results}
+
+@router.post("/ingest/file", status_code=201)
+async def ingest_email_file(
+    mail_format: Optional[str] = Form(None, alias="format"),
+    file: UploadFile = File(...),
+    org = Depends(check_subscription_active)
+) -> Any:
+    """
+    Ingest a raw RFC 822 message (.eml) or an mbox archive. The upload is
+    parsed incrementally: links come from the text and HTML parts,
+    attachments are SHA-256 hashed and dropped as each part is read, and
+    only capped text is kept per message. The format is guessed from the file name
+    unless given ("eml" or "mbox").
+    """
+    fmt = mail_format or guess_mail_format(file.filename)
+    if fmt not in MAIL_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{fmt}', expected one of {list(MAIL_FORMATS)}")
+    stats = await ingest_mailbox(org.id, iter_mail(file.file, fmt))
+    return {"format": fmt, **stats}
+
+def _campaign_summary(campaign: EmailCampaign) -> dict:
+    return {
+        "id": campaign.id,
+        "attack_type": campaign.attack_type,
+        "severity": campaign.severity,
+        "confidence_score": campaign.confidence_score,
+        "message_count": campaign.message_count,
+        "sender_email": campaign.sender_email,
+        "subject": campaign.subject,
+        "first_seen": campaign.first_seen,
+        "last_seen": campaign.last_seen,
+    }
+
+@router.get("/campaigns")
+async def get_email_campaigns(
+    limit: int = 50,
+    db: AsyncSession = Depends(get_db),
+    org = Depends(check_subscription_active)
+) -> Any:
+    """
+    Phishing campaigns (clusters of near-identical detected mail), most
+    recently active first. Counts trail ingest by up to
+    EMAIL_CAMPAIGN_FLUSH_SECONDS.
+    """
+    res = await db.execute(
+        select(EmailCampaign)
+        .where(EmailCampaign.organization_id == org.id)
+        .order_by(EmailCampaign.last_seen.desc())
+        .limit(limit)
+    )
+    return [_campaign_summary(c) for c in res.scalars().all()]
+
+@router.get("/campaigns/{campaign_id}")
+async def get_email_campaign(
+    campaign_id: str,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db),
+    org = Depends(check_subscription_active)
+) -> Any:
+    """
+    One campaign and its most recent stored messages.
+    """
+    campaign = await db.get(EmailCampaign, campaign_id)
+    if campaign is None or campaign.organization_id != org.id:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    res = await db.execute(
+        select(EmailEvent)
+        .where(EmailEvent.campaign_id == campaign_id, EmailEvent.organization_id == org.id)
+        .order_by(EmailEvent.detected_at.desc())
+        .limit(limit)
+    )
+    messages = [{
+        "id": e.id,
+        "sender_email": e.sender_email,
+        "recipient_email": e.recipient_email,
+        "subject": e.subject,
+        "attack_type": e.attack_type,
+        "severity": e.severity,
+        "confidence_score": e.confidence_score,
+        "detected_at": e.detected_at,
+    } for e in res.scalars().all()]
+    return {**_campaign_summary(campaign), "messages": messages}
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
-from typing import Dict, List, Any
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
+from typing import Dict, List, Any, Optional
 from pydantic import BaseModel
 from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.models.user import User
+from app.services.anomaly import AnomalyService, ANOMALY_DETECTORS
+
+MAX_ANOMALY_BATCH = 50000
 
 router = APIRouter()
 
@@ -17,13 +21,7 @@ class BrandMonitorService:
             {"domain": f"{brand_name}.co.xyz", "risk": "medium", "type": "squatting"}
         ]
 
-class MLService:
-    async def detect_anomalies(self, data_points: List[dict]):
-        # Mock advanced ML
-        return {"anomaly_score": 0.05, "verdict": "clean"}
-
 brand_service = BrandMonitorService()
-ml_service = MLService()
 
 # --- Endpoints ---
 
@@ -38,10 +36,32 @@ async def scan_brand(
     results = await brand_service.scan_brand(request.brand_name)
     return {"status": "complete", "findings": results}
 
+class LoginRecord(BaseModel):
+    user_id: int
+    ip_address: str
+    timestamp: datetime
+
 @router.post("/ml/anomaly-check")
 async def check_anomalies(
-    events: List[Dict[str, Any]],
-    current_user: User = Depends(deps.get_current_user)
+    events: List[LoginRecord],
+    detector: Optional[str] = None,
+    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_db)
 ):
-    result = await ml_service.detect_anomalies(events)
-    return result
+    """
+    Bulk-scores login records against the org's current behavioral baselines
+    (read-only). Results are returned per record, in request order.
+    """
+    if len(events) > MAX_ANOMALY_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_ANOMALY_BATCH} records")
+    if detector and detector not in ANOMALY_DETECTORS:
+        raise HTTPException(status_code=400, detail=f"Unknown detector. Choose one of: {', '.join(ANOMALY_DETECTORS)}")
+
+    results = await AnomalyService(db).score_logins_bulk(
+        current_user.organization_id, [e.model_dump() for e in events], detector
+    )
+    return {
+        "count": len(results),
+        "anomalies": sum(1 for r in results if r["is_anomaly"]),
+        "results": results
+    }
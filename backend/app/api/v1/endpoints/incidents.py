@@ -1,17 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import String, cast, func
 from datetime import datetime, timedelta
 from app.api.deps import get_db, get_current_user
 from app.services.kill_chain import KillChainService
 from app.models.incident import Incident
 from app.models.user import User
 from app.models.web_event import WebEvent
-from app.models.email_event import EmailEvent
+from app.models.email_event import EmailCampaign, EmailEvent
 
 router = APIRouter()
 
+# Email threats count once per campaign; messages without one count alone
+_EMAIL_THREAT = func.coalesce(EmailEvent.campaign_id, cast(EmailEvent.id, String))
+
 @router.post("/correlate", status_code=200)
 async def trigger_correlation(
     current_user: User = Depends(get_current_user),
@@ -52,9 +55,9 @@ async def get_dashboard_stats(
     )
     web_threat_count = res_web_threats.scalar() or 0
     
-    # Email Threats
+    # Email Threats (campaigns, not individual messages)
     res_email_threats = await db.execute(
-        select(func.count(EmailEvent.id)).where(
+        select(func.count(func.distinct(_EMAIL_THREAT))).where(
             EmailEvent.detected_at >= last_24h,
             EmailEvent.severity.in_(["high", "critical"])
         )
@@ -72,7 +75,7 @@ async def get_dashboard_stats(
         )
     )
     res_crit_email = await db.execute(
-        select(func.count(EmailEvent.id)).where(
+        select(func.count(func.distinct(_EMAIL_THREAT))).where(
             EmailEvent.detected_at >= last_24h,
             EmailEvent.severity == "critical"
         )
@@ -124,8 +127,14 @@ async def get_dashboard_stats(
     )
     recent_web = res_recent_web.scalars().all()
     
+    # Email shows up as campaigns; only messages outside any campaign appear alone
+    res_recent_campaigns = await db.execute(
+        select(EmailCampaign).order_by(EmailCampaign.last_seen.desc()).limit(5)
+    )
+    recent_campaigns = res_recent_campaigns.scalars().all()
+
     res_recent_email = await db.execute(
-        select(EmailEvent).where(EmailEvent.attack_type.isnot(None))
+        select(EmailEvent).where(EmailEvent.attack_type.isnot(None), EmailEvent.campaign_id.is_(None))
         .order_by(EmailEvent.detected_at.desc()).limit(5)
     )
     recent_email = res_recent_email.scalars().all()
@@ -150,6 +159,16 @@ async def get_dashboard_stats(
             "severity": e.severity,
             "time": e.detected_at.strftime("%H:%M")
         })
+    for c in recent_campaigns:
+        combined_feed.append({
+            "id": f"campaign-{c.id}",
+            "type": c.attack_type,
+            "target": f"{c.message_count} messages",
+            "ip": c.sender_email,
+            "severity": c.severity,
+            "time": c.last_seen.strftime("%H:%M"),
+            "count": c.message_count
+        })
         
     # Sort by time desc
     combined_feed.sort(key=lambda x: x['time'], reverse=True)
@@ -1,15 +1,19 @@
 import logging
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.api.deps import get_db
+from app.api.deps import get_db, get_current_active_superuser
 from app.core import security
+from app.core.hashing import password_hasher, HashingBusy
 from app.core.config import settings
 from app.models.user import User
 from app.schemas.token import Token
+from app.services.attribution import attribution_service
+from app.services.feature_store import feature_store
+from app.services.fingerprint import FingerprintService
 
 # Setup Logging
 logger = logging.getLogger(__name__)
@@ -19,6 +23,7 @@ router = APIRouter()
 
 @router.post("/login", response_model=Token)
 async def login_access_token(
+    request: Request,
     db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
@@ -37,21 +42,40 @@ async def login_access_token(
 
     logger.info("User found — verifying password")
 
-    # 2. Password Verification (Argon2)
-    if not security.verify_password(form_data.password, user.hashed_password):
+    # 2. Password Verification (Argon2, off the event loop)
+    try:
+        verified = await password_hasher.verify(form_data.password, user.hashed_password)
+    except HashingBusy as e:
+        logger.warning("Password hashing capacity exhausted — shedding login")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Login temporarily unavailable, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    client_ip = request.client.host if request.client else None
+    if not verified:
         logger.warning("Password verification failed")
+        feature_store.record_login(user.organization_id, "user", user.id, datetime.utcnow(), client_ip, success=False)
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
     if not user.is_active:
         logger.warning("User is inactive")
         raise HTTPException(status_code=400, detail="Inactive user")
 
+    # Feed the per-user feature store read by anomaly and risk scoring
+    user_agent = request.headers.get("user-agent")
+    feature_store.record_login(
+        user.organization_id, "user", user.id, datetime.utcnow(), client_ip, success=True,
+        device=FingerprintService.generate_hash(user_agent, client_ip) if user_agent and client_ip else None,
+        country=attribution_service.get_ip_details(client_ip).get("country") if client_ip else None
+    )
+
     logger.info("Password verified — generating JWT")
 
     # 3. JWT Generation
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        user.id, expires_delta=access_token_expires
+        user.id, expires_delta=access_token_expires, org_id=user.organization_id
     )
     
     logger.info("Login successful — token issued")
@@ -60,3 +84,12 @@ async def login_access_token(
         "access_token": access_token,
         "token_type": "bearer"
     }
+
+@router.get("/hashing/stats")
+async def get_hashing_stats(
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Argon2 executor queue-wait and hash-time histograms.
+    """
+    return password_hasher.stats()
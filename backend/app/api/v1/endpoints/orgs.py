@@ -1,5 +1,5 @@
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.api import deps
@@ -31,10 +31,18 @@ async def invite_user(
          
     # Create simplified user (placeholder password, should send email in real app)
     # For Phase 0, we just create them with a default password "ChangeMe123!"
-    from app.core import security
+    from app.core.hashing import password_hasher, HashingBusy
+    try:
+        hashed_password = await password_hasher.hash("ChangeMe123!")
+    except HashingBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Invites temporarily unavailable, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     new_user = User(
         email=email,
-        hashed_password=security.get_password_hash("ChangeMe123!"),
+        hashed_password=hashed_password,
         organization_id=current_user.organization_id,
         role=role,
         is_active=True
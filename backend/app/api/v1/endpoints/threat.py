@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+import io
+from typing import Optional
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_user
 from app.services.threat import ThreatIntelService
+from app.services.feed_parsers import FEED_FORMATS, guess_format, parse_feed
 from app.models.user import User
 from pydantic import BaseModel
 
@@ -24,5 +27,61 @@ async def ingest_feed(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     service = ThreatIntelService(db)
-    await service.ingest_feed(request.source, request.indicators)
-    return {"message": f"Ingested {len(request.indicators)} indicators"}
+    stats = await service.ingest_feed(request.source, request.indicators)
+    return {"message": f"Ingested {stats['unique']} indicators", **stats}
+
+@router.post("/ingest/file", status_code=200)
+async def ingest_feed_file(
+    source: str = Form(...),
+    feed_format: Optional[str] = Form(None, alias="format"),
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Streaming ingest of an uploaded feed file: STIX 2.1 bundle ("stix"),
+    CSV ("csv") or one indicator per line ("txt"). The format is guessed
+    from the file name / content type unless given. The file is parsed
+    incrementally on a worker thread (the upload is read with blocking
+    I/O) and upserted in chunks, never held in memory whole.
+    """
+    if current_user.role not in ["super_admin", "admin"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    fmt = feed_format or guess_format(file.filename, file.content_type)
+    if fmt not in FEED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{fmt}', expected one of {list(FEED_FORMATS)}")
+
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        stats = await ThreatIntelService(db).ingest_stream(source, parse_feed(text, fmt))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed {fmt} feed: {e}")
+    finally:
+        text.detach()
+    return {"message": f"Ingested {stats['unique']} indicators", "format": fmt, **stats}
+
+@router.get("/index/stats")
+async def get_index_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    In-memory indicator index: entries per lookup structure and last full load.
+    """
+    if current_user.role not in ["super_admin", "admin"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    from app.services.threat_index import threat_index
+    return threat_index.stats()
+
+@router.post("/sweep")
+async def sweep_expired_indicators(
+    max_batches: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Run the expired-indicator sweep now instead of waiting for the
+    background interval. Removes (or archives) indicators past their TTL.
+    """
+    if current_user.role != "super_admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    from app.services.threat_aging import IndicatorSweeper
+    return await IndicatorSweeper().sweep(max_batches=max_batches)
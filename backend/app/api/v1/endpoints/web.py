@@ -1,17 +1,27 @@
-from typing import Any
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Any, List
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
 from app.api.v1.deps_subscription import check_subscription_active
 from app.core.websockets import manager
+from app.core.event_sink import event_sink
 from app.models.web_event import WebEvent
 from app.models.login_event import LoginEvent
-from app.services.web_detection import web_detector
+from app.services.web_detection import web_detector, login_detector
+from app.services.feature_store import feature_store
 from app.db.session import get_db
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 router = APIRouter()
 
+# Upper bound on events accepted in one batch request.
+MAX_WEB_BATCH = 10000
+# Checked before a batch body is read or parsed; ~3 KB per event at MAX_WEB_BATCH
+MAX_WEB_BATCH_BYTES = 32 * 1024 * 1024
+
 class WebLog(BaseModel):
     url: str
     method: str
@@ -31,7 +41,7 @@ async def log_web_event(
     org = Depends(check_subscription_active)
 ):
     attack_type, severity = web_detector.detect_web_attack(
-        event_in.method, event_in.url, event_in.user_agent, event_in.payload
+        event_in.method, event_in.url, event_in.user_agent, event_in.payload, ip=event_in.ip
     )
     
     if attack_type: # Only log attacks? Roadmap says "Watch everything... It constantly monitors".
@@ -40,17 +50,20 @@ async def log_web_event(
         # For data volume in Phase 0, let's log everything but highlight attacks.
         pass
 
-    event = WebEvent(
-        organization_id=org.id,
-        source_ip=event_in.ip,
-        target_url=event_in.url,
-        method=event_in.method,
-        user_agent=event_in.user_agent,
-        attack_type=attack_type,
-        severity=severity
-    )
-    db.add(event)
-    await db.commit()
+    received_at = datetime.utcnow()
+    feature_store.record_request(org.id, "ip", event_in.ip, received_at)
+
+    # Persisted by the write-behind sink; we return once detection is done.
+    await event_sink.put(WebEvent, {
+        "organization_id": org.id,
+        "source_ip": event_in.ip,
+        "target_url": event_in.url,
+        "method": event_in.method,
+        "user_agent": event_in.user_agent,
+        "attack_type": attack_type,
+        "severity": severity,
+        "timestamp": received_at
+    })
     
     if attack_type:
         await manager.broadcast({
@@ -62,6 +75,106 @@ async def log_web_event(
         
     return {"status": "logged", "attack": attack_type}
 
+def _parse_web_batch(raw: bytes, content_type: str) -> List[WebLog]:
+    """
+    Accepts a JSON array of WebLog objects or NDJSON (one object per line).
+    Oversized bodies are rejected before they are parsed.
+    """
+    if len(raw) > MAX_WEB_BATCH_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch body exceeds {MAX_WEB_BATCH_BYTES} bytes")
+    try:
+        text = raw.decode("utf-8")
+        if "ndjson" in content_type or not text.lstrip().startswith("["):
+            lines = [line for line in text.splitlines() if line.strip()]
+            if len(lines) > MAX_WEB_BATCH:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_WEB_BATCH} events")
+            items = [json.loads(line) for line in lines]
+        else:
+            items = json.loads(text)
+    except ValueError as e:
+        # Includes UnicodeDecodeError for bodies that are not UTF-8
+        raise HTTPException(status_code=400, detail=f"Malformed batch body: {e}")
+
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Batch body must be a JSON array or NDJSON")
+    if len(items) > MAX_WEB_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_WEB_BATCH} events")
+
+    logs = []
+    for idx, item in enumerate(items):
+        try:
+            logs.append(WebLog.model_validate(item))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail={"index": idx, "errors": e.errors()})
+    return logs
+
+@router.post("/log/web/batch", status_code=201)
+async def log_web_events_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    org = Depends(check_subscription_active)
+):
+    """
+    Bulk ingest for reverse proxies: one auth check, one bulk enqueue to the
+    event sink (flushed as executemany INSERTs) and at most one websocket
+    broadcast per batch.
+    """
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_WEB_BATCH_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch body exceeds {MAX_WEB_BATCH_BYTES} bytes")
+    logs = _parse_web_batch(await request.body(), request.headers.get("content-type", ""))
+    if not logs:
+        return {"status": "logged", "count": 0, "attacks": 0}
+
+    received_at = datetime.utcnow()
+    verdicts = web_detector.detect_batch(
+        (e.method, e.url, e.user_agent, e.payload, e.ip) for e in logs
+    )
+
+    rows = [
+        {
+            "organization_id": org.id,
+            "source_ip": e.ip,
+            "target_url": e.url,
+            "method": e.method,
+            "user_agent": e.user_agent,
+            "attack_type": attack_type,
+            "severity": severity,
+            "timestamp": received_at,
+        }
+        for e, (attack_type, severity) in zip(logs, verdicts)
+    ]
+    await event_sink.put_many(WebEvent, rows)
+    for e in logs:
+        feature_store.record_request(org.id, "ip", e.ip, received_at)
+
+    attacks = [(e, v) for e, v in zip(logs, verdicts) if v[0]]
+    if attacks:
+        await manager.broadcast({
+            "type": "web_attack_batch",
+            "count": len(attacks),
+            "by_type": dict(Counter(v[0] for _, v in attacks)),
+            "by_severity": dict(Counter(v[1] for _, v in attacks)),
+            "top_ips": [ip for ip, _ in Counter(e.ip for e, _ in attacks).most_common(10)]
+        }, org.id)
+
+    return {
+        "status": "logged",
+        "count": len(logs),
+        "attacks": len(attacks),
+        "results": [{"attack": a, "severity": s} for a, s in verdicts]
+    }
+
+@router.get("/ingest/stats")
+async def get_ingest_stats(
+    current_user = Depends(deps.get_current_active_superuser)
+):
+    """
+    Write-behind sink counters: queue depth and flush latency, plus the
+    login window backend (Redis errors and in-process fallback use).
+    """
+    return {**event_sink.stats(), "login_windows": login_detector.stats()}
+
 @router.get("/events")
 async def get_web_events(
     limit: int = 50,
@@ -87,21 +200,34 @@ async def log_login_event(
     db: AsyncSession = Depends(get_db),
     org = Depends(check_subscription_active)
 ):
-    # Detect
-    # (Simple logic: if we had redis, we'd incr key)
-    
-    event = LoginEvent(
-        organization_id=org.id,
-        username_attempted=event_in.username,
-        source_ip=event_in.ip,
-        success=event_in.success,
-        attack_type=None, # Filled by detector if real logic exists
-        severity="low"
+    # Detect (sliding windows per IP and per username)
+    attack_type, severity = await login_detector.detect_login_anomaly(
+        event_in.username, event_in.success, event_in.ip, org_id=org.id
     )
-    db.add(event)
-    await db.commit()
+
+    received_at = datetime.utcnow()
+    feature_store.record_login(org.id, "account", event_in.username, received_at, event_in.ip, event_in.success)
+    feature_store.record_request(org.id, "ip", event_in.ip, received_at)
+
+    await event_sink.put(LoginEvent, {
+        "organization_id": org.id,
+        "username_attempted": event_in.username,
+        "source_ip": event_in.ip,
+        "success": event_in.success,
+        "attack_type": attack_type,
+        "severity": severity,
+        "timestamp": received_at
+    })
     
-    if not event_in.success:
+    if attack_type:
+        await manager.broadcast({
+            "type": "login_attack",
+            "attack_type": attack_type,
+            "severity": severity,
+            "username": event_in.username,
+            "ip": event_in.ip
+        }, org.id)
+    elif not event_in.success:
         # Simulate alerting for failed login
         await manager.broadcast({
             "type": "login_failed",
@@ -109,7 +235,7 @@ async def log_login_event(
             "ip": event_in.ip
         }, org.id)
 
-    return {"status": "logged"}
+    return {"status": "logged", "attack": attack_type}
 
 @router.websocket("/ws")
 async def websocket_endpoint(
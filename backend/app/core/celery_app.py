@@ -6,7 +6,8 @@ redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 celery_app = Celery(
     "worker",
     broker=redis_url,
-    backend=redis_url
+    backend=redis_url,
+    include=["app.services.baseline_backfill"]
 )
 
 celery_app.conf.update(
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Unified Cyber Defense Platform"
@@ -15,6 +15,69 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
     REDIS_URL: str = "redis://localhost:6379/0" # Will fail if no redis, but we can try
+
+    # In-memory blocklist: full reload interval to pick up other workers' blocks
+    BLOCKLIST_REFRESH_SECONDS: int = 60
+
+    # In-memory threat indicator index: full reload interval
+    THREAT_INDEX_REFRESH_SECONDS: int = 300
+    # Indicator aging: default lifetime after an indicator was last seen,
+    # per-source overrides (JSON in the env, e.g. {"abuse.ch": 7}), sweeper
+    # cadence and batch size, and whether expired rows are archived or deleted
+    THREAT_INDICATOR_TTL_DAYS: float = 30.0
+    THREAT_SOURCE_TTL_DAYS: Dict[str, float] = {}
+    THREAT_SWEEP_INTERVAL_SECONDS: int = 300
+    THREAT_SWEEP_BATCH_SIZE: int = 1000
+    THREAT_ARCHIVE_EXPIRED: bool = False
+
+    # Email rules (JSON in the env): phishing keywords and how many distinct
+    # ones flag a mail, link hosts flagged by domain suffix or TLD, and
+    # brand -> legitimate sender domains for spoofing checks
+    EMAIL_PHISHING_KEYWORDS: List[str] = ["reset password", "urgent", "verify account", "bank", "invoice"]
+    EMAIL_KEYWORD_THRESHOLD: int = 2
+    EMAIL_SUSPICIOUS_DOMAINS: List[str] = ["bit.ly", "tinyurl.com"]
+    EMAIL_SUSPICIOUS_TLDS: List[str] = ["xyz", "top"]
+    EMAIL_BRAND_DOMAINS: Dict[str, List[str]] = {"paypal": ["paypal.com"]}
+    # Batch email ingest: analysis worker processes, messages per worker
+    # task, and the largest batch accepted per request
+    EMAIL_BATCH_WORKERS: int = 4
+    EMAIL_BATCH_CHUNK_SIZE: int = 250
+    EMAIL_BATCH_MAX_MESSAGES: int = 10000
+    # Campaign clustering: MinHash permutations and LSH bands (rows per band
+    # = perms / bands), estimated similarity needed to join a campaign, how
+    # many clusters and how many hours of them stay in memory, and how often
+    # campaign rows are written
+    EMAIL_CAMPAIGN_NUM_PERM: int = 64
+    EMAIL_CAMPAIGN_BANDS: int = 16
+    EMAIL_CAMPAIGN_SIMILARITY: float = 0.5
+    EMAIL_CAMPAIGN_MAX_CLUSTERS: int = 50000
+    EMAIL_CAMPAIGN_WINDOW_HOURS: float = 72.0
+    EMAIL_CAMPAIGN_FLUSH_SECONDS: int = 10
+
+    # Authenticated-principal cache (token digest -> user/org snapshot)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
+    # Argon2 executor: concurrent hashes, callers allowed to wait, wait budget (s)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 2.0
+
+    # Fitted per-profile anomaly models (LRU by count and estimated bytes)
+    ANOMALY_MODEL_CACHE_MAX_ENTRIES: int = 5000
+    ANOMALY_MODEL_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    ANOMALY_MODEL_WORKERS: int = 2
+    # Logins folded into a baseline before its cached model is refit
+    ANOMALY_MODEL_REFIT_LOGINS: int = 10
+    # Store behavioral baselines as one packed base64 blob instead of plain JSON
+    BASELINE_BINARY_ENCODING: bool = False
+
+    # In-memory per-entity feature store (LRU-bounded entity count)
+    FEATURE_STORE_MAX_ENTITIES: int = 50000
+    # Full rebuild interval of per-org peer-group statistics (incremental in between)
+    PEER_GROUP_REFRESH_SECONDS: int = 900
+    # RMS z-score distance from the peer group at which a login is anomalous
+    PEER_DISTANCE_THRESHOLD: float = 2.0
     
     # Google Auth
     GOOGLE_CLIENT_ID: Optional[str] = None
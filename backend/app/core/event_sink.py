@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Queued by `stop()`; everything ahead of it is flushed before the task exits.
+_STOP = object()
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """Failures worth retrying as-is: lost connections, lock timeouts, an unreachable database."""
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    return isinstance(exc, (OperationalError, InterfaceError, ConnectionError, OSError, asyncio.TimeoutError))
+
+
+class EventSink:
+    """
+    Write-behind buffer for high-volume event tables (WebEvent, LoginEvent,
+    EmailEvent, AnomalyEvent).
+
+    Callers enqueue plain column dicts instead of ORM objects and return
+    immediately. A background task drains the queue and writes each table
+    with one executemany INSERT per flush. A flush happens when `batch_size`
+    records are waiting or `flush_interval` seconds have passed, whichever
+    comes first. The queue is bounded, so a slow database makes `put` wait
+    (backpressure) instead of growing memory without limit.
+
+    Each table is written and committed on its own, so one table's failure
+    does not cost the others their rows. Transient errors (connection lost,
+    database locked) are retried with exponential backoff, which also holds
+    producers back through the bounded queue. Any other error splits the
+    rows in half and writes each half separately, down to single rows, so
+    only the rows the database rejects are dropped (counted in `failed`).
+    Records should carry their own event time: rows land up to
+    `flush_interval` (longer while retrying) after they were queued.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 50000,
+        batch_size: int = 1000,
+        flush_interval: float = 0.5,
+        session_factory=AsyncSessionLocal,
+        max_retries: int = 8,
+        retry_backoff: float = 0.1,
+        max_retry_backoff: float = 5.0,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Counters
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+        self.retried = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._closing
+
+    async def start(self):
+        if self.running:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name="event-sink")
+
+    async def stop(self):
+        """
+        Stop accepting queued writes and flush everything already queued.
+        """
+        if not self.running:
+            return
+        # New puts write through from here on; the flusher drains up to _STOP.
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        # Producers that were blocked on a full queue land behind _STOP.
+        await asyncio.sleep(0)
+        await self._flush(self._drain_nowait(self.max_queue))
+
+    async def put(self, model: Type, record: Dict[str, Any]):
+        """
+        Enqueue one row. Waits while the queue is full.
+        Without a running flusher (scripts, tests) the row is written through.
+        """
+        if not self.running:
+            await self._flush([(model, record)])
+            return
+        await self._queue.put((model, record))
+        self.enqueued += 1
+
+    async def put_many(self, model: Type, records: Iterable[Dict[str, Any]]):
+        records = list(records)
+        if not self.running:
+            await self._flush([(model, r) for r in records])
+            return
+        for record in records:
+            await self._queue.put((model, record))
+        self.enqueued += len(records)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "flush_count": self.flush_count,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+        }
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                batch.extend(self._drain_nowait(self.batch_size - len(batch)))
+                if len(batch) >= self.batch_size or _STOP in batch:
+                    break
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [item for item in batch if item is not _STOP]
+            await self._flush(batch)
+
+    def _drain_nowait(self, limit: int) -> List[Tuple[Type, Dict[str, Any]]]:
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return items
+
+    async def _flush(self, batch: List[Tuple[Type, Dict[str, Any]]]):
+        if not batch:
+            return
+        by_model: Dict[Type, List[Dict[str, Any]]] = defaultdict(list)
+        for model, record in batch:
+            by_model[model].append(record)
+
+        start = time.perf_counter()
+        try:
+            for model, rows in by_model.items():
+                await self._write(model, rows)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.flush_count += 1
+            self.last_flush_ms = elapsed
+            self.total_flush_ms += elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+
+    async def _write(self, model: Type, rows: List[Dict[str, Any]]):
+        """Insert and commit `rows`, retrying transient errors and bisecting around bad rows."""
+        error: Optional[BaseException] = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(insert(model), rows)
+                    await session.commit()
+                self.flushed += len(rows)
+                return
+            except Exception as exc:
+                if not _is_transient(exc):
+                    error = exc
+                    break
+                if attempt == self.max_retries:
+                    self.failed += len(rows)
+                    logger.exception("Event sink gave up on %d %s rows after %d retries",
+                                     len(rows), model.__tablename__, self.max_retries)
+                    return
+                self.retried += 1
+                delay = min(self.retry_backoff * 2 ** attempt, self.max_retry_backoff)
+                logger.warning("Event sink flush of %d %s rows failed (%s); retrying in %.1fs",
+                               len(rows), model.__tablename__, exc, delay)
+                await asyncio.sleep(delay)
+
+        if len(rows) == 1:
+            self.failed += 1
+            logger.error("Event sink dropped a %s row the database rejected: %r", model.__tablename__, rows[0],
+                         exc_info=error)
+            return
+        middle = len(rows) // 2
+        await self._write(model, rows[:middle])
+        await self._write(model, rows[middle:])
+
+
+event_sink = EventSink()
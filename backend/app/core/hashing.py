@@ -0,0 +1,110 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from app.core import security
+from app.core.config import settings
+from app.core.metrics import LatencyHistogram
+
+T = TypeVar("T")
+
+HASH_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing budget is exhausted; carries a Retry-After hint."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing capacity exhausted")
+        self.retry_after = retry_after
+
+
+class PasswordHasherPool:
+    """
+    Runs Argon2 hash/verify on a dedicated, bounded thread pool so a login
+    never blocks the event loop (argon2-cffi releases the GIL while hashing).
+
+    Admission control: at most `workers` operations run at once. Up to
+    `max_pending` callers may wait for a slot, each for at most
+    `queue_timeout` seconds. Anything beyond that is rejected with
+    HashingBusy so the endpoint can shed load with 503 + Retry-After.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 64, queue_timeout: float = 2.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait = LatencyHistogram(WAIT_BUCKETS_MS)
+        self.hash_time = LatencyHistogram(HASH_BUCKETS_MS)
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="argon2")
+            self._slots = asyncio.Semaphore(self.workers)
+
+    def _retry_after(self) -> int:
+        # Rough drain time of the current backlog, at least one second.
+        avg_ms = (self.hash_time.total / self.hash_time.count) if self.hash_time.count else 50.0
+        return max(1, int(self._pending * avg_ms / self.workers / 1000) + 1)
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        self._ensure_started()
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingBusy(self._retry_after())
+
+        self._pending += 1
+        queued_at = time.perf_counter()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise HashingBusy(self._retry_after())
+            started = time.perf_counter()
+            self.queue_wait.observe((started - queued_at) * 1000)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, fn, *args)
+            finally:
+                self.hash_time.observe((time.perf_counter() - started) * 1000)
+                self._slots.release()
+        finally:
+            self._pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(security.verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(security.get_password_hash, password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._slots = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait": self.queue_wait.snapshot(),
+            "hash_time": self.hash_time.snapshot(),
+        }
+
+
+password_hasher = PasswordHasherPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+)
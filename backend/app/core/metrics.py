@@ -0,0 +1,33 @@
+import bisect
+from typing import Sequence
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram with count/avg/max, cheap enough for
+    per-request use. `buckets` are inclusive upper bounds in `unit`.
+    """
+
+    def __init__(self, buckets: Sequence[float], unit: str = "ms"):
+        self.buckets = tuple(buckets)
+        self.unit = unit
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+
+    def snapshot(self) -> dict:
+        labels = [f"le_{b:g}{self.unit}" for b in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            f"avg_{self.unit}": round(self.total / self.count, 3) if self.count else 0.0,
+            f"max_{self.unit}": round(self.max, 3),
+            "histogram": dict(zip(labels, self.counts)),
+        }
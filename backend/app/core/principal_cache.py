@@ -0,0 +1,223 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import settings
+from app.models.organization import Organization
+from app.models.user import User
+
+
+def _columns(instance) -> Dict[str, Any]:
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+def _detached(model, data: Dict[str, Any]):
+    # A fresh detached instance per request, so handlers can never mutate
+    # the cached snapshot. It only carries column values: relationships
+    # cannot be lazy-loaded, and it must not be db.add()-ed (re-query to write).
+    instance = model(**data)
+    make_transient_to_detached(instance)
+    return instance
+
+
+class Principal:
+    """
+    Everything auth needs about a token: verified claims, a column snapshot
+    of the User, and (once loaded) a snapshot of its Organization.
+    """
+    __slots__ = ("key", "claims", "user_data", "org_data", "expires_at")
+
+    def __init__(self, key: str, claims: dict, user_data: Dict[str, Any], expires_at: float):
+        self.key = key
+        self.claims = claims
+        self.user_data = user_data
+        self.org_data: Optional[Dict[str, Any]] = None
+        self.expires_at = expires_at
+
+    @property
+    def user_id(self) -> int:
+        return self.user_data["id"]
+
+    @property
+    def org_id(self) -> Optional[int]:
+        return self.user_data.get("organization_id")
+
+    def user(self) -> User:
+        return _detached(User, self.user_data)
+
+    def org(self) -> Optional[Organization]:
+        return _detached(Organization, self.org_data) if self.org_data is not None else None
+
+
+class PrincipalCache:
+    """
+    TTL + LRU cache of authenticated principals keyed by SHA-256 of the
+    bearer token, so a warm request skips JWT verification and the User and
+    Organization queries.
+
+    Entries live until the cache TTL or the token's own `exp`, whichever is
+    sooner. Once a transaction that updated or deleted a User or Organization
+    (deactivation, role or plan change) commits, that principal's entries are
+    dropped in this process; an ORM bulk update/delete of either model drops
+    everything. Invalidation bumps `generation`, and a `put` that read its
+    row under an older generation is not cached, so a request racing the
+    commit cannot re-cache the stale row. The TTL bounds staleness for
+    changes made by other workers.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Principal]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._by_org: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Principal]:
+        with self._lock:
+            principal = self._entries.get(key)
+            if principal is None:
+                self.misses += 1
+                return None
+            if principal.expires_at <= time.time():
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return principal
+
+    def put(self, key: str, claims: dict, user: User, generation: Optional[int] = None) -> Principal:
+        """
+        Cache `user` for `key`. Pass the `generation` read before loading the
+        user; if an invalidation happened since, the principal is returned
+        but not cached.
+        """
+        expires_at = time.time() + self.ttl_seconds
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        principal = Principal(key, claims, _columns(user), expires_at)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return principal
+            self._drop(key)
+            self._entries[key] = principal
+            self._by_user.setdefault(principal.user_id, set()).add(key)
+            if principal.org_id is not None:
+                self._by_org.setdefault(principal.org_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return principal
+
+    def attach_org(self, principal: Principal, org: Organization):
+        principal.org_data = _columns(org)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            self.generation += 1
+            for key in list(self._by_user.get(user_id, ())):
+                self._drop(key)
+
+    def invalidate_org(self, org_id: int):
+        with self._lock:
+            self.generation += 1
+            for key in list(self._by_org.get(org_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_user.clear()
+            self._by_org.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _drop(self, key: str):
+        principal = self._entries.pop(key, None)
+        if principal is None:
+            return
+        keys = self._by_user.get(principal.user_id)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[principal.user_id]
+        if principal.org_id is not None:
+            keys = self._by_org.get(principal.org_id)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_org[principal.org_id]
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
+
+
+# Changes are collected on the session while it flushes and applied only
+# after commit: dropping entries at flush time would let a concurrent
+# request re-cache the still-committed old row before this one commits.
+_PENDING_KEY = "principal_cache_pending"
+
+
+def _pending(session: Session) -> dict:
+    return session.info.setdefault(_PENDING_KEY, {"users": set(), "orgs": set(), "all": False})
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    for instance in list(session.dirty) + list(session.deleted):
+        if isinstance(instance, User) and instance.id is not None:
+            _pending(session)["users"].add(instance.id)
+        elif isinstance(instance, Organization) and instance.id is not None:
+            _pending(session)["orgs"].add(instance.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changes(orm_execute_state):
+    # update(User)/delete(User) statements bypass the unit of work, and
+    # which rows they hit is not known here
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        if any(m.class_ in (User, Organization) for m in orm_execute_state.all_mappers):
+            _pending(orm_execute_state.session)["all"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending is None:
+        return
+    if pending["all"]:
+        principal_cache.clear()
+        return
+    for user_id in pending["users"]:
+        principal_cache.invalidate_user(user_id)
+    for org_id in pending["orgs"]:
+        principal_cache.invalidate_org(org_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(_PENDING_KEY, None)
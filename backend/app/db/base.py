@@ -2,7 +2,7 @@ from app.db.session import Base
 from app.models.user import User
 from app.models.organization import Organization
 from app.models.audit_log import AuditLog
-from app.models.email_event import EmailEvent
+from app.models.email_event import EmailEvent, EmailCampaign
 from app.models.login_event import LoginEvent
 from app.models.web_event import WebEvent
 from app.models.training import TrainingModule, UserTraining
@@ -10,9 +10,10 @@ from app.models.behavior import BehavioralProfile, AnomalyEvent
 from app.models.device import UserDevice
 from app.services.defense import BlockedIP
 from app.models.incident import Incident
-from app.models.threat import ThreatIndicator
+from app.models.threat import ThreatIndicator, ThreatIndicatorArchive
 from app.models.prediction import AttackPrediction
 from app.models.deception import DeceptionAsset
 from app.models.persona import AttackerPersona
 from app.models.playbook import Playbook, PlaybookExecution
 from app.models.forensic import ForensicEvidence
+from app.models.job_watermark import JobWatermark
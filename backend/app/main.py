@@ -12,6 +12,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Blocked IPs are rejected here, before auth or any DB work.
+# Added last so it is the outermost layer.
+from app.middleware.defense import DefenseMiddleware
+app.add_middleware(DefenseMiddleware)
+
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Cyber Defense Platform API is running"}
@@ -22,5 +27,68 @@ async def startup_event():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+    from app.core.event_sink import event_sink
+    await event_sink.start()
+
+    # Shared login windows in Redis when reachable, in-process otherwise
+    from app.core.config import settings
+    from app.services.web_detection import login_detector
+    await login_detector.init_backend(settings.REDIS_URL)
+
+    # In-memory blocklist: load once, then expire and refresh in the background
+    import asyncio
+    from app.db.session import AsyncSessionLocal
+    from app.services.blocklist import blocklist_index, maintain_blocklist
+    async with AsyncSessionLocal() as db:
+        await blocklist_index.load(db)
+    app.state.blocklist_task = asyncio.create_task(
+        maintain_blocklist(blocklist_index, AsyncSessionLocal, settings.BLOCKLIST_REFRESH_SECONDS)
+    )
+
+    # In-memory threat indicator index: same pattern, periodic full rebuild
+    from app.services.threat_index import threat_index, maintain_threat_index
+    async with AsyncSessionLocal() as db:
+        await threat_index.load(db)
+    app.state.threat_index_task = asyncio.create_task(
+        maintain_threat_index(threat_index, AsyncSessionLocal, settings.THREAT_INDEX_REFRESH_SECONDS)
+    )
+    # Expired indicators are swept from the table (and index) in small batches
+    from app.services.threat_aging import IndicatorSweeper, maintain_indicator_expiry
+    app.state.threat_sweep_task = asyncio.create_task(
+        maintain_indicator_expiry(IndicatorSweeper(), settings.THREAT_SWEEP_INTERVAL_SECONDS)
+    )
+
+    # Email campaign LSH index: recent campaigns reloaded, rows written in the background
+    from app.services.email_campaigns import campaign_tracker, maintain_campaigns
+    async with AsyncSessionLocal() as db:
+        await campaign_tracker.load(db)
+    app.state.email_campaign_task = asyncio.create_task(
+        maintain_campaigns(campaign_tracker, settings.EMAIL_CAMPAIGN_FLUSH_SECONDS)
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Flush buffered events before the process exits
+    from app.core.event_sink import event_sink
+    await event_sink.stop()
+
+    for name in ("blocklist_task", "threat_index_task", "threat_sweep_task", "email_campaign_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+
+    from app.core.hashing import password_hasher
+    password_hasher.shutdown()
+
+    from app.services.model_registry import model_registry
+    model_registry.shutdown()
+
+    from app.services.email_batch import email_batch_analyzer
+    email_batch_analyzer.shutdown()
+
+    # Last campaign counts and verdicts
+    from app.services.email_campaigns import campaign_tracker
+    await campaign_tracker.flush()
+
 from app.api.v1.router import api_router
 app.include_router(api_router, prefix="/api/v1")
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
 
 class BehavioralProfile(Base):
     __tablename__ = "behavioral_profiles"
+    # One baseline per entity: concurrent first logins race on the insert,
+    # and the loser retries through the versioned update
+    __table_args__ = (
+        UniqueConstraint("org_id", "entity_type", "entity_id", name="uq_behavioral_profiles_entity"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     org_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
@@ -14,6 +19,8 @@ class BehavioralProfile(Base):
     # JSON Blob for rolling baseline stats
     # Example: { "avg_login_time": 14.5, "req_frequency": 50, "last_10_logins": [...] }
     baseline_data = Column(JSON, default={})
+    # Bumped on every baseline change; cached models are keyed on it
+    baseline_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
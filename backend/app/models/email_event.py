@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Enum, JSON, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.session import Base
@@ -26,6 +26,38 @@ class EmailEvent(Base):
     severity = Column(String) # low, medium, high, critical (stored as string or enum)
     
     detected_at = Column(DateTime, default=datetime.utcnow)
+
+    # [{filename, content_type, size, sha256}] for uploaded .eml / mbox messages
+    attachments = Column(JSON, nullable=True)
+
+    # Near-duplicate cluster (see email_campaigns). No FK: member and campaign
+    # rows are written separately and may land in either order.
+    campaign_id = Column(String(32), nullable=True, index=True)
     
     # Metadata for analysis (headers, links found) - Stored as JSON usually, simplified here
     # meta_data = Column(JSON, nullable=True) 
+
+class EmailCampaign(Base):
+    """
+    A wave of near-identical detected messages. Every member shares the
+    campaign's verdict; message_count includes members seen before the
+    campaign was first detected, which were not stored.
+    """
+    __tablename__ = "email_campaigns"
+
+    id = Column(String(32), primary_key=True) # assigned in-process on ingest
+    organization_id = Column(Integer, ForeignKey("organizations.id"), index=True)
+
+    sender_email = Column(String) # first member's
+    subject = Column(String)
+
+    attack_type = Column(String)
+    confidence_score = Column(Float)
+    severity = Column(String)
+
+    message_count = Column(Integer, default=1)
+    first_seen = Column(DateTime, default=datetime.utcnow)
+    last_seen = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # MinHash signature (uint32 little-endian), reloaded into the LSH index on startup
+    signature = Column(LargeBinary, nullable=False)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.db.session import Base
+
+class JobWatermark(Base):
+    __tablename__ = "job_watermarks"
+
+    # e.g. "baseline_backfill:all", "baseline_backfill:org:3"
+    job = Column(String, primary_key=True)
+
+    # Highest source row id fully processed; the job resumes after it
+    last_id = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
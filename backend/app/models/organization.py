@@ -13,6 +13,9 @@ class Organization(Base):
     trial_start = Column(DateTime, default=datetime.utcnow)
     trial_end = Column(DateTime, default=lambda: datetime.utcnow() + timedelta(days=14))
     is_trial_active = Column(Boolean, default=True)
+
+    # Login-time anomaly detector: isolation_forest, streaming
+    anomaly_detector = Column(String, default="isolation_forest", server_default="isolation_forest")
     
     users = relationship("User", back_populates="organization")
     
@@ -17,3 +17,22 @@ class ThreatIndicator(Base):
     
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Naive UTC; last seen in a feed + that source's TTL. NULL rows (ingested
+    # before aging existed) age from last_updated with the default TTL.
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+class ThreatIndicatorArchive(Base):
+    """Expired indicators moved out of threat_indicators by the sweeper (archive mode)."""
+    __tablename__ = "threat_indicator_archive"
+
+    id = Column(Integer, primary_key=True, index=True)
+    indicator_value = Column(String, index=True, nullable=False)
+    indicator_type = Column(String, nullable=False)
+    source = Column(String, nullable=True)
+    confidence = Column(Float, nullable=True)
+    description = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    last_updated = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.future import select
+
+from app.core.celery_app import celery_app
+from app.db.session import AsyncSessionLocal, engine
+from app.models.behavior import BehavioralProfile
+from app.models.job_watermark import JobWatermark
+from app.models.login_event import LoginEvent
+from app.services.anomaly import PROFILE_LOAD_CHUNK, merge_logins
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = 5000
+MAX_CHUNK_RETRIES = 5
+
+EVENT_COLUMNS = ["id", "organization_id", "user_id", "source_ip", "timestamp"]
+
+
+class ChunkConflict(Exception):
+    """A live login updated a profile between our read and our write."""
+
+
+class BaselineBackfill:
+    """
+    Seeds BehavioralProfile login baselines from historical LoginEvent rows.
+
+    Successful logins with a known user are read in id order, `chunk_size`
+    rows at a time: through a server-side cursor where the backend supports
+    one alongside concurrent writes, otherwise (SQLite, where an open read
+    cursor blocks the writer) with keyset pagination on the primary key.
+    Each chunk is grouped per (org, user) with pandas, merged into the
+    existing baselines in one step per user, and written with bulk
+    INSERT / versioned UPDATE statements in a single transaction together
+    with the job watermark (last processed LoginEvent.id).
+
+    A run therefore resumes exactly where the last committed chunk ended.
+    Re-running over already processed events would count them twice, so
+    `reset` is only meant for rebuilding empty baselines.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, chunk_size: int = BACKFILL_CHUNK_SIZE,
+                 org_id: Optional[int] = None, progress: Optional[Callable[[dict], None]] = None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.org_id = org_id
+        self.progress = progress
+
+    @property
+    def job(self) -> str:
+        return f"baseline_backfill:{'all' if self.org_id is None else f'org:{self.org_id}'}"
+
+    def _events(self, after_id: int):
+        query = (
+            select(*(getattr(LoginEvent, c) for c in EVENT_COLUMNS))
+            .where(
+                LoginEvent.id > after_id,
+                LoginEvent.success.is_(True),
+                LoginEvent.user_id.isnot(None),
+                LoginEvent.organization_id.isnot(None),
+                LoginEvent.timestamp.isnot(None)
+            )
+        )
+        if self.org_id is not None:
+            query = query.where(LoginEvent.organization_id == self.org_id)
+        return query
+
+    async def run(self, reset: bool = False, max_events: Optional[int] = None) -> dict:
+        async with self.session_factory() as db:
+            watermark = await db.get(JobWatermark, self.job)
+            if watermark is None:
+                watermark = JobWatermark(job=self.job, last_id=0, processed=0)
+                db.add(watermark)
+            elif reset:
+                watermark.last_id, watermark.processed = 0, 0
+            await db.commit()
+            start_id = watermark.last_id
+            pending = (await db.execute(
+                select(func.count()).select_from(self._events(start_id).subquery())
+            )).scalar()
+
+        stats = {
+            "job": self.job,
+            "start_id": start_id,
+            "watermark": start_id,
+            "total": min(pending, max_events) if max_events else pending,
+            "processed": 0,
+            "chunks": 0,
+            "profiles_created": 0,
+            "profiles_updated": 0,
+            "elapsed_s": 0.0,
+            "events_per_s": 0.0,
+        }
+        started = time.perf_counter()
+
+        async for frame in self._chunks(start_id, max_events):
+            created, updated = await self._apply_chunk(frame)
+            stats["processed"] += len(frame)
+            stats["chunks"] += 1
+            stats["profiles_created"] += created
+            stats["profiles_updated"] += updated
+            stats["watermark"] = int(frame["id"].iloc[-1])
+            stats["elapsed_s"] = round(time.perf_counter() - started, 3)
+            stats["events_per_s"] = round(stats["processed"] / stats["elapsed_s"], 1) if stats["elapsed_s"] else 0.0
+            if self.progress:
+                self.progress(dict(stats))
+
+        return stats
+
+    async def _chunks(self, after_id: int, max_events: Optional[int]) -> AsyncIterator[pd.DataFrame]:
+        remaining = max_events if max_events else None
+        async with self.session_factory() as reader:
+            if reader.bind.dialect.name == "sqlite":
+                last_id = after_id
+                while remaining is None or remaining > 0:
+                    limit = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+                    rows = (await reader.execute(
+                        self._events(last_id).order_by(LoginEvent.id).limit(limit)
+                    )).all()
+                    # End the read transaction so the writer can commit
+                    await reader.rollback()
+                    if not rows:
+                        return
+                    last_id = rows[-1][0]
+                    if remaining is not None:
+                        remaining -= len(rows)
+                    yield pd.DataFrame(rows, columns=EVENT_COLUMNS)
+                return
+
+            result = await reader.stream(
+                self._events(after_id).order_by(LoginEvent.id).execution_options(yield_per=self.chunk_size)
+            )
+            async for rows in result.partitions(self.chunk_size):
+                if remaining is not None:
+                    rows = rows[:remaining]
+                    remaining -= len(rows)
+                yield pd.DataFrame(rows, columns=EVENT_COLUMNS)
+                if remaining is not None and remaining <= 0:
+                    return
+
+    @staticmethod
+    def _group(frame: pd.DataFrame) -> Dict[Tuple[int, str], Tuple[np.ndarray, List[str]]]:
+        """Per (org_id, entity_id): login hours and source IPs, oldest first."""
+        timestamps = pd.to_datetime(frame["timestamp"])
+        hours = (timestamps.dt.hour + timestamps.dt.minute / 60.0).to_numpy()
+        ips = frame["source_ip"].to_numpy()
+        groups = {}
+        for (org_id, user_id), idx in frame.groupby(["organization_id", "user_id"], sort=False).indices.items():
+            groups[(int(org_id), str(int(user_id)))] = (hours[idx], [ip for ip in ips[idx] if ip])
+        return groups
+
+    async def _apply_chunk(self, frame: pd.DataFrame) -> Tuple[int, int]:
+        groups = self._group(frame)
+        last_id = int(frame["id"].iloc[-1])
+        for attempt in range(MAX_CHUNK_RETRIES):
+            try:
+                async with self.session_factory() as db:
+                    result = await self._write_chunk(db, groups, last_id, len(frame))
+                    await db.commit()
+                    return result
+            except ChunkConflict:
+                logger.info(f"{self.job}: chunk ending at {last_id} raced a live update, retrying")
+                await asyncio.sleep(0.05 * (attempt + 1))
+        raise ChunkConflict(f"{self.job}: chunk ending at {last_id} kept conflicting")
+
+    async def _write_chunk(self, db, groups, last_id: int, processed: int) -> Tuple[int, int]:
+        table = BehavioralProfile.__table__
+        by_org: Dict[int, List[str]] = {}
+        for org_id, entity_id in groups:
+            by_org.setdefault(org_id, []).append(entity_id)
+
+        # Lock the rows we are about to rewrite (no-op on SQLite, which serializes writers)
+        existing = {}
+        for org_id, entity_ids in by_org.items():
+            for start in range(0, len(entity_ids), PROFILE_LOAD_CHUNK):
+                rows = await db.execute(
+                    select(table.c.id, table.c.entity_id, table.c.baseline_data, table.c.baseline_version)
+                    .where(
+                        table.c.org_id == org_id,
+                        table.c.entity_type == "user",
+                        table.c.entity_id.in_(entity_ids[start:start + PROFILE_LOAD_CHUNK])
+                    )
+                    .order_by(table.c.id.desc())
+                    .with_for_update()
+                )
+                for profile_id, entity_id, data, version in rows:
+                    existing[(org_id, entity_id)] = (profile_id, data, version or 0)
+
+        # Versions advance by the logins folded in, as one login at a time
+        # would, so cached models refit on schedule (see anomaly.model_epoch)
+        inserts, updates = [], []
+        for key, (hours, ips) in groups.items():
+            current = existing.get(key)
+            data = merge_logins(current[1] if current else None, hours, ips)
+            if current is None:
+                inserts.append({
+                    "org_id": key[0], "entity_type": "user", "entity_id": key[1],
+                    "baseline_data": data, "baseline_version": len(hours)
+                })
+            else:
+                updates.append({
+                    "pid": current[0], "expected": current[2],
+                    "data": data, "next_version": current[2] + len(hours)
+                })
+
+        if inserts:
+            await db.execute(insert(table), inserts)
+        if updates:
+            result = await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("pid"), table.c.baseline_version == bindparam("expected"))
+                .values(baseline_data=bindparam("data"), baseline_version=bindparam("next_version")),
+                updates
+            )
+            # Version predicate backs up the row lock; only checkable where
+            # the driver reports executemany row counts
+            if db.bind.dialect.supports_sane_multi_rowcount and result.rowcount != len(updates):
+                await db.rollback()
+                raise ChunkConflict()
+
+        await db.execute(
+            update(JobWatermark)
+            .where(JobWatermark.job == self.job)
+            .values(last_id=last_id, processed=JobWatermark.processed + processed)
+        )
+        return len(inserts), len(updates)
+
+
+@celery_app.task(bind=True, name="anomaly.backfill_baselines")
+def backfill_baselines_task(self, org_id: Optional[int] = None, chunk_size: int = BACKFILL_CHUNK_SIZE,
+                            reset: bool = False):
+    """Celery entry point; progress is published as task state PROGRESS."""
+    def report(stats: dict):
+        self.update_state(state="PROGRESS", meta=stats)
+
+    async def run():
+        try:
+            return await BaselineBackfill(chunk_size=chunk_size, org_id=org_id, progress=report).run(reset=reset)
+        finally:
+            # Each task gets a fresh event loop; pooled connections must not outlive it
+            await engine.dispose()
+
+    return asyncio.run(run())
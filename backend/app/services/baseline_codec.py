@@ -0,0 +1,206 @@
+import base64
+import ipaddress
+import json
+import struct
+from array import array
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence
+
+from app.services.ip_address import parse_address
+from app.services.online_detector import HOUR_BINS, hour_sketch
+
+# baseline_data layout version. v1 is the original free-form JSON
+# ({"login_times", "ip_history", "hour_sketch"}), recognised by the absence of "v".
+BASELINE_FORMAT = 2
+
+# Login hours kept verbatim (IsolationForest training window)
+LOGIN_HISTORY_LIMIT = 50
+# Network prefixes remembered per entity, least recently seen evicted first
+MAX_IP_PREFIXES = 64
+
+IPV4_PREFIX = 24
+IPV6_PREFIX = 64
+
+_MAGIC = b"BL"
+_HEADER = struct.Struct("<2sBI")  # magic, format, sketch n
+_FAMILY_RAW = 0
+
+
+def ip_prefix(ip: str) -> str:
+    """
+    Network an address belongs to for baseline purposes: /24 for IPv4,
+    /64 for IPv6. Unparseable values are kept as-is.
+    """
+    parsed = parse_address(ip)
+    if parsed is None:
+        return ip
+    version, value = parsed
+    if version == 4:
+        return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.0/{IPV4_PREFIX}"
+    network = (value >> (128 - IPV6_PREFIX)) << (128 - IPV6_PREFIX)
+    return f"{ipaddress.IPv6Address(network)}/{IPV6_PREFIX}"
+
+
+def _pack_prefix(prefix: str) -> bytes:
+    network, _, length = prefix.partition("/")
+    parsed = parse_address(network) if length else None
+    if parsed is None:
+        raw = prefix.encode()[:255]
+        return bytes((_FAMILY_RAW, len(raw))) + raw
+    version, value = parsed
+    if version == 4:
+        return bytes((4,)) + (value >> 8).to_bytes(3, "big")
+    return bytes((6,)) + (value >> (128 - IPV6_PREFIX)).to_bytes(8, "big")
+
+
+def _unpack_prefix(buf: bytes, offset: int):
+    family = buf[offset]
+    if family == 4:
+        value = int.from_bytes(buf[offset + 1:offset + 4], "big")
+        return f"{value >> 16}.{(value >> 8) & 255}.{value & 255}.0/{IPV4_PREFIX}", offset + 4
+    if family == 6:
+        value = int.from_bytes(buf[offset + 1:offset + 9], "big") << (128 - IPV6_PREFIX)
+        return f"{ipaddress.IPv6Address(value)}/{IPV6_PREFIX}", offset + 9
+    length = buf[offset + 1]
+    return buf[offset + 2:offset + 2 + length].decode(), offset + 2 + length
+
+
+class LoginBaseline:
+    """
+    Decoded login baseline of one BehavioralProfile.
+
+    - login_times: the last LOGIN_HISTORY_LIMIT login hours (IsolationForest input)
+    - sketch: HourOfDaySketch state, a fixed 24-bin decayed histogram
+    - prefixes: at most MAX_IP_PREFIXES network prefixes -> login count,
+      least recently seen first, so "new IP" is an O(1) lookup and the
+      stored document no longer grows with every address seen
+
+    decode() accepts every stored layout, including the original v1 JSON,
+    and encode() always writes the current one, so profiles migrate on
+    their next update. encode(binary=True) packs everything into a single
+    base64 array blob (hours as uint16 minutes, histogram as float32).
+    """
+
+    __slots__ = ("login_times", "sketch", "prefixes")
+
+    def __init__(self, login_times: Optional[List[float]] = None, sketch: Optional[dict] = None,
+                 prefixes: Optional["OrderedDict[str, int]"] = None):
+        self.login_times = login_times or []
+        self.sketch = sketch
+        self.prefixes = prefixes if prefixes is not None else OrderedDict()
+
+    # --- decoding ---
+
+    @classmethod
+    def decode(cls, data) -> "LoginBaseline":
+        if not data:
+            return cls()
+        if isinstance(data, str):
+            data = json.loads(data)
+        version = data.get("v", 1)
+        if version == 1:
+            return cls._from_v1(data)
+        if data.get("enc") == "bin":
+            return cls._from_binary(base64.b64decode(data["data"]))
+        return cls(
+            [m / 60.0 for m in data.get("login_minutes", [])],
+            data.get("hour_sketch"),
+            OrderedDict((prefix, count) for prefix, count in data.get("ip_prefixes", []))
+        )
+
+    @classmethod
+    def _from_v1(cls, data: dict) -> "LoginBaseline":
+        prefixes = OrderedDict()
+        # ip_history is in first-seen order; replay it so the newest ends up last
+        for ip in data.get("ip_history", []):
+            prefix = ip_prefix(ip)
+            prefixes[prefix] = prefixes.pop(prefix, 0) + 1
+        while len(prefixes) > MAX_IP_PREFIXES:
+            prefixes.popitem(last=False)
+        login_times = list(data.get("login_times", []))[-LOGIN_HISTORY_LIMIT:]
+        return cls(login_times, data.get("hour_sketch"), prefixes)
+
+    @classmethod
+    def _from_binary(cls, buf: bytes) -> "LoginBaseline":
+        magic, _, n = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError("Not a binary login baseline")
+        offset = _HEADER.size
+        hist = array("f")
+        hist.frombytes(buf[offset:offset + 4 * HOUR_BINS])
+        offset += 4 * HOUR_BINS
+        sketch = {"n": n, "hist": hist.tolist()} if n else None
+
+        count = buf[offset]
+        minutes = array("H")
+        minutes.frombytes(buf[offset + 1:offset + 1 + 2 * count])
+        offset += 1 + 2 * count
+
+        prefixes = OrderedDict()
+        count = buf[offset]
+        offset += 1
+        for _ in range(count):
+            prefix, offset = _unpack_prefix(buf, offset)
+            (seen,) = struct.unpack_from("<I", buf, offset)
+            offset += 4
+            prefixes[prefix] = seen
+        return cls([m / 60.0 for m in minutes], sketch, prefixes)
+
+    # --- encoding ---
+
+    def encode(self, binary: bool = False) -> dict:
+        if binary:
+            return {"v": BASELINE_FORMAT, "enc": "bin", "data": base64.b64encode(self._to_binary()).decode()}
+        data = {
+            "v": BASELINE_FORMAT,
+            # Login hours are whole minutes, so minutes of day are lossless and compact
+            "login_minutes": [int(h * 60 + 0.5) for h in self.login_times],
+            "ip_prefixes": [[prefix, count] for prefix, count in self.prefixes.items()],
+        }
+        if self.sketch:
+            data["hour_sketch"] = {"n": self.sketch["n"], "hist": [round(v, 6) for v in self.sketch["hist"]]}
+        return data
+
+    def _to_binary(self) -> bytes:
+        sketch = self.sketch or hour_sketch.new_state()
+        parts = [_HEADER.pack(_MAGIC, BASELINE_FORMAT, sketch["n"]), array("f", sketch["hist"]).tobytes()]
+        minutes = array("H", (int(h * 60 + 0.5) % (24 * 60) for h in self.login_times[-255:]))
+        parts += [bytes((len(minutes),)), minutes.tobytes()]
+        prefixes = list(self.prefixes.items())[-255:]
+        parts.append(bytes((len(prefixes),)))
+        for prefix, count in prefixes:
+            parts += [_pack_prefix(prefix), struct.pack("<I", min(count, 0xFFFFFFFF))]
+        return b"".join(parts)
+
+    # --- queries and updates ---
+
+    def __bool__(self) -> bool:
+        return bool(self.login_times or self.prefixes or self.sketch)
+
+    def knows_ip(self, ip: str) -> bool:
+        return ip_prefix(ip) in self.prefixes
+
+    def sketch_state(self) -> dict:
+        # Profiles that predate the sketch are seeded once from their history
+        return self.sketch or hour_sketch.seed(self.login_times)
+
+    def _touch(self, ip: str):
+        prefix = ip_prefix(ip)
+        self.prefixes[prefix] = self.prefixes.pop(prefix, 0) + 1
+        if len(self.prefixes) > MAX_IP_PREFIXES:
+            self.prefixes.popitem(last=False)
+
+    def add_login(self, hour: float, ip: Optional[str]):
+        self.login_times = (self.login_times + [hour])[-LOGIN_HISTORY_LIMIT:]
+        self.sketch = hour_sketch.update(self.sketch, hour) if self.sketch else hour_sketch.seed(self.login_times)
+        if ip:
+            self._touch(ip)
+
+    def add_logins(self, hours: Sequence[float], ips: Iterable[str]):
+        """Folds many logins (oldest first) in one step; see HourOfDaySketch.update_many."""
+        existing = self.login_times
+        self.login_times = (existing + [float(h) for h in hours])[-LOGIN_HISTORY_LIMIT:]
+        self.sketch = hour_sketch.update_many(self.sketch or hour_sketch.seed(existing), hours)
+        for ip in ips:
+            if ip:
+                self._touch(ip)
@@ -0,0 +1,189 @@
+import asyncio
+import ipaddress
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from app.services.ip_address import parse_address
+from app.services.prefix_trie import PrefixTrie
+from app.services.timer_wheel import TimerWheel
+from app.services.timestamps import to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Blocks with no organization apply to every tenant.
+GLOBAL_ORG = None
+
+
+class OrgBlocklist:
+    """
+    Blocked addresses for one organization: hash sets (dicts) for exact
+    IPv4/IPv6 hosts and a prefix trie per family for CIDR ranges. Values are
+    the expiry epoch (inf for permanent blocks).
+    """
+
+    def __init__(self):
+        self.exact: Dict[int, Dict[int, float]] = {4: {}, 6: {}}
+        self.ranges: Dict[int, PrefixTrie] = {4: PrefixTrie(4), 6: PrefixTrie(6)}
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.exact.values()) + sum(len(t) for t in self.ranges.values())
+
+    def add(self, network, expires: float) -> float:
+        """
+        Store a block; duplicates keep the later expiry. Returns the
+        effective expiry for the entry.
+        """
+        if network.prefixlen == network.max_prefixlen:
+            exact = self.exact[network.version]
+            key = int(network.network_address)
+            expires = max(expires, exact.get(key, expires))
+            exact[key] = expires
+        else:
+            trie = self.ranges[network.version]
+            expires = max(expires, trie.get(network) or expires)
+            trie.insert(network, expires)
+        return expires
+
+    def remove(self, network) -> bool:
+        if network.prefixlen == network.max_prefixlen:
+            return self.exact[network.version].pop(int(network.network_address), False) is not False
+        return self.ranges[network.version].remove(network)
+
+    def match(self, version: int, key: int, now: float) -> bool:
+        if self.exact[version].get(key, 0.0) > now:
+            return True
+        trie = self.ranges[version]
+        if not len(trie):
+            return False
+        # An expired range the wheel has not swept yet must not hide a live,
+        # broader one covering the same address
+        return trie.longest_match(key, lambda expires: expires > now) is not None
+
+
+class BlocklistIndex:
+    """
+    Process-local index of `blocked_ips`, keyed by organization, answering
+    `is_blocked` without touching the database.
+
+    Loaded in full at startup, updated incrementally by DefenseService, and
+    pruned by a timer wheel as temporary blocks expire. Lookups also compare
+    expiry directly, so a block is never honoured past its deadline even
+    between wheel ticks.
+    """
+
+    def __init__(self):
+        self._orgs: Dict[Optional[int], OrgBlocklist] = {}
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(tick_seconds=1.0, slots=3600, on_expire=self._expire)
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return sum(len(b) for b in self._orgs.values())
+
+    @staticmethod
+    def parse(value: str):
+        """Accepts a host address or CIDR; hosts become /32 or /128."""
+        return ipaddress.ip_network(value.strip(), strict=False)
+
+    def add(self, org_id: Optional[int], value: str, expires_at: Optional[datetime] = None):
+        try:
+            network = self.parse(value)
+        except ValueError:
+            logger.warning(f"Ignoring unparseable blocklist entry: {value!r}")
+            return
+        expires = to_epoch(expires_at)
+        if expires <= time.time():
+            return
+        with self._lock:
+            expires = self._orgs.setdefault(org_id, OrgBlocklist()).add(network, expires)
+            if expires == math.inf:
+                self._wheel.cancel((org_id, network))
+            else:
+                self._wheel.schedule((org_id, network), expires)
+
+    def remove(self, org_id: Optional[int], value: str):
+        try:
+            network = self.parse(value)
+        except ValueError:
+            logger.warning(f"Ignoring unparseable blocklist entry: {value!r}")
+            return
+        with self._lock:
+            blocklist = self._orgs.get(org_id)
+            if blocklist:
+                blocklist.remove(network)
+            self._wheel.cancel((org_id, network))
+
+    def _expire(self, key: Tuple[Optional[int], object]):
+        org_id, network = key
+        blocklist = self._orgs.get(org_id)
+        if blocklist:
+            blocklist.remove(network)
+
+    def is_blocked(self, org_id: Optional[int], ip: str, now: Optional[float] = None) -> bool:
+        parsed = parse_address(ip)
+        if parsed is None:
+            return False
+        version, key = parsed
+        now = now if now is not None else time.time()
+
+        global_list = self._orgs.get(GLOBAL_ORG)
+        if global_list is not None and global_list.match(version, key, now):
+            return True
+        if org_id is not GLOBAL_ORG:
+            org_list = self._orgs.get(org_id)
+            if org_list is not None and org_list.match(version, key, now):
+                return True
+        return False
+
+    def expire(self, now: Optional[float] = None) -> int:
+        with self._lock:
+            return len(self._wheel.advance(now))
+
+    async def load(self, db):
+        """
+        Rebuild from `blocked_ips` and swap the new maps in atomically.
+        """
+        from sqlalchemy import select, or_
+        from app.services.defense import BlockedIP
+
+        result = await db.execute(
+            select(BlockedIP.organization_id, BlockedIP.ip_address, BlockedIP.expires_at).where(
+                or_(BlockedIP.expires_at.is_(None), BlockedIP.expires_at > datetime.utcnow())
+            )
+        )
+        fresh = BlocklistIndex()
+        for org_id, ip, expires_at in result.all():
+            fresh.add(org_id, ip, expires_at)
+
+        with self._lock:
+            self._orgs = fresh._orgs
+            self._wheel = fresh._wheel
+            self._wheel.on_expire = self._expire
+            self.loaded = True
+        logger.info(f"Blocklist index loaded: {len(self)} entries")
+
+
+async def maintain_blocklist(index: BlocklistIndex, session_factory, refresh_seconds: float):
+    """
+    Background loop: advance the expiry wheel every second and reload from
+    the database every `refresh_seconds` to pick up blocks written by other
+    workers.
+    """
+    last_refresh = time.monotonic()
+    while True:
+        await asyncio.sleep(1.0)
+        index.expire()
+        if refresh_seconds and time.monotonic() - last_refresh >= refresh_seconds:
+            try:
+                async with session_factory() as db:
+                    await index.load(db)
+            except Exception:
+                logger.exception("Blocklist refresh failed; keeping previous index")
+            last_refresh = time.monotonic()
+
+
+blocklist_index = BlocklistIndex()
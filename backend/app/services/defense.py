@@ -4,6 +4,7 @@ from app.models.organization import Organization
 from app.db.session import Base
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
 from datetime import datetime
+from app.services.blocklist import blocklist_index
 
 class BlockedIP(Base):
     __tablename__ = "blocked_ips"
@@ -15,20 +16,27 @@ class BlockedIP(Base):
     expires_at = Column(DateTime, nullable=True) # Optional temporary block
 
 class DefenseService:
-    async def block_ip(self, db: AsyncSession, org_id: int, ip: str, reason: str):
-        # Check if already blocked
-        # (Assuming unique constraint or check)
-        # For Phase 0, just add
-        block = BlockedIP(organization_id=org_id, ip_address=ip, reason=reason)
+    async def block_ip(self, db: AsyncSession, org_id: int, ip: str, reason: str, expires_at: datetime = None):
+        """
+        Persist a block for a host IP or CIDR range and publish it to the
+        in-memory index. org_id=None blocks for every organization.
+        """
+        # Normalise and validate before writing ("10.0.0.1/8" -> "10.0.0.0/8")
+        network = blocklist_index.parse(ip)
+        value = str(network.network_address) if network.prefixlen == network.max_prefixlen else str(network)
+
+        block = BlockedIP(organization_id=org_id, ip_address=value, reason=reason, expires_at=expires_at)
         db.add(block)
         await db.commit()
+        blocklist_index.add(org_id, value, expires_at)
     
     async def is_ip_blocked(self, db: AsyncSession, org_id: int, ip: str) -> bool:
-        from sqlalchemy import select
-        result = await db.execute(select(BlockedIP).where(
-            BlockedIP.organization_id == org_id, 
-            BlockedIP.ip_address == ip
-        ))
-        return result.scalars().first() is not None
+        """
+        Answered from the in-memory index (CIDR-aware, honours expires_at).
+        `db` is only used if the index has not been loaded yet.
+        """
+        if not blocklist_index.loaded:
+            await blocklist_index.load(db)
+        return blocklist_index.is_blocked(org_id, ip)
 
 defense_service = DefenseService()
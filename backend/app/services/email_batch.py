@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.event_sink import event_sink
+from app.models.email_event import EmailEvent
+from app.services.email_campaigns import CampaignTracker, campaign_tracker
+from app.services.email_detection import ContentVerdict, EmailDetectionService, email_detector
+from app.services.email_rules import CompiledEmailRules
+from app.services.mail_parser import ParsedMail
+
+logger = logging.getLogger(__name__)
+
+# (sender, subject, body, links)
+EmailMessage = Tuple[str, str, str, List[str]]
+
+# Parsed messages analyzed and stored per round when ingesting a mailbox
+MAILBOX_BATCH_SIZE = 500
+
+# Set in each worker process by _init_worker
+_worker_detector: Optional[EmailDetectionService] = None
+
+
+def _init_worker(rules: CompiledEmailRules):
+    global _worker_detector
+    _worker_detector = EmailDetectionService(rules)
+
+
+def _analyze_chunk(messages: Sequence[EmailMessage]) -> List[ContentVerdict]:
+    analyze = _worker_detector.analyze_content
+    return [analyze(sender, subject, body, links) for sender, subject, body, links in messages]
+
+
+class EmailBatchAnalyzer:
+    """
+    Analyzes bursts of mail on a process pool so throughput scales with
+    cores rather than with one event loop.
+
+    Messages are cut into `chunk_size` chunks and each chunk's content rules
+    (keywords, links, spoofing) run in a worker; only the small verdicts
+    travel back. Threat intel lookups need this process' in-memory index,
+    so they run here afterwards (microseconds per host). Results come back
+    in input order. Batches of at most one chunk, or `workers` = 0, are
+    analyzed inline: a round trip to a worker costs more than they do.
+
+    Workers are spawned lazily with the detector's current rule snapshot.
+    A rule reload on the detector retires the pool: batches already queued
+    on it finish there with the old rules, new batches go to a fresh pool.
+    If a worker dies (BrokenProcessPool) the pool is replaced and the batch
+    retried once.
+    """
+
+    def __init__(self, detector: EmailDetectionService = email_detector,
+                 workers: int = settings.EMAIL_BATCH_WORKERS, chunk_size: int = settings.EMAIL_BATCH_CHUNK_SIZE):
+        self.detector = detector
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._rules: Optional[CompiledEmailRules] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        rules = self.detector.engine.snapshot()
+        if self._executor is not None and self._rules is not rules:
+            self._retire(self._executor)
+        if self._executor is None:
+            # spawn: the parent runs an event loop and DB driver threads that must not be forked
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(rules,)
+            )
+            self._rules = rules
+        return self._executor
+
+    async def analyze(self, messages: Sequence[EmailMessage],
+                      attachment_hashes: Optional[Sequence[Sequence[str]]] = None
+                      ) -> List[Tuple[Optional[str], float, str]]:
+        """
+        (attack_type, confidence, severity) per message, in order.
+        `attachment_hashes`, if given, holds each message's SHA-256 digests.
+        """
+        if self.workers <= 0 or len(messages) <= self.chunk_size:
+            contents = [self.detector.analyze_content(*message) for message in messages]
+        else:
+            try:
+                contents = await self._analyze_on_pool(messages)
+            except BrokenProcessPool:
+                logger.warning("Email batch worker pool broke; retrying %d messages on a new pool", len(messages))
+                contents = await self._analyze_on_pool(messages)
+        if attachment_hashes is None:
+            return [self.detector.finalize(content) for content in contents]
+        return [self.detector.finalize(content, hashes) for content, hashes in zip(contents, attachment_hashes)]
+
+    async def _analyze_on_pool(self, messages: Sequence[EmailMessage]) -> List[ContentVerdict]:
+        pool = self._pool()
+        loop = asyncio.get_running_loop()
+        try:
+            chunks = await asyncio.gather(*(
+                loop.run_in_executor(pool, _analyze_chunk, messages[start:start + self.chunk_size])
+                for start in range(0, len(messages), self.chunk_size)
+            ))
+        except BrokenProcessPool:
+            # Concurrent batches may all see the same broken pool; only the first replaces it
+            if self._executor is pool:
+                self._retire(pool)
+            raise
+        return [content for chunk in chunks for content in chunk]
+
+    def _retire(self, pool: ProcessPoolExecutor):
+        # No cancel_futures: other requests may still have chunks queued on this pool
+        pool.shutdown(wait=False)
+        self._executor = None
+        self._rules = None
+
+    def shutdown(self):
+        """Stop the pool at application exit, dropping any queued chunks."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._rules = None
+
+
+email_batch_analyzer = EmailBatchAnalyzer()
+
+
+async def ingest_mailbox(organization_id: int, mails: Iterator[ParsedMail],
+                         analyzer: EmailBatchAnalyzer = email_batch_analyzer,
+                         batch_size: int = MAILBOX_BATCH_SIZE,
+                         campaigns: CampaignTracker = campaign_tracker) -> dict:
+    """
+    Analyze and store a stream of parsed messages (see mail_parser), e.g. an
+    uploaded mbox. `batch_size` messages are parsed at a time on a worker
+    thread, analyzed (attachment digests included), grouped into campaigns
+    and the detected ones queued as EmailEvent rows, so memory is bounded by
+    one batch whatever the archive size. Messages the parser could not
+    handle are skipped and counted as `malformed`.
+    """
+    stats = {"messages": 0, "detected": 0, "attachments": 0, "truncated": 0, "malformed": 0}
+    campaign_ids = set()
+    by_type: Counter = Counter()
+    while True:
+        batch: List[ParsedMail] = await asyncio.to_thread(lambda: list(islice(mails, batch_size)))
+        if not batch:
+            break
+        stats["messages"] += len(batch)
+        parsed = [mail for mail in batch if mail.error is None]
+        stats["malformed"] += len(batch) - len(parsed)
+        batch = parsed
+        verdicts = await analyzer.analyze(
+            [(mail.sender, mail.subject, mail.body, mail.links) for mail in batch],
+            [[a.sha256 for a in mail.attachments] for mail in batch]
+        )
+        now = datetime.utcnow()
+        records = []
+        for mail, verdict in zip(batch, verdicts):
+            (attack_type, confidence, severity), campaign_id = campaigns.observe(
+                organization_id, mail.sender, mail.subject, mail.body, verdict, now
+            )
+            stats["attachments"] += len(mail.attachments)
+            stats["truncated"] += mail.truncated
+            if not attack_type:
+                continue
+            by_type[attack_type] += 1
+            campaign_ids.add(campaign_id)
+            records.append({
+                "organization_id": organization_id,
+                "sender_email": mail.sender,
+                "recipient_email": mail.recipient,
+                "subject": mail.subject,
+                "body_snippet": mail.body[:200],
+                "attack_type": attack_type,
+                "confidence_score": confidence,
+                "severity": severity,
+                "detected_at": now,
+                "attachments": [asdict(a) for a in mail.attachments] or None,
+                "campaign_id": campaign_id,
+            })
+        if records:
+            await event_sink.put_many(EmailEvent, records)
+        stats["detected"] += len(records)
+    campaign_ids.discard(None)
+    stats["campaigns"] = len(campaign_ids)
+    stats["by_type"] = dict(by_type)
+    return stats
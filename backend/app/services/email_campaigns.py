@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import re
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import insert, update
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.email_event import EmailCampaign, EmailEvent
+from app.services.signatures import SEVERITY_RANK
+
+logger = logging.getLogger(__name__)
+
+# (attack_type, confidence, severity), as EmailDetectionService returns it
+Verdict = Tuple[Optional[str], float, str]
+
+# Words per shingle, and words hashed per message: a wave is recognisable
+# long before the end of a long body. Shorter messages ("ok, thanks") are
+# too generic to stand for a campaign and are never clustered.
+SHINGLE_SIZE = 3
+MIN_TOKENS = 8
+MAX_TOKENS = 5000
+
+# Smallest prime above 2^32: (a * x + b) mod it permutes 32-bit shingle hashes
+_PRIME = np.uint64((1 << 32) + 15)
+_MASK32 = np.uint64(0xFFFFFFFF)
+# Shingle hash = w0 * K0 + w1 * K1 + w2 (mod 2^64, then 32 bits kept)
+_SHINGLE_MULTIPLIERS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+
+# Links reduced to their host: per-recipient tracking paths would otherwise
+# make every copy of a wave look different. Digits (order numbers, amounts,
+# dates) are folded for the same reason.
+_URL = re.compile(r"https?://([^/\s\"'<>?#]+)\S*", re.IGNORECASE)
+_DIGITS = re.compile(r"\d+")
+_TOKEN = re.compile(r"\w+")
+
+
+def _outranks(verdict: Verdict, current: Optional[Verdict]) -> bool:
+    if current is None:
+        return True
+    return (SEVERITY_RANK.get(verdict[2], 0), verdict[1]) > (SEVERITY_RANK.get(current[2], 0), current[1])
+
+
+class Campaign:
+    """One near-duplicate cluster, represented by the signature of its first message."""
+
+    __slots__ = ("id", "organization_id", "signature", "sender", "subject", "verdict",
+                 "count", "first_seen", "last_seen", "stored", "escalated")
+
+    def __init__(self, campaign_id: str, organization_id: int, signature: np.ndarray, sender: str,
+                 subject: str, seen_at: datetime):
+        self.id = campaign_id
+        self.organization_id = organization_id
+        self.signature = signature
+        self.sender = sender
+        self.subject = subject
+        self.verdict: Optional[Verdict] = None
+        self.count = 1
+        self.first_seen = seen_at
+        self.last_seen = seen_at
+        # Row exists in email_campaigns; flushes left that re-label stored members
+        self.stored = False
+        self.escalated = 0
+
+
+class CampaignIndex:
+    """
+    Locality-sensitive hash index over MinHash signatures. A signature is cut
+    into `bands` bands of `rows` values; two messages become candidates when
+    any band matches exactly, which happens with probability
+    1 - (1 - J^rows)^bands for Jaccard similarity J. Candidates are then
+    checked against the estimated similarity (the share of equal signature
+    values). Bucket keys are prefixed with the organization, so campaigns
+    never span tenants.
+
+    Clusters are kept least recently seen first and evicted from that end
+    once `max_clusters` is exceeded.
+    """
+
+    def __init__(self, num_perm: int, bands: int, similarity: float, max_clusters: int):
+        if num_perm % bands:
+            raise ValueError(f"{num_perm} permutations do not split into {bands} bands")
+        self.bands = bands
+        self.similarity = similarity
+        self.max_clusters = max_clusters
+        self._band_bytes = num_perm // bands * 4
+        self._buckets: List[Dict[bytes, List[Campaign]]] = [{} for _ in range(bands)]
+        self._campaigns: "OrderedDict[str, Campaign]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._campaigns)
+
+    def _keys(self, organization_id: Optional[int], signature: np.ndarray) -> List[bytes]:
+        prefix = (organization_id or 0).to_bytes(8, "little", signed=True)
+        raw = signature.tobytes()
+        step = self._band_bytes
+        return [prefix + raw[i * step:(i + 1) * step] for i in range(self.bands)]
+
+    def nearest(self, organization_id: Optional[int], signature: np.ndarray) -> Tuple[Optional[Campaign], float]:
+        """Most similar cluster at or above `similarity`, and its estimated similarity."""
+        candidates = {}
+        for bucket, key in zip(self._buckets, self._keys(organization_id, signature)):
+            for campaign in bucket.get(key, ()):
+                candidates[campaign.id] = campaign
+        best, best_score = None, 0.0
+        for campaign in candidates.values():
+            score = float(np.count_nonzero(campaign.signature == signature)) / len(signature)
+            if score >= self.similarity and score > best_score:
+                best, best_score = campaign, score
+        return best, best_score
+
+    def add(self, campaign: Campaign):
+        for bucket, key in zip(self._buckets, self._keys(campaign.organization_id, campaign.signature)):
+            bucket.setdefault(key, []).append(campaign)
+        self._campaigns[campaign.id] = campaign
+        while len(self._campaigns) > self.max_clusters:
+            self.remove(next(iter(self._campaigns.values())))
+
+    def remove(self, campaign: Campaign):
+        if self._campaigns.pop(campaign.id, None) is None:
+            return
+        for bucket, key in zip(self._buckets, self._keys(campaign.organization_id, campaign.signature)):
+            members = bucket.get(key)
+            if members is None:
+                continue
+            members.remove(campaign)
+            if not members:
+                del bucket[key]
+
+    def touch(self, campaign: Campaign):
+        self._campaigns.move_to_end(campaign.id)
+
+    def expire(self, cutoff: datetime) -> int:
+        """Drop clusters last seen before `cutoff`."""
+        expired = 0
+        while self._campaigns:
+            campaign = next(iter(self._campaigns.values()))
+            if campaign.last_seen >= cutoff:
+                break
+            self.remove(campaign)
+            expired += 1
+        return expired
+
+
+class CampaignTracker:
+    """
+    Groups ingested mail into phishing campaigns: near-identical messages
+    (same template, different recipient, tracking link or order number)
+    land in one cluster and share one verdict.
+
+    Each message's normalized subject and body are cut into word shingles and
+    reduced to a MinHash signature, which the in-process CampaignIndex maps
+    to a cluster in well under a millisecond. Clean clusters live only in
+    memory; once any member is detected the cluster becomes a campaign, gets
+    an email_campaigns row, and its verdict propagates: later members take it
+    even when the rules miss them, and a stronger verdict from a new member
+    is written back to the members already stored.
+
+    Campaign rows are written by `flush` (see maintain_campaigns), not on the
+    request path. The permutations come from a fixed seed, so signatures
+    agree across processes and restarts and stored campaigns can be reloaded.
+    """
+
+    def __init__(self, num_perm: int = settings.EMAIL_CAMPAIGN_NUM_PERM, bands: int = settings.EMAIL_CAMPAIGN_BANDS,
+                 similarity: float = settings.EMAIL_CAMPAIGN_SIMILARITY,
+                 max_clusters: int = settings.EMAIL_CAMPAIGN_MAX_CLUSTERS,
+                 window_hours: float = settings.EMAIL_CAMPAIGN_WINDOW_HOURS, session_factory=AsyncSessionLocal):
+        self.num_perm = num_perm
+        self.window = timedelta(hours=window_hours)
+        self.session_factory = session_factory
+        self.index = CampaignIndex(num_perm, bands, similarity, max_clusters)
+        rng = np.random.RandomState(1)
+        # a, b < 2^32 and shingle hashes < 2^32, so a * x + b cannot overflow 64 bits
+        self._a = rng.randint(1, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        # Campaigns whose row is missing or stale, by id
+        self._dirty: Dict[str, Campaign] = {}
+
+    def signature(self, subject: str, body: str) -> Optional[np.ndarray]:
+        """MinHash of the message's word shingles; None for messages under MIN_TOKENS words."""
+        text = _DIGITS.sub("0", _URL.sub(r" \1 ", f"{subject}\n{body}".lower()))
+        tokens = _TOKEN.findall(text)[:MAX_TOKENS]
+        if len(tokens) < MIN_TOKENS:
+            return None
+        words = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+        k0, k1 = _SHINGLE_MULTIPLIERS
+        shingles = np.unique((words[:-2] * k0 + words[1:-1] * k1 + words[2:]) & _MASK32)
+        hashed = (self._a * shingles + self._b) % _PRIME
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def observe(self, organization_id: int, sender: str, subject: str, body: str, verdict: Verdict,
+                now: Optional[datetime] = None) -> Tuple[Verdict, Optional[str]]:
+        """
+        Assign one analyzed message to its cluster and reconcile verdicts.
+        Returns the verdict to store for the message and its campaign id
+        (None while its cluster has no detection).
+        """
+        signature = self.signature(subject, body)
+        if signature is None:
+            return verdict, None
+        now = now or datetime.utcnow()
+        campaign, _ = self.index.nearest(organization_id, signature)
+        if campaign is None:
+            campaign = Campaign(uuid.uuid4().hex, organization_id, signature, sender, subject, now)
+            self.index.add(campaign)
+        else:
+            campaign.count += 1
+            campaign.last_seen = now
+            self.index.touch(campaign)
+
+        if verdict[0] and _outranks(verdict, campaign.verdict):
+            if campaign.verdict is not None:
+                # Members already stored carry the old verdict. Two passes:
+                # members still queued in the event sink during the first
+                # are written by the time of the second.
+                campaign.escalated = 2
+            campaign.verdict = verdict
+        if campaign.verdict is None:
+            return verdict, None
+        self._dirty[campaign.id] = campaign
+        return campaign.verdict, campaign.id
+
+    async def flush(self) -> int:
+        """
+        Write new and changed campaigns and re-label the stored members of
+        escalated ones. Returns the number of campaigns written.
+        """
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, {}
+        new_rows, changed_rows, escalated = [], [], []
+        for campaign in dirty.values():
+            attack_type, confidence, severity = campaign.verdict
+            row = {
+                "id": campaign.id,
+                "attack_type": attack_type,
+                "confidence_score": confidence,
+                "severity": severity,
+                "message_count": campaign.count,
+                "last_seen": campaign.last_seen,
+            }
+            if campaign.stored:
+                changed_rows.append(row)
+            else:
+                row.update({
+                    "organization_id": campaign.organization_id,
+                    "sender_email": campaign.sender,
+                    "subject": campaign.subject,
+                    "first_seen": campaign.first_seen,
+                    "signature": campaign.signature.astype("<u4").tobytes(),
+                })
+                new_rows.append(row)
+            if campaign.escalated:
+                escalated.append((campaign, row))
+
+        try:
+            async with self.session_factory() as db:
+                if new_rows:
+                    await db.execute(insert(EmailCampaign), new_rows)
+                if changed_rows:
+                    await db.execute(update(EmailCampaign), changed_rows)
+                for campaign, row in escalated:
+                    await db.execute(
+                        update(EmailEvent)
+                        .where(EmailEvent.campaign_id == campaign.id)
+                        .values(attack_type=row["attack_type"], confidence_score=row["confidence_score"],
+                                severity=row["severity"])
+                    )
+                await db.commit()
+        except Exception:
+            # Retried on the next flush, merged with whatever changed since
+            for campaign_id, campaign in dirty.items():
+                self._dirty.setdefault(campaign_id, campaign)
+            raise
+        for campaign in dirty.values():
+            campaign.stored = True
+        for campaign, _ in escalated:
+            campaign.escalated -= 1
+            if campaign.escalated:
+                self._dirty.setdefault(campaign.id, campaign)
+        return len(dirty)
+
+    def expire(self, now: Optional[datetime] = None) -> int:
+        """Forget clusters not seen within the window; their rows stay."""
+        return self.index.expire((now or datetime.utcnow()) - self.window)
+
+    async def load(self, db):
+        """Reload campaigns seen within the window, so waves survive a restart."""
+        cutoff = datetime.utcnow() - self.window
+        rows = (await db.execute(
+            select(EmailCampaign).where(EmailCampaign.last_seen >= cutoff).order_by(EmailCampaign.last_seen)
+        )).scalars().all()
+        loaded = 0
+        for row in rows:
+            signature = np.frombuffer(row.signature, dtype="<u4").astype(np.uint32)
+            # Written under a different EMAIL_CAMPAIGN_NUM_PERM
+            if len(signature) != self.num_perm:
+                continue
+            campaign = Campaign(row.id, row.organization_id, signature, row.sender_email, row.subject,
+                                row.first_seen or row.last_seen)
+            campaign.verdict = (row.attack_type, row.confidence_score or 0.0, row.severity or "low")
+            campaign.count = row.message_count or 1
+            campaign.last_seen = row.last_seen
+            campaign.stored = True
+            self.index.add(campaign)
+            loaded += 1
+        logger.info(f"Loaded {loaded} email campaigns into the LSH index")
+
+
+campaign_tracker = CampaignTracker()
+
+
+async def maintain_campaigns(tracker: CampaignTracker, interval_seconds: float):
+    """Background loop: write campaign changes and age out idle clusters every `interval_seconds`."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await tracker.flush()
+            tracker.expire()
+        except Exception:
+            logger.exception("Email campaign flush failed; retrying next interval")
@@ -1,42 +1,95 @@
-import re
-from typing import List, Tuple
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from app.services.email_rules import CompiledEmailRules, EmailRuleEngine, link_host, sender_domain
+from app.services.threat_index import threat_index
+
+class ContentVerdict(NamedTuple):
+    """Rule-stage result of analyze_content; small and picklable."""
+    attack_type: Optional[str]
+    confidence: float
+    severity: str
+    hosts: Tuple[str, ...]
+    sender_domain: str
+    spoofed: bool
 
 class EmailDetectionService:
     """
     Simple rule-based engine for Phase 0/2.
     Later can be replaced by ML.
+    Rules come from settings (EMAIL_*) and are compiled once; see email_rules.
     """
+
+    def __init__(self, rules: Optional[CompiledEmailRules] = None):
+        self.engine = EmailRuleEngine(rules)
     
-    def analyze_email(self, sender: str, subject: str, body: str, links: List[str]) -> Tuple[str, float, str]:
+    def analyze_email(self, sender: str, subject: str, body: str, links: List[str],
+                      attachment_hashes: Sequence[str] = ()) -> Tuple[str, float, str]:
         """
         Returns: (Attack Type, Confidence, Severity)
         If no attack, returns (None, 0.0, "low")
         """
+        return self.finalize(self.analyze_content(sender, subject, body, links), attachment_hashes)
+
+    def analyze_content(self, sender: str, subject: str, body: str, links: List[str]) -> ContentVerdict:
+        """
+        The CPU-bound, self-contained part of the analysis (keyword, link and
+        spoofing rules). Needs no process-local state such as the threat
+        index, so it can run in a worker process; see email_batch.
+        """
         severity = "low"
         confidence = 0.0
         attack_type = None
+        rules = self.engine.snapshot()
+        # Each distinct link is parsed once (and cached across mails)
+        hosts = [host for host in dict.fromkeys(map(link_host, links)) if host]
 
         # 1. Phishing Keywords
-        phishing_keywords = ["reset password", "urgent", "verify account", "bank", "invoice"]
-        keyword_hits = sum(1 for k in phishing_keywords if k in subject.lower() or k in body.lower())
-        
-        if keyword_hits >= 2:
+        if rules.keyword_hits(subject, body) >= rules.keyword_threshold:
             confidence += 0.4
             attack_type = "Potential Phishing"
             severity = "medium"
 
-        # 2. Suspicious Links
-        suspicious_domains = ["bit.ly", "tinyurl.com", ".xyz", ".top"]
-        for link in links:
-            if any(d in link for d in suspicious_domains):
-                confidence += 0.5
-                attack_type = "Malicious Link"
-                severity = "high"
+        # 2. Suspicious Links (shorteners, cheap TLDs), matched by host suffix
+        if any(rules.suspicious_host(host) for host in hosts):
+            confidence += 0.5
+            attack_type = "Malicious Link"
+            severity = "high"
+
+        domain = sender_domain(sender)
+        return ContentVerdict(attack_type, confidence, severity, tuple(hosts), domain,
+                              rules.spoofed_brand(sender, domain) is not None)
+
+    def finalize(self, content: ContentVerdict, attachment_hashes: Sequence[str] = ()) -> Tuple[str, float, str]:
+        """
+        Threat intel lookups on the content verdict's hosts and the
+        attachments' SHA-256 digests, then the final verdict.
+        """
+        attack_type, confidence, severity = content.attack_type, content.confidence, content.severity
+
+        # 2b. Links or sender domain listed in threat intel (IP, CIDR or domain suffix)
+        now = time.time()
+        for host in content.hosts + (content.sender_domain,):
+            if not host:
+                continue
+            match = threat_index.match_ip(host, now) or threat_index.match_domain(host, now)
+            if match:
+                confidence += max(match.confidence_at(now) / 100.0, 0.5)
+                attack_type = "Threat Intel Match"
+                severity = "critical"
                 break
-        
-        # 3. Spoofing Check (Simplified)
-        # If sender says "paypal" but domain is not paypal.com
-        if "paypal" in sender.lower() and "paypal.com" not in sender.lower():
+
+        # 2c. Attachments whose hash is a known-bad file indicator
+        for digest in attachment_hashes:
+            match = threat_index.match_hash(digest, now)
+            if match:
+                confidence += max(match.confidence_at(now) / 100.0, 0.5)
+                attack_type = "Malicious Attachment"
+                severity = "critical"
+                break
+
+        # 3. Spoofing Check
+        # Sender names a brand (e.g. "paypal") but its domain isn't the brand's
+        if content.spoofed:
              confidence = 0.9
              attack_type = "Brand Spoofing"
              severity = "critical"
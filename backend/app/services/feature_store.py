@@ -0,0 +1,231 @@
+import math
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.baseline_codec import ip_prefix
+
+HOUR_BINS = 24
+WEEKDAY_BINS = 7
+
+# Per-entity bounds: distinct values remembered, least recently seen evicted first
+MAX_PREFIXES = 32
+MAX_DEVICES = 8
+MAX_COUNTRIES = 8
+
+# Histogram half-life in events, failure-rate EWMA weight, request-rate time constant (s)
+HISTOGRAM_HALF_LIFE = 100.0
+FAILURE_ALPHA = 0.1
+REQUEST_RATE_TAU = 300.0
+
+_DECAY = 0.5 ** (1.0 / HISTOGRAM_HALF_LIFE)
+
+FeatureKey = Tuple[int, str, str]
+
+
+def _epoch(ts: datetime) -> float:
+    # Naive datetimes in this codebase are UTC (datetime.utcnow)
+    return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _touch(counter: "OrderedDict[str, int]", value: str, limit: int):
+    counter[value] = counter.pop(value, 0) + 1
+    if len(counter) > limit:
+        counter.popitem(last=False)
+
+
+class EntityFeatures:
+    """
+    Rolling aggregates for one entity. Every update is O(1) (a fixed 31-bin
+    decay plus bounded-dict touches) and the footprint is bounded no matter
+    how many events the entity produces.
+    """
+
+    __slots__ = ("hour_hist", "weekday_hist", "prefixes", "devices", "countries",
+                 "logins", "failures", "failure_rate", "request_rate", "request_ts",
+                 "first_seen", "last_seen")
+
+    def __init__(self):
+        self.hour_hist = array("d", bytes(8 * HOUR_BINS))
+        self.weekday_hist = array("d", bytes(8 * WEEKDAY_BINS))
+        self.prefixes: "OrderedDict[str, int]" = OrderedDict()
+        self.devices: "OrderedDict[str, int]" = OrderedDict()
+        self.countries: "OrderedDict[str, int]" = OrderedDict()
+        self.logins = 0
+        self.failures = 0
+        self.failure_rate = 0.0
+        self.request_rate = 0.0
+        self.request_ts = 0.0
+        self.first_seen = 0.0
+        self.last_seen = 0.0
+
+    def _seen(self, epoch: float):
+        if not self.first_seen:
+            self.first_seen = epoch
+        self.last_seen = max(self.last_seen, epoch)
+
+    def add_login(self, ts: datetime, ip: Optional[str], success: bool,
+                  device: Optional[str] = None, country: Optional[str] = None):
+        self._seen(_epoch(ts))
+        self.logins += 1
+        self.failure_rate += FAILURE_ALPHA * ((0.0 if success else 1.0) - self.failure_rate)
+        if not success:
+            self.failures += 1
+            return
+
+        # Time-of-use histograms only learn from successful logins
+        hours, days = self.hour_hist, self.weekday_hist
+        for i in range(HOUR_BINS):
+            hours[i] *= _DECAY
+        for i in range(WEEKDAY_BINS):
+            days[i] *= _DECAY
+        hour = ts.hour + ts.minute / 60.0
+        low = int(hour) % HOUR_BINS
+        frac = hour - int(hour)
+        hours[low] += 1.0 - frac
+        hours[(low + 1) % HOUR_BINS] += frac
+        days[ts.weekday()] += 1.0
+
+        if ip:
+            _touch(self.prefixes, ip_prefix(ip), MAX_PREFIXES)
+        if device:
+            _touch(self.devices, device, MAX_DEVICES)
+        if country:
+            _touch(self.countries, country, MAX_COUNTRIES)
+
+    def add_device(self, device: str):
+        _touch(self.devices, device, MAX_DEVICES)
+
+    def add_country(self, country: str):
+        _touch(self.countries, country, MAX_COUNTRIES)
+
+    def add_request(self, epoch: float):
+        self._seen(epoch)
+        if self.request_ts:
+            self.request_rate *= math.exp(-max(epoch - self.request_ts, 0.0) / REQUEST_RATE_TAU)
+        self.request_rate += 1.0
+        self.request_ts = max(self.request_ts, epoch)
+
+    # --- reads ---
+
+    @property
+    def successes(self) -> int:
+        return self.logins - self.failures
+
+    def weekday_density(self, weekday: int) -> float:
+        """Share of `weekday` relative to a uniform week (1.0 == uniform)."""
+        total = sum(self.weekday_hist)
+        if not total:
+            return 1.0
+        return (self.weekday_hist[weekday] + 0.1) / (total + 0.1 * WEEKDAY_BINS) * WEEKDAY_BINS
+
+    def requests_per_minute(self, now: Optional[float] = None) -> float:
+        if not self.request_ts:
+            return 0.0
+        now = now or time.time()
+        decayed = self.request_rate * math.exp(-max(now - self.request_ts, 0.0) / REQUEST_RATE_TAU)
+        return decayed * 60.0 / REQUEST_RATE_TAU
+
+    def knows_prefix(self, ip: str) -> bool:
+        return ip_prefix(ip) in self.prefixes
+
+    def knows_device(self, device: str) -> bool:
+        return device in self.devices
+
+    def knows_country(self, country: str) -> bool:
+        return country in self.countries
+
+    def snapshot(self) -> dict:
+        return {
+            "logins": self.logins,
+            "failures": self.failures,
+            "failure_rate": round(self.failure_rate, 4),
+            "requests_per_minute": round(self.requests_per_minute(), 3),
+            "hour_hist": [round(v, 3) for v in self.hour_hist],
+            "weekday_hist": [round(v, 3) for v in self.weekday_hist],
+            "ip_prefixes": dict(self.prefixes),
+            "devices": len(self.devices),
+            "countries": dict(self.countries),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+        }
+
+
+class FeatureStore:
+    """
+    Process-local, LRU-bounded map of (org_id, entity_type, entity_id) to
+    EntityFeatures, updated on ingest and read by anomaly scoring, the risk
+    engine and forecasting with a single lookup.
+
+    entity_type is "user" (our users, by id), "account" (usernames seen in
+    monitored login logs) or "ip" (web traffic sources).
+    """
+
+    def __init__(self, max_entities: int = 50000):
+        self.max_entities = max_entities
+        self._entities: "OrderedDict[FeatureKey, EntityFeatures]" = OrderedDict()
+        self._by_org: Dict[int, Set[FeatureKey]] = {}
+        self.evictions = 0
+
+    def get(self, org_id: int, entity_type: str, entity_id) -> Optional[EntityFeatures]:
+        return self._entities.get((org_id, entity_type, str(entity_id)))
+
+    def _entity(self, org_id: int, entity_type: str, entity_id) -> EntityFeatures:
+        key = (org_id, entity_type, str(entity_id))
+        features = self._entities.get(key)
+        if features is not None:
+            self._entities.move_to_end(key)
+            return features
+        features = self._entities[key] = EntityFeatures()
+        self._by_org.setdefault(org_id, set()).add(key)
+        while len(self._entities) > self.max_entities:
+            evicted, _ = self._entities.popitem(last=False)
+            self._by_org.get(evicted[0], set()).discard(evicted)
+            self.evictions += 1
+        return features
+
+    def record_login(self, org_id: int, entity_type: str, entity_id, ts: datetime, ip: Optional[str],
+                     success: bool, device: Optional[str] = None, country: Optional[str] = None):
+        self._entity(org_id, entity_type, entity_id).add_login(ts, ip, success, device, country)
+
+    def record_request(self, org_id: int, entity_type: str, entity_id, ts: datetime):
+        self._entity(org_id, entity_type, entity_id).add_request(_epoch(ts))
+
+    def record_device(self, org_id: int, entity_type: str, entity_id, device: str):
+        self._entity(org_id, entity_type, entity_id).add_device(device)
+
+    def record_country(self, org_id: int, entity_type: str, entity_id, country: str):
+        self._entity(org_id, entity_type, entity_id).add_country(country)
+
+    def org_summary(self, org_id: int, min_logins: int = 5, failing_rate: float = 0.5) -> dict:
+        """Org-wide pressure indicators for forecasting."""
+        failing = 0
+        requests_per_minute = 0.0
+        keys = self._by_org.get(org_id, ())
+        now = time.time()
+        for key in keys:
+            features = self._entities.get(key)
+            if features is None:
+                continue
+            if features.logins >= min_logins and features.failure_rate >= failing_rate:
+                failing += 1
+            requests_per_minute += features.requests_per_minute(now)
+        return {
+            "entities": len(keys),
+            "failing_accounts": failing,
+            "requests_per_minute": round(requests_per_minute, 3),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "entities": len(self._entities),
+            "max_entities": self.max_entities,
+            "orgs": len(self._by_org),
+            "evictions": self.evictions,
+        }
+
+
+feature_store = FeatureStore(max_entities=settings.FEATURE_STORE_MAX_ENTITIES)
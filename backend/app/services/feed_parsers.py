@@ -0,0 +1,340 @@
+import csv
+import ipaddress
+import json
+import re
+import socket
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.ip_address import parse_address
+
+# Indicators handed to the upsert path at a time; bounds peak memory
+FEED_CHUNK_SIZE = 5000
+# Characters read from a STIX file per refill
+STIX_READ_SIZE = 64 * 1024
+
+FEED_FORMATS = ("stix", "csv", "txt")
+
+_HASH_LENGTHS = {32: "FILE_HASH", 40: "FILE_HASH", 64: "FILE_HASH", 128: "FILE_HASH"}
+_HEX = re.compile(r"^[0-9a-fA-F]+$")
+_DOMAIN = re.compile(r"^(?=.{1,253}$)(\*\.)?([a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{0,62}$")
+_URL = re.compile(r"^[a-z][a-z0-9+.-]*://\S+$", re.IGNORECASE)
+# Tokens that matter when looking for the end of a JSON value (see _ValueEnd)
+_JSON_STRUCTURE = re.compile(r'[\[\]{}"]')
+_JSON_STRING_END = re.compile(r'["\\]')
+_JSON_SCALAR_END = re.compile(r"[,\]}\s]")
+
+# STIX pattern comparison: [object-type:property.path = 'value']
+_STIX_COMPARISON = re.compile(r"([a-z0-9-]+):([\w.'-]+)\s*=\s*'((?:\\.|[^'\\])*)'")
+_STIX_TYPES = {
+    "ipv4-addr": "IP",
+    "ipv6-addr": "IP",
+    "domain-name": "DOMAIN",
+    "url": "URL",
+    "file": "FILE_HASH",
+}
+
+# CSV header names understood for each field, first match wins
+_CSV_COLUMNS = {
+    "value": ("value", "indicator", "ioc", "ip", "domain", "url", "hash", "observable"),
+    "type": ("type", "indicator_type", "ioc_type", "kind"),
+    "desc": ("desc", "description", "comment", "comments", "threat", "tags"),
+}
+
+
+def detect_indicator_type(value: str) -> Optional[str]:
+    """IP (host or CIDR), FILE_HASH, URL or DOMAIN; None if it looks like none of them."""
+    host = value.split("/", 1)[0] if "/" in value and "://" not in value else value
+    if parse_address(host) is not None:
+        return "IP"
+    if _HEX.match(value) and len(value) in _HASH_LENGTHS:
+        return "FILE_HASH"
+    if _URL.match(value):
+        return "URL"
+    if _DOMAIN.match(value.lower().rstrip(".")):
+        return "DOMAIN"
+    return None
+
+
+def _canonical_host(version: int, value: int) -> str:
+    if version == 4:
+        return socket.inet_ntop(socket.AF_INET, value.to_bytes(4, "big"))
+    return socket.inet_ntop(socket.AF_INET6, value.to_bytes(16, "big"))
+
+
+def normalize_indicator(item: Dict) -> Optional[Dict]:
+    """
+    Validated {"value", "type", "desc"} with a canonical value (compressed
+    IPs and networks, lower-case domains and hashes), or None if invalid.
+    A missing type is detected from the value.
+    """
+    value = (item.get("value") or "").strip()
+    if not value:
+        return None
+    detected = detect_indicator_type(value)
+    kind = (item.get("type") or detected or "").upper()
+    if kind in ("IP", "IPV4", "IPV6", "CIDR"):
+        if detected != "IP":
+            return None
+        parsed = parse_address(value) if "/" not in value else None
+        if parsed is not None:
+            # Plain hosts (the common case) skip ipaddress entirely
+            value = _canonical_host(*parsed)
+        else:
+            try:
+                network = ipaddress.ip_network(value, strict=False)
+            except ValueError:
+                return None
+            value = str(network.network_address) if network.prefixlen == network.max_prefixlen else str(network)
+        kind = "IP"
+    elif kind in ("DOMAIN", "HOSTNAME", "FQDN"):
+        if detected != "DOMAIN":
+            return None
+        value = value.lower().rstrip(".")
+        kind = "DOMAIN"
+    elif kind in ("FILE_HASH", "HASH", "MD5", "SHA1", "SHA256"):
+        if detected != "FILE_HASH":
+            return None
+        value = value.lower()
+        kind = "FILE_HASH"
+    elif not kind:
+        return None
+    desc = item.get("desc")
+    return {"value": value, "type": kind, "desc": desc.strip()[:500] if isinstance(desc, str) and desc.strip() else None}
+
+
+def parse_plaintext(lines: Iterable[str]) -> Iterator[Dict]:
+    """One indicator per line; blank lines and #/; comment lines are skipped."""
+    for line in lines:
+        line = line.strip()
+        if line and line[0] not in "#;":
+            # Tolerate "value<whitespace>trailing comment" lists
+            yield {"value": line.split(None, 1)[0]}
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    CSV with a header row naming the value (and optionally type and
+    description) columns; without a recognisable header the first column is
+    the value and the rest is ignored.
+    """
+    reader = csv.reader(line for line in lines if not line.startswith("#"))
+    first = next(reader, None)
+    if first is None:
+        return
+    header = [cell.strip().lower() for cell in first]
+    columns = {
+        field: next((header.index(name) for name in names if name in header), None)
+        for field, names in _CSV_COLUMNS.items()
+    }
+    if columns["value"] is None:
+        columns = {"value": 0, "type": None, "desc": None}
+        rows = _chain_first(first, reader)
+    else:
+        rows = reader
+
+    value_col, type_col, desc_col = columns["value"], columns["type"], columns["desc"]
+    for row in rows:
+        if len(row) <= value_col:
+            continue
+        item = {"value": row[value_col]}
+        if type_col is not None and len(row) > type_col:
+            item["type"] = row[type_col].strip()
+        if desc_col is not None and len(row) > desc_col:
+            item["desc"] = row[desc_col]
+        yield item
+
+
+def _chain_first(first: List[str], rest: Iterator[List[str]]) -> Iterator[List[str]]:
+    yield first
+    yield from rest
+
+
+class _ValueEnd:
+    """
+    Finds where one JSON value ends in a buffer that grows between calls,
+    resuming where the previous call stopped, so a value spanning many
+    reads is scanned once in total. Only brackets, braces and string
+    quotes are tracked; the value itself is decoded (and validated) by
+    json once it is complete.
+    """
+
+    def begin(self, buf: str, start: int):
+        first = buf[start]
+        self.scalar = first not in "{[\""
+        self.in_string = first == '"'
+        self.depth = 1 if first in "{[" else 0
+        self.pos = start if self.scalar else start + 1
+
+    def shift(self, offset: int):
+        self.pos -= offset
+
+    def end(self, buf: str) -> Optional[int]:
+        """Index just past the value, or None if the buffer does not hold all of it yet."""
+        pos = self.pos
+        if self.scalar:
+            match = _JSON_SCALAR_END.search(buf, pos)
+            self.pos = len(buf) if match is None else match.start()
+            return None if match is None else match.start()
+        while True:
+            if self.in_string:
+                match = _JSON_STRING_END.search(buf, pos)
+                if match is None:
+                    self.pos = len(buf)
+                    return None
+                if match.group() == "\\":
+                    if match.end() >= len(buf):
+                        # The escaped character is in the next read
+                        self.pos = match.start()
+                        return None
+                    pos = match.end() + 1
+                    continue
+                self.in_string = False
+                pos = match.end()
+                if not self.depth:
+                    return pos
+                continue
+            match = _JSON_STRUCTURE.search(buf, pos)
+            if match is None:
+                self.pos = len(buf)
+                return None
+            pos = match.end()
+            token = match.group()
+            if token == '"':
+                self.in_string = True
+            elif token in "{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if not self.depth:
+                    return pos
+
+
+def iter_json_array(fp: IO[str], key: str = "objects", read_size: int = STIX_READ_SIZE) -> Iterator[Dict]:
+    """
+    Yields the elements of the top-level `key` array of a JSON document one
+    at a time, holding only the current element and one read buffer. An
+    element the buffer does not hold whole is decoded again only once its
+    closing token has been read, so large elements cost linear time.
+    """
+    decoder = json.JSONDecoder()
+    opening = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buf = ""
+    while True:
+        match = opening.search(buf)
+        if match:
+            buf = buf[match.end():]
+            break
+        chunk = fp.read(read_size)
+        if not chunk:
+            return
+        # Keep a tail in case the key straddles two reads
+        buf = buf[-len(key) - 16:] + chunk
+
+    pos = 0
+    eof = False
+    value = _ValueEnd()
+    scanning = False
+    while True:
+        if not scanning:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf):
+                if buf[pos] == "]":
+                    return
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    end = None
+                # A number cut by the end of the buffer ("-15" of "-15.5e3") also
+                # decodes; only trust a value followed by a delimiter
+                if end is not None and (eof or end < len(buf) and buf[end] in " \t\r\n,]}"):
+                    yield obj
+                    pos = end
+                    continue
+                # Incomplete (or malformed): wait for its closing token before decoding again
+                value.begin(buf, pos)
+                scanning = True
+        end = value.end(buf) if scanning else None
+        if end is None:
+            if eof:
+                raise ValueError(f"Truncated or malformed JSON array '{key}'")
+            chunk = fp.read(read_size)
+            eof = not chunk
+            if scanning:
+                value.shift(pos)
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            raise ValueError(f"Truncated or malformed JSON array '{key}'")
+        yield obj
+        pos = end
+        scanning = False
+
+
+def _stix_indicators(obj: Dict) -> Iterator[Dict]:
+    kind = obj.get("type")
+    desc = obj.get("description") or obj.get("name")
+    if kind == "indicator":
+        if obj.get("pattern_type", "stix") != "stix":
+            return
+        for object_type, path, value in _STIX_COMPARISON.findall(obj.get("pattern", "")):
+            mapped = _STIX_TYPES.get(object_type)
+            if mapped is None or (object_type == "file" and not path.startswith("hashes")):
+                continue
+            if object_type != "file" and path != "value":
+                continue
+            yield {"value": value.replace("\\'", "'").replace("\\\\", "\\"), "type": mapped, "desc": desc}
+    elif kind in _STIX_TYPES and kind != "file" and obj.get("value"):
+        # Bare cyber-observable objects
+        yield {"value": obj["value"], "type": _STIX_TYPES[kind], "desc": desc}
+
+
+def parse_stix(fp: IO[str]) -> Iterator[Dict]:
+    """
+    Indicators from a STIX 2.1 bundle: `indicator` objects with STIX
+    patterns (every ipv4/ipv6/domain/url value and file hash comparison in
+    the pattern) and bare ipv4-addr / ipv6-addr / domain-name / url objects.
+    Other objects are skipped.
+    """
+    for obj in iter_json_array(fp, "objects"):
+        if isinstance(obj, dict):
+            yield from _stix_indicators(obj)
+
+
+def parse_feed(fp: IO[str], fmt: str) -> Iterator[Dict]:
+    if fmt == "stix":
+        return parse_stix(fp)
+    if fmt == "csv":
+        return parse_csv(fp)
+    if fmt == "txt":
+        return parse_plaintext(fp)
+    raise ValueError(f"Unknown feed format '{fmt}', expected one of {FEED_FORMATS}")
+
+
+def guess_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith(".json") or "json" in content_type:
+        return "stix"
+    if name.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    return "txt"
+
+
+def normalized_chunks(items: Iterable[Dict], chunk_size: int = FEED_CHUNK_SIZE) -> Iterator[Tuple[List[Dict], int]]:
+    """
+    Groups parsed items into (indicators, rejected) pairs: at most
+    `chunk_size` items are consumed per pair, valid ones normalized and
+    invalid ones only counted.
+    """
+    items = iter(items)
+    while True:
+        raw = list(islice(items, chunk_size))
+        if not raw:
+            return
+        chunk = [indicator for indicator in map(normalize_indicator, raw) if indicator is not None]
+        yield chunk, len(raw) - len(chunk)
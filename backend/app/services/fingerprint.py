@@ -9,7 +9,8 @@ class FingerprintService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    def generate_hash(self, user_agent: str, ip_address: str, client_data: Optional[Dict] = None) -> str:
+    @staticmethod
+    def generate_hash(user_agent: str, ip_address: str, client_data: Optional[Dict] = None) -> str:
         """
         Create a consistent hash from device attributes.
         Ideally uses more client-side signals (screen res, timezone, canvas hash) if available.
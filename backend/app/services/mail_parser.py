@@ -0,0 +1,314 @@
+import hashlib
+import logging
+import re
+from dataclasses import dataclass, field
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesFeedParser
+from email.utils import getaddresses
+from functools import partial
+from html.parser import HTMLParser
+from typing import IO, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Longest piece read at once (longer physical lines arrive in pieces), and
+# roughly how much is fed to the parser per call
+LINE_LIMIT = 64 * 1024
+# Body text (plain + HTML text) kept for analysis, and links collected, per message
+MAX_TEXT_CHARS = 100_000
+MAX_LINKS = 500
+
+MAIL_FORMATS = ("eml", "mbox")
+
+_URL = re.compile(r"https?://[^\s<>\"'()\[\]{}]+", re.IGNORECASE)
+_URL_TRAILING = ".,;:!?"
+_MBOXRD_FROM = re.compile(rb"^>+From ")
+
+
+@dataclass(frozen=True)
+class AttachmentDigest:
+    filename: Optional[str]
+    content_type: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class ParsedMail:
+    sender: str = ""
+    recipient: str = ""
+    subject: str = ""
+    body: str = ""
+    links: List[str] = field(default_factory=list)
+    attachments: List[AttachmentDigest] = field(default_factory=list)
+    # Body text or links were cut at MAX_TEXT_CHARS / MAX_LINKS
+    truncated: bool = False
+    # Set, with the other fields left empty, when the message could not be parsed
+    error: Optional[str] = None
+
+
+class _LineReader:
+    """
+    Bounded line pieces of one message at a time. In mbox mode a "From "
+    line after a blank line ends the current message (mboxrd ">From "
+    lines are unescaped); otherwise the message runs to EOF.
+
+    The stdlib `mailbox` module needs a seekable file it can index up front,
+    so mbox splitting stays here; everything inside a message is left to
+    the email feed parser.
+    """
+
+    def __init__(self, fp: IO[bytes], mbox: bool):
+        self.fp = fp
+        self.mbox = mbox
+        # Whether the next piece starts a physical line
+        self.at_line_start = True
+        self._prev_blank = True
+        self.message_done = False
+        self.eof = False
+        self._pushback: Optional[bytes] = None
+        if mbox:
+            first = fp.readline(LINE_LIMIT)
+            # The envelope line of the first message; without one the data starts right away
+            if not first.startswith(b"From "):
+                self._pushback = first
+            self.at_line_start = first.endswith(b"\n") or self._pushback is not None
+
+    def start_message(self):
+        self.message_done = False
+        self._prev_blank = True
+
+    def readline(self) -> bytes:
+        """Next piece of the current message, b"" at its end."""
+        if self.message_done:
+            return b""
+        if self._pushback is not None:
+            line, self._pushback = self._pushback, None
+        else:
+            line = self.fp.readline(LINE_LIMIT)
+        if not line:
+            self.eof = self.message_done = True
+            return b""
+        at_start = self.at_line_start
+        self.at_line_start = line.endswith(b"\n")
+        if self.mbox and at_start:
+            if self._prev_blank and line.startswith(b"From "):
+                self.message_done = True
+                return b""
+            if line.startswith(b">") and _MBOXRD_FROM.match(line):
+                line = line[1:]
+        self._prev_blank = at_start and (line == b"\n" or line == b"\r\n")
+        return line
+
+    def chunks(self) -> Iterator[bytes]:
+        """The rest of the current message in batches of about LINE_LIMIT bytes."""
+        pending: List[bytes] = []
+        size = 0
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            pending.append(line)
+            size += len(line)
+            if size >= LINE_LIMIT:
+                yield b"".join(pending)
+                pending, size = [], 0
+        if pending:
+            yield b"".join(pending)
+
+
+class _Collector:
+    """Accumulates one message's text, links and attachment digests within the caps."""
+
+    def __init__(self, mail: ParsedMail):
+        self.mail = mail
+        self.texts: List[str] = []
+        self.chars = 0
+        self.links: Dict[str, None] = {}
+
+    def add_text(self, text: str):
+        for match in _URL.finditer(text):
+            self.add_link(match.group().rstrip(_URL_TRAILING))
+        room = MAX_TEXT_CHARS - self.chars
+        if room <= 0:
+            self.mail.truncated = self.mail.truncated or bool(text.strip())
+            return
+        if len(text) > room:
+            text = text[:room]
+            self.mail.truncated = True
+        self.texts.append(text)
+        self.chars += len(text)
+
+    def add_link(self, link: str):
+        if link and link not in self.links:
+            if len(self.links) >= MAX_LINKS:
+                self.mail.truncated = True
+                return
+            self.links[link] = None
+
+    def finish(self) -> ParsedMail:
+        self.mail.body = "".join(self.texts).strip()
+        self.mail.links = list(self.links)
+        return self.mail
+
+
+def _decode_text(data: bytes, charset: Optional[str]) -> str:
+    """A text part's decoded body with CRLF line ends normalized to LF."""
+    try:
+        text = data.decode(charset or "utf-8", errors="replace")
+    except (LookupError, ValueError):
+        # Unknown names, and names codecs rejects outright (e.g. with a NUL)
+        text = data.decode("utf-8", errors="replace")
+    return text.replace("\r\n", "\n")
+
+
+class _HTMLText(HTMLParser):
+    """Visible text and <a>/<area> hrefs of an HTML part, fed incrementally."""
+
+    _SKIP = ("script", "style")
+
+    def __init__(self, collector: _Collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("a", "area"):
+            for name, value in attrs:
+                if name == "href" and value and "://" in value:
+                    self.collector.add_link(value.strip())
+        elif tag in self._SKIP:
+            self._skipping += 1
+        elif tag in ("br", "p", "div", "tr", "li"):
+            self.collector.add_text("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.collector.add_text(data)
+
+
+# --- parts ---
+
+def _consume_part(collector: _Collector, part: EmailMessage):
+    """
+    Fold one finished leaf part into the collector: attachments (by
+    disposition, file name or non-text type) are hashed, text and HTML
+    parts contribute text and links.
+    """
+    content_type = part.get_content_type()
+    filename = part.get_filename()
+    # Undoes base64 / quoted-printable / uuencode, leniently
+    data = part.get_payload(decode=True) or b""
+    if (part.get_content_disposition() == "attachment" or filename
+            or part.get_content_maintype() not in ("text", "multipart")):
+        collector.mail.attachments.append(
+            AttachmentDigest(filename, content_type, len(data), hashlib.sha256(data).hexdigest())
+        )
+    elif content_type == "text/html":
+        parser = _HTMLText(collector)
+        parser.feed(_decode_text(data, part.get_content_charset()))
+        parser.close()
+        collector.add_text("\n")
+    else:
+        # Also a multipart whose boundary is missing or never appears: the
+        # parser hands over its body as text
+        collector.add_text(_decode_text(data, part.get_content_charset()) + "\n")
+
+
+class _StreamedPart(EmailMessage):
+    """
+    Message factory for the feed parser. The parser sets a leaf's payload
+    once it has read the whole part; that body is consumed right away and
+    dropped, so a message's parts are never held together and only the
+    part being read is in memory.
+    """
+
+    def __init__(self, collector: _Collector, policy=None):
+        super().__init__(policy)
+        self._collector = collector
+
+    def set_payload(self, payload, charset=None):
+        super().set_payload(payload, charset)
+        if isinstance(payload, str):
+            try:
+                _consume_part(self._collector, self)
+            finally:
+                super().set_payload("")
+
+
+def _header(headers, name: str) -> str:
+    try:
+        return str(headers.get(name, "") or "")
+    except Exception:
+        return ""
+
+
+def _parse_one(reader: _LineReader) -> ParsedMail:
+    mail = ParsedMail()
+    collector = _Collector(mail)
+    parser = BytesFeedParser(_factory=partial(_StreamedPart, collector), policy=policy.default)
+    for chunk in reader.chunks():
+        parser.feed(chunk)
+    headers = parser.close()
+    recipients = getaddresses([_header(headers, "To")])
+    mail.sender = _header(headers, "From")
+    mail.recipient = recipients[0][1] if recipients else ""
+    mail.subject = _header(headers, "Subject")
+    return collector.finish()
+
+
+def _parse_or_skip(reader: _LineReader) -> ParsedMail:
+    """
+    _parse_one, but a message that breaks the parser is read past and
+    returned as an error placeholder, so the rest of an archive still
+    parses. Read errors from the stream itself still propagate.
+    """
+    try:
+        return _parse_one(reader)
+    except Exception as exc:
+        logger.warning(f"Skipping malformed message: {exc!r}")
+        while reader.readline():
+            pass
+        return ParsedMail(error=f"{type(exc).__name__}: {exc}")
+
+
+def parse_eml(fp: IO[bytes]) -> ParsedMail:
+    """One RFC 822 message from a binary stream, read in bounded pieces."""
+    return _parse_one(_LineReader(fp, mbox=False))
+
+
+def iter_mbox(fp: IO[bytes]) -> Iterator[ParsedMail]:
+    """
+    Messages of an mbox (mboxo/mboxrd) archive one at a time; only the
+    current message's capped text, links and digests are held. Messages
+    the parser cannot handle come back with `error` set.
+    """
+    reader = _LineReader(fp, mbox=True)
+    while not reader.eof:
+        reader.start_message()
+        mail = _parse_or_skip(reader)
+        if mail.error or mail.sender or mail.subject or mail.body or mail.attachments:
+            yield mail
+
+
+def _iter_eml(fp: IO[bytes]) -> Iterator[ParsedMail]:
+    # Lazily, so the caller decides where parsing runs
+    yield _parse_or_skip(_LineReader(fp, mbox=False))
+
+
+def iter_mail(fp: IO[bytes], fmt: str) -> Iterator[ParsedMail]:
+    if fmt == "eml":
+        return _iter_eml(fp)
+    if fmt == "mbox":
+        return iter_mbox(fp)
+    raise ValueError(f"Unknown mail format '{fmt}', expected one of {MAIL_FORMATS}")
+
+
+def guess_mail_format(filename: Optional[str]) -> str:
+    name = (filename or "").lower()
+    return "mbox" if name.endswith((".mbox", ".mbx")) or name.rsplit("/", 1)[-1] == "mbox" else "eml"
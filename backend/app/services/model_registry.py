@@ -0,0 +1,165 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import LatencyHistogram
+
+FIT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Python-object overhead per fitted estimator on top of its numpy arrays.
+_ESTIMATOR_OVERHEAD_BYTES = 1024
+
+
+def estimate_model_bytes(model) -> int:
+    """
+    Approximate resident size of a fitted tree ensemble from its node arrays
+    (what dominates an IsolationForest), without pickling it.
+    """
+    total = 0
+    for estimator in getattr(model, "estimators_", ()):
+        tree = getattr(estimator, "tree_", None)
+        if tree is None:
+            continue
+        state = tree.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes + _ESTIMATOR_OVERHEAD_BYTES
+    for features in getattr(model, "estimators_features_", ()):
+        total += getattr(features, "nbytes", 0)
+    return total or _ESTIMATOR_OVERHEAD_BYTES
+
+
+class _Entry:
+    __slots__ = ("version", "model", "nbytes")
+
+    def __init__(self, version: int, model: Any, nbytes: int):
+        self.version = version
+        self.model = model
+        self.nbytes = nbytes
+
+
+class ModelRegistry:
+    """
+    Process-local cache of fitted per-profile models.
+
+    Entries are keyed by `(org_id, entity_type, entity_id)` and tagged with a
+    version, the baseline's training epoch (see anomaly.model_epoch); a
+    lookup with a newer version refits, so a model is only rebuilt after
+    enough new logins changed the data.
+    Eviction is LRU, bounded by both entry count and estimated bytes.
+
+    Fitting and scoring run on a small thread pool so they never block the
+    event loop. Concurrent misses for the same key/version share one fit,
+    which keeps running if the caller that started it is cancelled.
+    """
+
+    def __init__(self, max_entries: int = 5000, max_bytes: int = 256 * 1024 * 1024, workers: int = 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Tuple[Hashable, int], asyncio.Task] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fit_time = LatencyHistogram(FIT_BUCKETS_MS)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="model-fit")
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """Run CPU-bound model work (e.g. scoring) off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), fn, *args)
+
+    async def get_or_fit(self, key: Hashable, version: int, fit: Callable[[], Any]):
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.model
+
+        self.misses += 1
+        inflight_key = (key, version)
+        task = self._inflight.get(inflight_key)
+        if task is None:
+            # The fit is owned by a task, not by the first caller: a caller that
+            # is cancelled stops waiting without failing the fit for the others.
+            task = asyncio.get_running_loop().create_task(self._fit(key, version, fit))
+            task.add_done_callback(lambda done: self._fit_done(inflight_key, done))
+            self._inflight[inflight_key] = task
+        return await asyncio.shield(task)
+
+    async def _fit(self, key: Hashable, version: int, fit: Callable[[], Any]):
+        model, nbytes, elapsed_ms = await self.run(self._timed_fit, fit)
+        self.fit_time.observe(elapsed_ms)
+        self._store(key, version, model, nbytes)
+        return model
+
+    def _fit_done(self, inflight_key: Tuple[Hashable, int], task: asyncio.Task):
+        self._inflight.pop(inflight_key, None)
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody waits for anymore doesn't log a warning.
+            task.exception()
+
+    @staticmethod
+    def _timed_fit(fit: Callable[[], Any]):
+        start = time.perf_counter()
+        model = fit()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return model, estimate_model_bytes(model), elapsed_ms
+
+    def _store(self, key: Hashable, version: int, model: Any, nbytes: int):
+        current = self._entries.get(key)
+        if current is not None:
+            # A slower fit of an older baseline must not replace a newer one.
+            if current.version > version:
+                return
+            self.bytes -= current.nbytes
+            del self._entries[key]
+        self._entries[key] = _Entry(version, model, nbytes)
+        self.bytes += nbytes
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "fit_time": self.fit_time.snapshot(),
+        }
+
+
+model_registry = ModelRegistry(
+    max_entries=settings.ANOMALY_MODEL_CACHE_MAX_ENTRIES,
+    max_bytes=settings.ANOMALY_MODEL_CACHE_MAX_BYTES,
+    workers=settings.ANOMALY_MODEL_WORKERS,
+)
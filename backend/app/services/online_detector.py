@@ -0,0 +1,132 @@
+import math
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+HOUR_BINS = 24
+
+
+class HourOfDaySketch:
+    """
+    Streaming hour-of-day density for one entity.
+
+    The state is an exponentially decayed circular histogram of login hours:
+    each login is split linearly between its two neighbouring hour bins, all
+    bins decay by `0.5 ** (1 / half_life)` per login, and scoring smooths the
+    histogram with a small circular kernel. Updating and scoring are O(24),
+    i.e. constant per event, and need no model fit.
+
+    A login is anomalous when its smoothed probability is below `threshold`
+    times the uniform probability (1/24).
+
+    The state is a plain JSON-friendly dict so it can live inside
+    BehavioralProfile.baseline_data next to the raw history.
+    """
+
+    def __init__(self, half_life: float = 100.0, threshold: float = 0.25, prior: float = 0.1,
+                 kernel: Tuple[float, float, float] = (0.25, 0.5, 0.25)):
+        self.decay = 0.5 ** (1.0 / half_life)
+        self.threshold = threshold
+        self.prior = prior
+        self.kernel = kernel
+
+    @staticmethod
+    def new_state() -> dict:
+        return {"n": 0, "hist": [0.0] * HOUR_BINS}
+
+    @staticmethod
+    def _split(hour: float) -> Tuple[int, int, float]:
+        hour = hour % HOUR_BINS
+        low = int(hour)
+        frac = hour - low
+        return low, (low + 1) % HOUR_BINS, frac
+
+    def update(self, state: Optional[dict], hour: float) -> dict:
+        if not state:
+            state = self.new_state()
+        decay = self.decay
+        hist = [v * decay for v in state["hist"]]
+        low, high, frac = self._split(hour)
+        hist[low] += 1.0 - frac
+        hist[high] += frac
+        return {"n": state["n"] + 1, "hist": hist}
+
+    def update_many(self, state: Optional[dict], hours: Sequence[float]) -> dict:
+        """
+        Folds `hours` (oldest first) in one vectorized step; equivalent to
+        calling update() for each, used by bulk backfills.
+        """
+        if not state:
+            state = self.new_state()
+        hours = np.mod(np.asarray(hours, dtype=float), HOUR_BINS)
+        k = len(hours)
+        if not k:
+            return state
+        # The i-th of k new logins has decayed k-1-i times by the end
+        weights = self.decay ** np.arange(k - 1, -1, -1, dtype=float)
+        low = hours.astype(int)
+        frac = hours - low
+        hist = np.asarray(state["hist"], dtype=float) * self.decay ** k
+        np.add.at(hist, low, weights * (1.0 - frac))
+        np.add.at(hist, (low + 1) % HOUR_BINS, weights * frac)
+        return {"n": state["n"] + k, "hist": hist.tolist()}
+
+    def seed(self, hours: Iterable[float]) -> dict:
+        """Build a state from an existing login-hour history, oldest first."""
+        state = self.new_state()
+        for hour in hours:
+            state = self.update(state, hour)
+        return state
+
+    def _bin_probability(self, hist, total: float, index: int) -> float:
+        left, mid, right = self.kernel
+        smoothed = (left * hist[index - 1]
+                    + mid * hist[index]
+                    + right * hist[(index + 1) % HOUR_BINS])
+        return (smoothed + self.prior) / (total + HOUR_BINS * self.prior)
+
+    def relative_density(self, state: dict, hour: float) -> float:
+        """Probability of `hour` relative to a uniform day (1.0 == uniform)."""
+        hist = state["hist"]
+        total = math.fsum(hist)
+        low, high, frac = self._split(hour)
+        p = ((1.0 - frac) * self._bin_probability(hist, total, low)
+             + frac * self._bin_probability(hist, total, high))
+        return p * HOUR_BINS
+
+    def score(self, state: dict, hour: float) -> Tuple[bool, float]:
+        """
+        Returns (is_time_anomaly, score 0-100) on the same scale as the
+        IsolationForest path: anomalies land in 50-100, normal logins at 10.
+        """
+        density = self.relative_density(state, hour)
+        if density < self.threshold:
+            return True, min(max(50.0 + 50.0 * (1.0 - density / self.threshold), 50.0), 100.0)
+        return False, 10.0
+
+    # --- Vectorized scoring (many entities, many logins) ---
+
+    def bin_probabilities(self, states: List[dict]) -> np.ndarray:
+        """Smoothed per-bin probabilities, one row per state: shape (len(states), 24)."""
+        hists = np.array([state["hist"] for state in states], dtype=float).reshape(-1, HOUR_BINS)
+        left, mid, right = self.kernel
+        smoothed = left * np.roll(hists, 1, axis=1) + mid * hists + right * np.roll(hists, -1, axis=1)
+        totals = hists.sum(axis=1, keepdims=True)
+        return (smoothed + self.prior) / (totals + HOUR_BINS * self.prior)
+
+    def score_many(self, probabilities: np.ndarray, rows: np.ndarray, hours: np.ndarray):
+        """
+        Scores logins `hours[i]` against state `rows[i]` of `probabilities`.
+        Returns (is_time_anomaly bool array, score array) matching score().
+        """
+        hours = np.mod(hours, HOUR_BINS)
+        low = hours.astype(int)
+        frac = hours - low
+        high = (low + 1) % HOUR_BINS
+        density = ((1.0 - frac) * probabilities[rows, low] + frac * probabilities[rows, high]) * HOUR_BINS
+        is_anomaly = density < self.threshold
+        scores = np.where(is_anomaly, np.clip(50.0 + 50.0 * (1.0 - density / self.threshold), 50.0, 100.0), 10.0)
+        return is_anomaly, scores
+
+
+hour_sketch = HourOfDaySketch()
@@ -0,0 +1,247 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import String, and_, cast
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.behavior import BehavioralProfile
+from app.models.user import User
+from app.services.baseline_codec import LoginBaseline, ip_prefix
+from app.services.online_detector import HOUR_BINS, hour_sketch
+
+# Feature vector: 24 hour-of-day shares followed by log1p(distinct networks)
+PEER_VECTOR_DIM = HOUR_BINS + 1
+# Smallest cohort whose statistics are trusted for scoring
+MIN_COHORT_SIZE = 5
+# Floor for per-dimension standard deviations in the distance
+_STD_FLOOR = 0.02
+
+ORG_COHORT = "*"
+
+
+def peer_vector(baseline: LoginBaseline) -> Optional[np.ndarray]:
+    """Feature vector of one baseline, or None if it has no logins yet."""
+    hist = np.asarray(baseline.sketch_state()["hist"], dtype=float)
+    total = hist.sum()
+    if not total:
+        return None
+    vector = np.empty(PEER_VECTOR_DIM)
+    vector[:HOUR_BINS] = hist / total
+    vector[HOUR_BINS] = np.log1p(len(baseline.prefixes))
+    return vector
+
+
+class CohortStats:
+    """
+    Statistics of one peer group: member vectors as rows of a matrix, plus
+    running per-dimension sums and sums of squares so that replacing one
+    member's vector is O(dim) and mean / std are always current. Also counts
+    how many members have used each network prefix.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, int] = {}
+        self.matrix = np.zeros((16, PEER_VECTOR_DIM))
+        self.total = np.zeros(PEER_VECTOR_DIM)
+        self.total_sq = np.zeros(PEER_VECTOR_DIM)
+        self.prefix_users: Counter = Counter()
+        self.member_prefixes: Dict[str, FrozenSet[str]] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, members: List[Tuple[str, np.ndarray, FrozenSet[str]]]) -> "CohortStats":
+        """Vectorized precompute from all members at once."""
+        stats = cls()
+        if members:
+            stats.matrix = np.vstack([vector for _, vector, _ in members])
+            stats.rows = {entity_id: i for i, (entity_id, _, _) in enumerate(members)}
+            stats.total = stats.matrix.sum(axis=0)
+            stats.total_sq = np.square(stats.matrix).sum(axis=0)
+            for entity_id, _, prefixes in members:
+                stats.member_prefixes[entity_id] = prefixes
+                stats.prefix_users.update(prefixes)
+        return stats
+
+    def upsert(self, entity_id: str, vector: np.ndarray, prefixes: FrozenSet[str]):
+        row = self.rows.get(entity_id)
+        if row is None:
+            row = self.rows[entity_id] = len(self.rows)
+            if row >= len(self.matrix):
+                grown = np.zeros((2 * len(self.matrix), PEER_VECTOR_DIM))
+                grown[:row] = self.matrix[:row]
+                self.matrix = grown
+        else:
+            old = self.matrix[row]
+            self.total -= old
+            self.total_sq -= np.square(old)
+        self.matrix[row] = vector
+        self.total += vector
+        self.total_sq += np.square(vector)
+
+        previous = self.member_prefixes.get(entity_id, frozenset())
+        if prefixes != previous:
+            for prefix in previous - prefixes:
+                self.prefix_users[prefix] -= 1
+                if self.prefix_users[prefix] <= 0:
+                    del self.prefix_users[prefix]
+            self.prefix_users.update(prefixes - previous)
+            self.member_prefixes[entity_id] = prefixes
+
+    def mean(self) -> np.ndarray:
+        return self.total / max(self.size, 1)
+
+    def std(self) -> np.ndarray:
+        mean = self.mean()
+        variance = np.maximum(self.total_sq / max(self.size, 1) - np.square(mean), 0.0)
+        return np.maximum(np.sqrt(variance), _STD_FLOOR)
+
+    def distances(self, vectors: np.ndarray, samples: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        RMS z-score of each row of `vectors` against the cohort (diagonal
+        Mahalanobis). `samples`, the logins behind each row, adds the
+        sampling variance p(1-p)/n of the hour shares, so a user with a few
+        logins is not far merely for being spiky. Only more networks than
+        the cohort counts as distance; new users naturally have fewer.
+        """
+        vectors = np.atleast_2d(vectors)
+        mean = self.mean()
+        variance = np.tile(np.square(self.std()), (len(vectors), 1))
+        if samples is not None:
+            shares = mean[:HOUR_BINS]
+            variance[:, :HOUR_BINS] += shares * (1.0 - shares) / np.maximum(np.asarray(samples, dtype=float), 1.0)[:, None]
+        z = (vectors - mean) / np.sqrt(variance)
+        z[:, HOUR_BINS] = np.maximum(z[:, HOUR_BINS], 0.0)
+        return np.sqrt(np.mean(np.square(z), axis=1))
+
+    def login_vectors(self, baselines: List[LoginBaseline], hours: np.ndarray, ips: List[str]) -> np.ndarray:
+        """
+        Each user's feature vector with the i-th login folded in, as one
+        (len(hours), dim) matrix built without decoding or copying baselines.
+        """
+        hists = hour_sketch.decay * np.array(
+            [baseline.sketch_state()["hist"] for baseline in baselines], dtype=float
+        ).reshape(-1, HOUR_BINS)
+        hours = np.mod(hours, HOUR_BINS)
+        low = hours.astype(int)
+        frac = hours - low
+        rows = np.arange(len(hours))
+        hists[rows, low] += 1.0 - frac
+        hists[rows, (low + 1) % HOUR_BINS] += frac
+        vectors = np.empty((len(hours), PEER_VECTOR_DIM))
+        vectors[:, :HOUR_BINS] = hists / hists.sum(axis=1, keepdims=True)
+        vectors[:, HOUR_BINS] = np.log1p([
+            len(baseline.prefixes) + (not baseline.knows_ip(ip))
+            for baseline, ip in zip(baselines, ips)
+        ])
+        return vectors
+
+    def knows_prefix(self, ip: str) -> bool:
+        return ip_prefix(ip) in self.prefix_users
+
+    def stats(self) -> dict:
+        return {"members": self.size, "prefixes": len(self.prefix_users)}
+
+
+class PeerGroupIndex:
+    """
+    Precomputed per-org cohort statistics (the whole org plus one cohort per
+    user role), built with one query per org and kept current incrementally
+    as baselines are learned. A full rebuild every `refresh_seconds` picks up
+    baselines written by other processes (e.g. backfills).
+    """
+
+    def __init__(self, refresh_seconds: float = 900.0):
+        self.refresh_seconds = refresh_seconds
+        self._cohorts: Dict[Tuple[int, str], CohortStats] = {}
+        self._roles: Dict[Tuple[int, str], str] = {}
+        self._loaded: Dict[int, float] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def ensure_loaded(self, db: AsyncSession, org_id: int):
+        loaded = self._loaded.get(org_id)
+        if loaded is not None and time.monotonic() - loaded < self.refresh_seconds:
+            return
+        lock = self._locks.setdefault(org_id, asyncio.Lock())
+        async with lock:
+            loaded = self._loaded.get(org_id)
+            if loaded is None or time.monotonic() - loaded >= self.refresh_seconds:
+                await self._load(db, org_id)
+
+    async def _load(self, db: AsyncSession, org_id: int):
+        result = await db.execute(
+            select(BehavioralProfile.entity_id, BehavioralProfile.baseline_data, User.role)
+            .outerjoin(User, and_(
+                cast(User.id, String) == BehavioralProfile.entity_id,
+                User.organization_id == org_id
+            ))
+            .where(BehavioralProfile.org_id == org_id, BehavioralProfile.entity_type == "user")
+            # Databases migrated before the unique constraint may hold duplicates: keep the oldest
+            .order_by(BehavioralProfile.id)
+        )
+        members: Dict[str, List[Tuple[str, np.ndarray, FrozenSet[str]]]] = {ORG_COHORT: []}
+        roles = {}
+        seen = set()
+        for entity_id, data, role in result:
+            if entity_id in seen:
+                continue
+            seen.add(entity_id)
+            baseline = LoginBaseline.decode(data)
+            vector = peer_vector(baseline)
+            if vector is None:
+                continue
+            member = (entity_id, vector, frozenset(baseline.prefixes))
+            members[ORG_COHORT].append(member)
+            if role:
+                roles[(org_id, entity_id)] = role
+                members.setdefault(role, []).append(member)
+
+        for key in [key for key in self._cohorts if key[0] == org_id]:
+            del self._cohorts[key]
+        for key in [key for key in self._roles if key[0] == org_id]:
+            del self._roles[key]
+        for cohort, cohort_members in members.items():
+            self._cohorts[(org_id, cohort)] = CohortStats.build(cohort_members)
+        self._roles.update(roles)
+        self._loaded[org_id] = time.monotonic()
+
+    def observe(self, org_id: int, entity_id: str, baseline: LoginBaseline):
+        """Folds a user's updated baseline into their cohorts (no-op until the org is loaded)."""
+        if org_id not in self._loaded:
+            return
+        vector = peer_vector(baseline)
+        if vector is None:
+            return
+        prefixes = frozenset(baseline.prefixes)
+        self._cohorts[(org_id, ORG_COHORT)].upsert(entity_id, vector, prefixes)
+        role = self._roles.get((org_id, entity_id))
+        if role:
+            self._cohorts.setdefault((org_id, role), CohortStats()).upsert(entity_id, vector, prefixes)
+
+    def cohort(self, org_id: int, entity_id: str) -> Optional[CohortStats]:
+        """The user's role cohort if large enough, else the org cohort; None if neither is."""
+        role = self._roles.get((org_id, entity_id))
+        for key in ((org_id, role), (org_id, ORG_COHORT)) if role else ((org_id, ORG_COHORT),):
+            stats = self._cohorts.get(key)
+            if stats is not None and stats.size >= MIN_COHORT_SIZE:
+                return stats
+        return None
+
+    def invalidate(self, org_id: int):
+        self._loaded.pop(org_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "orgs": len(self._loaded),
+            "cohorts": {f"{org_id}:{cohort}": stats.stats() for (org_id, cohort), stats in self._cohorts.items()},
+        }
+
+
+peer_groups = PeerGroupIndex(refresh_seconds=settings.PEER_GROUP_REFRESH_SECONDS)
@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.incident import Incident
 from app.models.prediction import AttackPrediction
+from app.services.feature_store import feature_store
 from datetime import datetime, timedelta
 
 class PredictionService:
@@ -35,6 +36,10 @@ class PredictionService:
             if "phishing" in summary: phishing_count += 1
             if "brute force" in summary or "login" in summary: brute_force_count += 1
             if "anomaly" in summary: anomalies_count += 1
+
+        # Live pressure from the feature store: accounts currently failing most logins
+        pressure = feature_store.org_summary(org_id)
+        brute_force_count += pressure["failing_accounts"]
             
         # Logic: Predict Future
         new_preds = []
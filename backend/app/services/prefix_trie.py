@@ -0,0 +1,107 @@
+import ipaddress
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+class PrefixTrie:
+    """
+    Binary (one bit per level) prefix trie over IPv4 or IPv6 networks.
+
+    `longest_match` walks at most 32/128 levels, remembering the deepest
+    node that carries a value, so lookups cost O(address width) no matter
+    how many prefixes are stored. Nodes are 3-slot lists: [zero, one, value].
+    """
+
+    _EMPTY = object()
+
+    def __init__(self, version: int = 4):
+        self.version = version
+        self.width = 32 if version == 4 else 128
+        self._root: List[Any] = [None, None, self._EMPTY]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, network: IPNetwork, value: Any = True):
+        node = self._root
+        bits = int(network.network_address)
+        for i in range(network.prefixlen):
+            bit = (bits >> (self.width - 1 - i)) & 1
+            child = node[bit]
+            if child is None:
+                child = [None, None, self._EMPTY]
+                node[bit] = child
+            node = child
+        if node[2] is self._EMPTY:
+            self._size += 1
+        node[2] = value
+
+    def remove(self, network: IPNetwork) -> bool:
+        # Walk down keeping the path so empty branches can be pruned.
+        path = []
+        node = self._root
+        bits = int(network.network_address)
+        for i in range(network.prefixlen):
+            bit = (bits >> (self.width - 1 - i)) & 1
+            child = node[bit]
+            if child is None:
+                return False
+            path.append((node, bit))
+            node = child
+        if node[2] is self._EMPTY:
+            return False
+        node[2] = self._EMPTY
+        self._size -= 1
+        for parent, bit in reversed(path):
+            child = parent[bit]
+            if child[0] is None and child[1] is None and child[2] is self._EMPTY:
+                parent[bit] = None
+            else:
+                break
+        return True
+
+    def get(self, network: IPNetwork) -> Optional[Any]:
+        """Exact prefix lookup."""
+        node = self._root
+        bits = int(network.network_address)
+        for i in range(network.prefixlen):
+            node = node[(bits >> (self.width - 1 - i)) & 1]
+            if node is None:
+                return None
+        return None if node[2] is self._EMPTY else node[2]
+
+    def longest_match(self, address: int,
+                      accept: Optional[Callable[[Any], bool]] = None) -> Optional[Tuple[int, Any]]:
+        """
+        Most specific (prefixlen, value) covering `address`, or None. With
+        `accept`, values it rejects (e.g. expired ones) are skipped, so a
+        broader prefix still matches under a rejected more specific one.
+        """
+        node = self._root
+        best = None
+        if node[2] is not self._EMPTY and (accept is None or accept(node[2])):
+            best = (0, node[2])
+        shift = self.width - 1
+        depth = 0
+        while shift >= 0:
+            node = node[(address >> shift) & 1]
+            if node is None:
+                break
+            depth += 1
+            if node[2] is not self._EMPTY and (accept is None or accept(node[2])):
+                best = (depth, node[2])
+            shift -= 1
+        return best
+
+    def items(self) -> Iterator[Tuple[IPNetwork, Any]]:
+        stack = [(self._root, 0, 0)]
+        network_cls = ipaddress.IPv4Network if self.version == 4 else ipaddress.IPv6Network
+        while stack:
+            node, prefix, depth = stack.pop()
+            if node[2] is not self._EMPTY:
+                yield network_cls((prefix << (self.width - depth), depth)), node[2]
+            for bit in (1, 0):
+                if node[bit] is not None:
+                    stack.append((node[bit], (prefix << 1) | bit, depth + 1))
@@ -1,54 +1,193 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from app.db.session import AsyncSessionLocal
+from app.services.anomaly import AnomalyService
+from app.services.attribution import attribution_service
 from app.services.defense import DefenseService
+from app.services.feature_store import EntityFeatures, feature_store
+from app.services.fingerprint import FingerprintService
+from app.services.threat import DEFAULT_INDICATOR_CONFIDENCE, ThreatIntelService
+from app.services.threat_index import threat_index
 from app.models.organization import Organization
 
+logger = logging.getLogger(__name__)
+
+# (score, human readable factor or None)
+FactorResult = Tuple[float, Optional[str]]
+
+# Successful logins a user needs before a never-seen country counts as risk
+NEW_COUNTRY_MIN_LOGINS = 5
+
+# Per-factor deadlines in seconds. A factor that misses its budget is
+# reported as "unavailable" and contributes nothing rather than stalling login.
+FACTOR_BUDGETS = {
+    "threat_intel": 0.15,
+    "anomaly": 0.30,
+    "device": 0.20,
+    "geo": 0.05,
+}
+
 class RiskEngine:
-    def __init__(self, db: AsyncSession):
+    """
+    Combines threat intel, behavioral anomaly, device and geo factors into
+    one login risk score, each factor under its own deadline. Library API:
+    no endpoint calls it yet; callers pass precomputed results where they
+    already have them.
+    """
+
+    def __init__(self, db: AsyncSession, session_factory=AsyncSessionLocal, budgets: Dict[str, float] = None):
         self.db = db
+        # Factors run concurrently and an AsyncSession is not safe for
+        # concurrent use, so each DB-backed factor opens its own session.
+        self.session_factory = session_factory
+        self.budgets = {**FACTOR_BUDGETS, **(budgets or {})}
         self.defense_service = DefenseService()
 
-    async def calculate_risk(self, user, ip_address: str, device_result: dict, anomaly_result: dict) -> dict:
+    async def calculate_risk(self, user, ip_address: str, device_result: dict = None, anomaly_result: dict = None,
+                             user_agent: str = None, client_data: dict = None) -> dict:
         """
-        Aggregates risk from various modules.
-        Returns { "total_score": int, "factors": list }
+        Aggregates risk from various modules, evaluating independent factors
+        concurrently. Precomputed `device_result` / `anomaly_result` are used
+        as-is; otherwise the factor is computed here.
+        Returns { "total_score": int, "factors": list, "factor_details": dict, "unavailable": list }
         """
-        score = 0
-        factors = []
-
-        # 1. IP Reputation (Phase 17: Module E + Phase 5)
-        # Check Threat Intel
-        from app.services.threat import ThreatIntelService
-        threat_service = ThreatIntelService(self.db)
-        threat_result = await threat_service.check_ip(ip_address)
-        
-        if threat_result["is_malicious"]:
-            ti_score = 50.0 # High penalty for known bad IP
-            score += ti_score
-            factors.append(f"Threat Intelligence Match ({int(ti_score)} pts): {threat_result.get('description')}")
-        
-        # 2. Anomaly Detection (Module A)
+        # One feature-store lookup shared by every factor
+        features = feature_store.get(user.organization_id, "user", user.id)
+        factors: Dict[str, Callable[[], Awaitable[FactorResult]]] = {
+            # 1. IP Reputation (Phase 17: Module E + Phase 5)
+            "threat_intel": lambda: self._threat_intel_factor(ip_address),
+            # 2. Anomaly Detection (Module A)
+            "anomaly": lambda: self._anomaly_factor(user, ip_address, anomaly_result),
+            # 4. Geo / network attribution
+            "geo": lambda: self._geo_factor(ip_address, features),
+        }
+        # 3. Device Fingerprinting (Module B) - needs a UA unless precomputed
+        if device_result is not None or user_agent:
+            factors["device"] = lambda: self._device_factor(user, ip_address, user_agent, client_data, device_result, features)
+
+        results = await asyncio.gather(*(
+            self._run_factor(name, fn) for name, fn in factors.items()
+        ))
+
+        score = 0.0
+        messages = []
+        details = {}
+        unavailable = []
+        for name, detail, message in results:
+            details[name] = detail
+            if detail["status"] != "ok":
+                unavailable.append(name)
+                continue
+            score += detail["score"]
+            if message:
+                messages.append(message)
+
+        # Cap score
+        total_score = min(score, 100)
+
+        return {
+            "total_score": int(total_score),
+            "factors": messages,
+            "factor_details": details,
+            "unavailable": unavailable
+        }
+
+    async def _run_factor(self, name: str, fn: Callable[[], Awaitable[FactorResult]]):
+        start = time.perf_counter()
+        message = None
+        try:
+            score, message = await asyncio.wait_for(fn(), self.budgets.get(name, 0.1))
+            status = "ok"
+        except asyncio.TimeoutError:
+            score, status = 0.0, "unavailable"
+            logger.warning(f"Risk factor '{name}' missed its {self.budgets.get(name)}s budget")
+        except Exception as e:
+            score, status = 0.0, "unavailable"
+            logger.warning(f"Risk factor '{name}' failed: {e}")
+        detail = {
+            "status": status,
+            "score": round(score, 2),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+        return name, detail, message
+
+    async def _threat_intel_factor(self, ip_address: str) -> FactorResult:
+        if threat_index.loaded:
+            # Shared in-memory index: no session and no service object per call
+            now = time.time()
+            match = threat_index.match_ip(ip_address, now)
+            if match is None:
+                return 0.0, None
+            confidence, description = match.confidence_at(now), match.description
+        else:
+            async with self.session_factory() as db:
+                threat_result = await ThreatIntelService(db).check_ip(ip_address)
+            if not threat_result["is_malicious"]:
+                return 0.0, None
+            confidence, description = threat_result["confidence"], threat_result.get("description")
+
+        # High penalty for a known bad IP, easing off as the indicator ages
+        ti_score = 50.0 * min(1.0, confidence / DEFAULT_INDICATOR_CONFIDENCE)
+        return ti_score, f"Threat Intelligence Match ({int(ti_score)} pts): {description}"
+
+    async def _anomaly_factor(self, user, ip_address: str, anomaly_result: Optional[dict]) -> FactorResult:
+        if anomaly_result is None:
+            # Read-only: this runs under a deadline that may cancel it, so it
+            # must not create profiles or record anomaly events
+            async with self.session_factory() as db:
+                anomaly_result = await AnomalyService(db).score_stored_baseline(
+                    org_id=user.organization_id,
+                    user_id=user.id,
+                    login_time=datetime.utcnow(),
+                    ip_address=ip_address
+                )
+
         anom_score = anomaly_result.get("score", 0)
         if anom_score > 0:
             weighted_anom = anom_score * 0.8 # Weighting
-            score += weighted_anom
+            message = None
             if anomaly_result.get("is_anomaly"):
-                factors.append(f"Behavioral Anomaly ({int(weighted_anom)} pts): {anomaly_result.get('reason')}")
+                message = f"Behavioral Anomaly ({int(weighted_anom)} pts): {anomaly_result.get('reason')}"
+            return weighted_anom, message
+        return 0.0, None
 
-        # 3. Device Fingerprinting (Module B)
+    async def _device_factor(self, user, ip_address: str, user_agent: Optional[str],
+                             client_data: Optional[dict], device_result: Optional[dict],
+                             features: Optional[EntityFeatures] = None) -> FactorResult:
         # device_result = { "is_known": bool, "risk_score": float, ... }
+        if device_result is None:
+            fp_hash = FingerprintService.generate_hash(user_agent, ip_address, client_data)
+            # Devices recently seen for this user need no database round trip
+            if features is not None and features.knows_device(fp_hash):
+                return 0.0, None
+            async with self.session_factory() as db:
+                device_result = await FingerprintService(db).check_device(user.id, user_agent, ip_address, client_data)
+            feature_store.record_device(user.organization_id, "user", user.id, fp_hash)
+
         dev_risk = device_result.get("risk_score", 0)
         if dev_risk > 0:
-            score += dev_risk
-            factors.append(f"Device Risk ({int(dev_risk)} pts)")
-
-        # Cap score
-        total_score = min(score, 100)
+            return dev_risk, f"Device Risk ({int(dev_risk)} pts)"
+        return 0.0, None
 
-        return {
-            "total_score": int(total_score),
-            "factors": factors
-        }
+    async def _geo_factor(self, ip_address: str, features: Optional[EntityFeatures] = None) -> FactorResult:
+        details = attribution_service.get_ip_details(ip_address)
+        if details.get("tor"):
+            return 30.0, "Tor Exit Node (30 pts)"
+        if details.get("vpn"):
+            return 15.0, "VPN / Anonymizer (15 pts)"
+        country = details.get("country")
+        if not country or country == "Unknown":
+            return 0.0, None
+        # Countries are learned from successful logins at ingest, not here
+        if (features is not None and features.successes >= NEW_COUNTRY_MIN_LOGINS
+                and not features.knows_country(country)):
+            return 10.0, f"New Country ({country}, 10 pts)"
+        return 0.0, None
 
     async def decide_policy(self, org_id: int, risk_score: int) -> str:
         """
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from array import array
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:  # redis is optional; without it there is no RedisWindowBackend to fail
+    RedisError = ConnectionError
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean "Redis is unreachable or misbehaving", not a bug here
+_REDIS_ERRORS = (RedisError, ConnectionError, OSError, asyncio.TimeoutError)
+
+# Bits per distinct-member sketch (linear counting). Accurate to a few
+# percent up to roughly this many distinct members per window.
+SKETCH_BITS = 512
+
+
+def member_hash(member: str) -> int:
+    return int.from_bytes(hashlib.blake2b(member.encode(), digest_size=8).digest(), "big")
+
+
+def estimate_distinct(bitmap: int, m: int = SKETCH_BITS) -> int:
+    """Linear-counting estimate of distinct members from an OR'ed bitmap."""
+    zeros = m - bitmap.bit_count()
+    if zeros == 0:
+        return m
+    return int(round(-m * math.log(zeros / m)))
+
+
+class _Ring:
+    """
+    Fixed-size ring of time buckets for one key: a failure counter and a
+    distinct-member bitmap per bucket. Stale slots are reset lazily when
+    their bucket number comes round again.
+    """
+    __slots__ = ("epochs", "counts", "members")
+
+    def __init__(self, size: int):
+        self.epochs = array("q", [-1] * size)
+        self.counts = array("l", [0] * size)
+        self.members = [0] * size
+
+    def add(self, bucket: int, bit: int):
+        slot = bucket % len(self.epochs)
+        if self.epochs[slot] != bucket:
+            self.epochs[slot] = bucket
+            self.counts[slot] = 0
+            self.members[slot] = 0
+        self.counts[slot] += 1
+        self.members[slot] |= bit
+
+    def totals(self, bucket: int) -> Tuple[int, int]:
+        oldest = bucket - len(self.epochs)
+        count = 0
+        bitmap = 0
+        for slot, epoch in enumerate(self.epochs):
+            if epoch > oldest:
+                count += self.counts[slot]
+                bitmap |= self.members[slot]
+        return count, estimate_distinct(bitmap)
+
+
+class InMemoryWindowBackend:
+    """
+    Per-process sliding windows. Keys are evicted LRU once `max_keys` is hit,
+    so memory stays bounded under IP-rotation attacks.
+    """
+    name = "memory"
+
+    def __init__(self, window_seconds: int = 300, buckets: int = 30, max_keys: int = 100000):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.max_keys = max_keys
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+
+    async def record(self, key: str, member: str, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Count one event for `key`, tagged with `member` (e.g. the username
+        tried from an IP). Returns (events in window, distinct members).
+        """
+        bucket = int((now if now is not None else time.time()) // self.bucket_seconds)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = _Ring(self.buckets)
+            self._rings[key] = ring
+            if len(self._rings) > self.max_keys:
+                self._rings.popitem(last=False)
+        else:
+            self._rings.move_to_end(key)
+        ring.add(bucket, 1 << (member_hash(member) % SKETCH_BITS))
+        return ring.totals(bucket)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "keys": len(self._rings)}
+
+
+class RedisWindowBackend:
+    """
+    The same bucketed windows kept in Redis so every worker shares state.
+    Each bucket is an INCR counter plus a HyperLogLog of members, both with
+    a TTL of one window; one pipelined round trip records and reads.
+
+    If Redis fails, events are counted in an in-process fallback instead
+    (windows are then per worker), and Redis is tried again after
+    `retry_seconds`. Failures are logged once per outage and counted.
+    """
+    name = "redis"
+
+    def __init__(self, client, window_seconds: int = 300, buckets: int = 30, prefix: str = "lw",
+                 retry_seconds: float = 30.0):
+        self.client = client
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.prefix = prefix
+        self.retry_seconds = retry_seconds
+        self.fallback = InMemoryWindowBackend(window_seconds, buckets)
+        self.errors = 0
+        self.fallback_events = 0
+        self._down_until = 0.0
+
+    @property
+    def degraded(self) -> bool:
+        return self._down_until > 0.0
+
+    async def record(self, key: str, member: str, now: Optional[float] = None) -> Tuple[int, int]:
+        if self._down_until and time.monotonic() < self._down_until:
+            self.fallback_events += 1
+            return await self.fallback.record(key, member, now)
+        try:
+            result = await self._record(key, member, now)
+        except _REDIS_ERRORS as e:
+            self.errors += 1
+            self.fallback_events += 1
+            if not self.degraded:
+                logger.warning(f"Redis login windows failed ({e!r}); counting in-process for "
+                               f"{self.retry_seconds:.0f}s before retrying")
+            self._down_until = time.monotonic() + self.retry_seconds
+            return await self.fallback.record(key, member, now)
+        if self.degraded:
+            logger.info("Redis login windows reachable again")
+            self._down_until = 0.0
+        return result
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "degraded": self.degraded, "errors": self.errors,
+                "fallback_events": self.fallback_events, "fallback_keys": len(self.fallback._rings)}
+
+    async def _record(self, key: str, member: str, now: Optional[float]) -> Tuple[int, int]:
+        bucket = int((now if now is not None else time.time()) // self.bucket_seconds)
+        base = f"{self.prefix}:{key}"
+        ttl = int(self.window_seconds + self.bucket_seconds)
+        count_keys = [f"{base}:{b}:n" for b in range(bucket - self.buckets + 1, bucket + 1)]
+        hll_keys = [f"{base}:{b}:d" for b in range(bucket - self.buckets + 1, bucket + 1)]
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incr(count_keys[-1])
+        pipe.expire(count_keys[-1], ttl)
+        pipe.pfadd(hll_keys[-1], member)
+        pipe.expire(hll_keys[-1], ttl)
+        pipe.mget(count_keys)
+        pipe.pfcount(*hll_keys)
+        results = await pipe.execute()
+
+        count = sum(int(v) for v in results[4] if v is not None)
+        return count, int(results[5])
+
+
+async def create_window_backend(redis_url: Optional[str], **kwargs):
+    """
+    Redis-backed windows when the server answers, in-process otherwise.
+    """
+    if redis_url:
+        try:
+            import redis.asyncio as aioredis
+            # A hung server must not stall logins: bound every command too
+            client = aioredis.from_url(redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+            await client.ping()
+            return RedisWindowBackend(client, **kwargs)
+        except Exception as e:
+            logger.warning(f"Redis unavailable for login windows ({e}); using in-process state")
+    return InMemoryWindowBackend(**kwargs)
@@ -1,53 +1,188 @@
+import asyncio
+import time
+from sqlalchemy import func, not_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.threat import ThreatIndicator
+from app.services.feed_parsers import FEED_CHUNK_SIZE, normalized_chunks
+from app.services.threat_aging import expired_clause, row_epochs, source_ttl
+from app.services.threat_index import IndicatorMatch, threat_index
 from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+# Indicators per INSERT ... ON CONFLICT statement (6 bound parameters each,
+# well under SQLite's and Postgres' per-statement parameter limits)
+UPSERT_CHUNK = 1000
+DEFAULT_INDICATOR_CONFIDENCE = 80.0
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def dedupe_indicators(indicators: Iterable[dict]) -> Dict[str, Tuple[str, str]]:
+    """
+    value -> (type, desc), last occurrence wins; entries without a value are dropped.
+    """
+    unique = {}
+    for item in indicators:
+        val = item.get("value")
+        if val:
+            unique[val] = (item.get("type", "IP"), item.get("desc"))
+    return unique
 
 class ThreatIntelService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def ingest_feed(self, source_name: str, indicators: list):
+    async def ingest_feed(self, source_name: str, indicators: list) -> dict:
         """
         Ingest a list of dicts: [ {"value": "1.2.3.4", "type": "IP", "desc": "Bad IP"} ]
+
+        Indicators are deduplicated in memory, then written UPSERT_CHUNK at a
+        time: one SELECT to classify the chunk and one INSERT ... ON CONFLICT
+        (indicator_value) DO UPDATE. A re-seen indicator keeps its stored
+        type, description and confidence; only its source, last_updated and
+        expires_at (the source's TTL from now) are refreshed, and it counts
+        as "updated" only if the source changed. Everything commits at once.
+        Returns { "received", "unique", "inserted", "updated", "unchanged" }.
         """
-        for item in indicators:
-            val = item.get("value")
-            
-            # Check existing
-            result = await self.db.execute(select(ThreatIndicator).where(ThreatIndicator.indicator_value == val))
-            existing = result.scalars().first()
-            
-            if existing:
-                existing.last_updated = datetime.utcnow()
-                existing.source = source_name
-            else:
-                new_indicator = ThreatIndicator(
-                    indicator_value=val,
-                    indicator_type=item.get("type", "IP"),
-                    source=source_name,
-                    description=item.get("desc"),
-                    confidence=80.0
-                )
-                self.db.add(new_indicator)
-        
+        unique = dedupe_indicators(indicators)
+        stats = {"received": len(indicators), "unique": len(unique), "inserted": 0, "updated": 0, "unchanged": 0}
+        await self._upsert_unique(source_name, unique, stats)
         await self.db.commit()
+        self._index(source_name, unique)
+        return stats
+
+    async def ingest_stream(self, source_name: str, items: Iterable[dict],
+                            chunk_size: int = FEED_CHUNK_SIZE) -> dict:
+        """
+        Streaming counterpart of ingest_feed for parsed feeds (see
+        feed_parsers): items are normalized and validated `chunk_size` at a
+        time, each chunk is upserted and committed before the next one is
+        read, so memory stays flat however large the feed is. Reading and
+        parsing run on a worker thread, off the event loop. Duplicates are
+        only collapsed within a chunk; a repeat in a later chunk counts as
+        unchanged. A parse error part-way leaves earlier chunks committed.
+        Returns ingest_feed's counts plus "rejected".
+        """
+        stats = {"received": 0, "unique": 0, "inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0}
+        chunks = normalized_chunks(items, chunk_size)
+        while True:
+            # `items` usually reads an upload file with blocking I/O
+            pair = await asyncio.to_thread(next, chunks, None)
+            if pair is None:
+                break
+            chunk, rejected = pair
+            unique = dedupe_indicators(chunk)
+            stats["received"] += len(chunk) + rejected
+            stats["rejected"] += rejected
+            stats["unique"] += len(unique)
+            await self._upsert_unique(source_name, unique, stats)
+            await self.db.commit()
+            self._index(source_name, unique)
+        return stats
+
+    async def _upsert_unique(self, source_name: str, unique: Dict[str, Tuple[str, str]], stats: dict):
+        values = list(unique)
+        for start in range(0, len(values), UPSERT_CHUNK):
+            chunk = values[start:start + UPSERT_CHUNK]
+            inserted, updated, unchanged = await self._upsert_chunk(source_name, chunk, unique)
+            stats["inserted"] += inserted
+            stats["updated"] += updated
+            stats["unchanged"] += unchanged
+
+    @staticmethod
+    def _index(source_name: str, unique: Dict[str, Tuple[str, str]]):
+        # Keep this process' in-memory index current without a full reload;
+        # re-seen indicators get their full confidence and lifetime back
+        seen_at = time.time()
+        expires = seen_at + source_ttl(source_name).total_seconds()
+        for val, (ind_type, desc) in unique.items():
+            threat_index.add(val, ind_type, source_name, desc, DEFAULT_INDICATOR_CONFIDENCE, seen_at, expires)
+
+    async def _upsert_chunk(self, source_name: str, values: List[str],
+                            unique: Dict[str, Tuple[str, str]]) -> Tuple[int, int, int]:
+        table = ThreatIndicator.__table__
+        existing = {
+            val: (ind_type, source, desc)
+            for val, ind_type, source, desc in await self.db.execute(
+                select(table.c.indicator_value, table.c.indicator_type, table.c.source, table.c.description)
+                .where(table.c.indicator_value.in_(values))
+            )
+        }
+
+        expires = datetime.utcnow() + source_ttl(source_name)
+        inserted = updated = 0
+        rows = []
+        for val in values:
+            ind_type, desc = unique[val]
+            current = existing.get(val)
+            if current is None:
+                inserted += 1
+            else:
+                if current[1] != source_name:
+                    updated += 1
+                # The row keeps its stored type and description; index those
+                unique[val] = (current[0], current[2])
+            rows.append({
+                "indicator_value": val,
+                "indicator_type": ind_type,
+                "source": source_name,
+                "description": desc,
+                "confidence": DEFAULT_INDICATOR_CONFIDENCE,
+                "expires_at": expires,
+            })
+
+        dialect = self.db.bind.dialect.name
+        make_insert = _UPSERT_INSERTS.get(dialect)
+        if make_insert is None:
+            raise NotImplementedError(f"Bulk indicator upsert is not supported on '{dialect}'")
+        stmt = make_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.indicator_value],
+            set_={
+                "source": stmt.excluded.source,
+                "last_updated": func.now(),
+                "expires_at": stmt.excluded.expires_at,
+            }
+        )
+        await self.db.execute(stmt, rows)
+        return inserted, updated, len(values) - inserted - updated
 
     async def check_ip(self, ip_address: str) -> dict:
         """
         Returns { "is_malicious": bool, "confidence": float, "source": str }
+        Answered from the in-memory index (exact hosts and CIDR ranges) once
+        it is loaded; exact-match database lookup otherwise. Expired
+        indicators never match, and confidence decays towards expiry.
         """
+        now = time.time()
+        if threat_index.loaded:
+            match = threat_index.match_ip(ip_address, now)
+            if match:
+                return {
+                    "is_malicious": True,
+                    "confidence": round(match.confidence_at(now), 2),
+                    "source": match.source,
+                    "description": match.description
+                }
+            return { "is_malicious": False, "confidence": 0 }
+
         result = await self.db.execute(
             select(ThreatIndicator).where(
-                ThreatIndicator.indicator_value == ip_address
+                ThreatIndicator.indicator_value == ip_address,
+                not_(expired_clause(datetime.utcnow()))
             )
         )
         indicator = result.scalars().first()
         
         if indicator:
+            match = IndicatorMatch(
+                indicator.indicator_value, indicator.indicator_type, indicator.source, indicator.confidence,
+                indicator.description, *row_epochs(indicator.last_updated, indicator.expires_at)
+            )
             return {
                 "is_malicious": True,
-                "confidence": indicator.confidence,
+                "confidence": round(match.confidence_at(now), 2),
                 "source": indicator.source,
                 "description": indicator.description
             }
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, or_
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.threat import ThreatIndicator, ThreatIndicatorArchive
+from app.services.threat_index import ThreatIndicatorIndex, threat_index
+from app.services.timestamps import to_epoch
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVED_COLUMNS = ("indicator_value", "indicator_type", "source", "confidence", "description",
+                     "created_at", "last_updated", "expires_at")
+
+
+def source_ttl(source: Optional[str]) -> timedelta:
+    """How long an indicator from `source` stays live after it was last seen."""
+    days = settings.THREAT_SOURCE_TTL_DAYS.get(source or "", settings.THREAT_INDICATOR_TTL_DAYS)
+    return timedelta(days=days)
+
+
+def expires_at(source: Optional[str], seen_at: Optional[datetime] = None) -> datetime:
+    """Naive UTC expiry for an indicator (re-)seen at `seen_at` (default: now)."""
+    return (seen_at or datetime.utcnow()) + source_ttl(source)
+
+
+def row_epochs(last_updated: Optional[datetime], expires: Optional[datetime]) -> Tuple[float, float]:
+    """(seen_at, expires_at) UTC epochs for a stored indicator, as the index keeps them."""
+    seen_at = to_epoch(last_updated) if last_updated else time.time()
+    if expires is None:
+        return seen_at, seen_at + settings.THREAT_INDICATOR_TTL_DAYS * 86400.0
+    return seen_at, to_epoch(expires)
+
+
+def expired_clause(now: datetime):
+    """
+    Rows past their expiry. Rows without expires_at predate aging and age
+    from last_updated with the default TTL.
+    """
+    default_cutoff = now - timedelta(days=settings.THREAT_INDICATOR_TTL_DAYS)
+    return or_(
+        ThreatIndicator.expires_at <= now,
+        and_(ThreatIndicator.expires_at.is_(None), ThreatIndicator.last_updated <= default_cutoff)
+    )
+
+
+class IndicatorSweeper:
+    """
+    Removes expired threat indicators in bounded batches: each batch selects
+    at most `batch_size` expired ids, optionally copies them into
+    threat_indicator_archive, deletes them, commits, and then drops the same
+    indicators from the in-memory index unless they were re-ingested since. Short transactions keep row locks
+    brief, so ingestion and lookups carry on between batches.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, index: ThreatIndicatorIndex = threat_index,
+                 batch_size: int = settings.THREAT_SWEEP_BATCH_SIZE, archive: bool = settings.THREAT_ARCHIVE_EXPIRED):
+        self.session_factory = session_factory
+        self.index = index
+        self.batch_size = batch_size
+        self.archive = archive
+
+    async def sweep(self, now: Optional[datetime] = None, max_batches: Optional[int] = None) -> dict:
+        now = now or datetime.utcnow()
+        stats = {"removed": 0, "archived": 0, "batches": 0, "elapsed_s": 0.0}
+        started = time.perf_counter()
+        while max_batches is None or stats["batches"] < max_batches:
+            removed = await self._sweep_batch(now)
+            if not removed:
+                break
+            stats["removed"] += removed
+            stats["archived"] += removed if self.archive else 0
+            stats["batches"] += 1
+            # Let request handlers run between batches
+            await asyncio.sleep(0)
+        stats["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return stats
+
+    async def _sweep_batch(self, now: datetime) -> int:
+        table = ThreatIndicator.__table__
+        async with self.session_factory() as db:
+            rows = (await db.execute(
+                select(table.c.id, table.c.indicator_value, table.c.indicator_type,
+                       table.c.last_updated, table.c.expires_at)
+                .where(expired_clause(now))
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+                # Concurrent sweepers (one per worker) take disjoint batches on Postgres
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                return 0
+            ids = [row[0] for row in rows]
+            if self.archive:
+                await db.execute(
+                    insert(ThreatIndicatorArchive.__table__).from_select(
+                        list(_ARCHIVED_COLUMNS),
+                        select(*(table.c[name] for name in _ARCHIVED_COLUMNS)).where(table.c.id.in_(ids))
+                    )
+                )
+            await db.execute(delete(table).where(table.c.id.in_(ids)))
+            await db.commit()
+
+        # An ingest may have re-inserted an indicator since the DELETE and
+        # indexed it with a later expiry; only drop entries as old as the row
+        for _, value, indicator_type, last_updated, expires in rows:
+            self.index.remove(value, indicator_type, expired_by=row_epochs(last_updated, expires)[1])
+        return len(rows)
+
+
+async def maintain_indicator_expiry(sweeper: IndicatorSweeper, interval_seconds: float):
+    """Background loop: sweep expired indicators every `interval_seconds`."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            stats = await sweeper.sweep()
+            if stats["removed"]:
+                logger.info(f"Expired {stats['removed']} threat indicators in {stats['batches']} batches")
+        except Exception:
+            logger.exception("Threat indicator sweep failed; retrying next interval")
@@ -0,0 +1,355 @@
+import asyncio
+import ipaddress
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from app.services.ip_address import parse_address
+from app.services.prefix_trie import PrefixTrie
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIDENCE = 80.0
+
+IP_TYPES = {"IP", "IPV4", "IPV6", "CIDR"}
+DOMAIN_TYPES = {"DOMAIN", "HOSTNAME", "FQDN"}
+HASH_TYPES = {"FILE_HASH", "HASH", "MD5", "SHA1", "SHA256"}
+
+
+class IndicatorMatch(NamedTuple):
+    value: str
+    indicator_type: str
+    source: str
+    confidence: float
+    description: Optional[str]
+    # UTC epochs: last seen in a feed, and when it stops counting (inf: never)
+    seen_at: float = 0.0
+    expires_at: float = math.inf
+
+    def confidence_at(self, now: float) -> float:
+        """
+        Confidence decayed linearly from its stored value when last seen to
+        zero at expiry; 0 once expired.
+        """
+        if self.expires_at == math.inf:
+            return self.confidence
+        if now >= self.expires_at:
+            return 0.0
+        lifetime = self.expires_at - self.seen_at
+        if lifetime <= 0 or now <= self.seen_at:
+            return self.confidence
+        return self.confidence * (self.expires_at - now) / lifetime
+
+
+def normalize_domain(value: str) -> str:
+    """Lower-case, no trailing dot, no leading wildcard label."""
+    domain = value.strip().lower().rstrip(".")
+    return domain[2:] if domain.startswith("*.") else domain
+
+
+class DomainSuffixTrie:
+    """
+    Trie over reversed domain labels ("a.evil.com" -> com, evil, a), so an
+    indicator for a domain also covers every subdomain. Nodes are dicts of
+    label -> child; a node's value lives under the key None, which no label
+    can collide with. Lookups cost O(labels in the queried host).
+    """
+
+    def __init__(self):
+        self._root: Dict[Any, Any] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, domain: str, value: Any):
+        node = self._root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        if None not in node:
+            self._size += 1
+        node[None] = value
+
+    def remove(self, domain: str) -> bool:
+        path = []
+        node = self._root
+        for label in reversed(domain.split(".")):
+            child = node.get(label)
+            if child is None:
+                return False
+            path.append((node, label))
+            node = child
+        if None not in node:
+            return False
+        del node[None]
+        self._size -= 1
+        for parent, label in reversed(path):
+            if parent[label]:
+                break
+            del parent[label]
+        return True
+
+    def get(self, domain: str) -> Optional[Any]:
+        node = self._root
+        for label in reversed(domain.split(".")):
+            node = node.get(label)
+            if node is None:
+                return None
+        return node.get(None)
+
+    def longest_match(self, host: str, accept: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Value of the most specific stored domain that equals or contains
+        `host`; with `accept`, values it rejects are skipped (see PrefixTrie).
+        """
+        node = self._root
+        best = None
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            if None in node and (accept is None or accept(node[None])):
+                best = node[None]
+        return best
+
+
+class _IndexState:
+    """One generation of the index; a full refresh builds a new one and swaps it in."""
+
+    def __init__(self):
+        self.exact_ips: Dict[Tuple[int, int], IndicatorMatch] = {}
+        self.ranges: Dict[int, PrefixTrie] = {4: PrefixTrie(4), 6: PrefixTrie(6)}
+        self.domains = DomainSuffixTrie()
+        self.hashes: Dict[str, IndicatorMatch] = {}
+        self.other: Dict[str, IndicatorMatch] = {}
+
+    def __len__(self) -> int:
+        return (len(self.exact_ips) + len(self.ranges[4]) + len(self.ranges[6])
+                + len(self.domains) + len(self.hashes) + len(self.other))
+
+
+class ThreatIndicatorIndex:
+    """
+    Process-local index of `threat_indicators`, so lookups on the request
+    path (risk scoring, web and email detection) never touch the database:
+
+    - exact IPv4/IPv6 hosts and file hashes: hash maps
+    - CIDR ranges: one PrefixTrie per address family (longest match)
+    - domains: a reversed-label suffix trie, matching subdomains too
+    - anything else (URLs, ...): exact string map
+
+    Loaded in full at startup, updated incrementally on ingest and rebuilt
+    periodically; a rebuild swaps the whole state in one assignment, so
+    readers always see either the old or the new generation.
+    """
+
+    def __init__(self):
+        self._state = _IndexState()
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    @staticmethod
+    def _classify(value: str, indicator_type: str):
+        """(kind, key) under which an indicator is stored."""
+        kind = (indicator_type or "").upper()
+        value = value.strip()
+        if kind in IP_TYPES or (not kind and parse_address(value.split("/")[0])):
+            if "/" in value:
+                network = ipaddress.ip_network(value, strict=False)
+                if network.prefixlen < network.max_prefixlen:
+                    return "range", network
+                value = str(network.network_address)
+            parsed = parse_address(value)
+            if parsed is None:
+                raise ValueError(f"Not an IP indicator: {value!r}")
+            return "ip", parsed
+        if kind in DOMAIN_TYPES:
+            return "domain", normalize_domain(value)
+        if kind in HASH_TYPES:
+            return "hash", value.lower()
+        return "other", value
+
+    @staticmethod
+    def _put(state: _IndexState, kind: str, key, match: IndicatorMatch):
+        if kind == "ip":
+            state.exact_ips[key] = match
+        elif kind == "range":
+            state.ranges[key.version].insert(key, match)
+        elif kind == "domain":
+            state.domains.insert(key, match)
+        elif kind == "hash":
+            state.hashes[key] = match
+        else:
+            state.other[key] = match
+
+    @staticmethod
+    def _get(state: _IndexState, kind: str, key) -> Optional[IndicatorMatch]:
+        if kind == "ip":
+            return state.exact_ips.get(key)
+        if kind == "range":
+            return state.ranges[key.version].get(key)
+        if kind == "domain":
+            return state.domains.get(key)
+        if kind == "hash":
+            return state.hashes.get(key)
+        return state.other.get(key)
+
+    def add(self, value: str, indicator_type: str, source: str, description: Optional[str] = None,
+            confidence: Optional[float] = None, seen_at: Optional[float] = None, expires_at: float = math.inf):
+        """
+        Insert or update one indicator. Updates keep the stored confidence
+        and description unless new ones are given, mirroring the DB upsert;
+        `seen_at` defaults to now, `expires_at` to never.
+        """
+        try:
+            kind, key = self._classify(value, indicator_type)
+        except ValueError:
+            logger.warning(f"Ignoring unparseable {indicator_type} indicator: {value!r}")
+            return
+        with self._lock:
+            state = self._state
+            current = self._get(state, kind, key)
+            if current is not None:
+                confidence = current.confidence if confidence is None else confidence
+                description = current.description if description is None else description
+            match = IndicatorMatch(
+                value, indicator_type, source,
+                DEFAULT_CONFIDENCE if confidence is None else confidence, description,
+                time.time() if seen_at is None else seen_at, expires_at
+            )
+            self._put(state, kind, key, match)
+
+    def remove(self, value: str, indicator_type: str, expired_by: Optional[float] = None) -> bool:
+        """
+        Drop one indicator. With `expired_by` (a UTC epoch), only an entry
+        that expires by then is dropped: one refreshed by a newer ingest
+        since the caller read its row is kept.
+        """
+        try:
+            kind, key = self._classify(value, indicator_type)
+        except ValueError:
+            return False
+        with self._lock:
+            state = self._state
+            current = self._get(state, kind, key)
+            if current is None or (expired_by is not None and current.expires_at > expired_by):
+                return False
+            if kind == "ip":
+                del state.exact_ips[key]
+            elif kind == "range":
+                state.ranges[key.version].remove(key)
+            elif kind == "domain":
+                state.domains.remove(key)
+            elif kind == "hash":
+                del state.hashes[key]
+            else:
+                del state.other[key]
+            return True
+
+    # --- lookups ---
+    # Expired entries are never returned, even before the sweeper removes them,
+    # and never hide a live broader one (an exact IP under a CIDR range, a
+    # range under a wider range, a subdomain under its parent).
+
+    @staticmethod
+    def _live(match: Optional[IndicatorMatch], now: Optional[float]) -> Optional[IndicatorMatch]:
+        if match is None or match.expires_at == math.inf:
+            return match
+        return match if match.expires_at > (now if now is not None else time.time()) else None
+
+    def match_ip(self, ip: str, now: Optional[float] = None) -> Optional[IndicatorMatch]:
+        parsed = parse_address(ip)
+        if parsed is None:
+            return None
+        state = self._state
+        now = now if now is not None else time.time()
+        match = self._live(state.exact_ips.get(parsed), now)
+        if match is not None:
+            return match
+        trie = state.ranges[parsed[0]]
+        if not len(trie):
+            return None
+        hit = trie.longest_match(parsed[1], lambda m: self._live(m, now) is not None)
+        return hit[1] if hit else None
+
+    def match_domain(self, host: str, now: Optional[float] = None) -> Optional[IndicatorMatch]:
+        state = self._state
+        if not len(state.domains):
+            return None
+        now = now if now is not None else time.time()
+        return state.domains.longest_match(normalize_domain(host), lambda m: self._live(m, now) is not None)
+
+    def match_hash(self, digest: str, now: Optional[float] = None) -> Optional[IndicatorMatch]:
+        return self._live(self._state.hashes.get(digest.strip().lower()), now)
+
+    def match(self, value: str, now: Optional[float] = None) -> Optional[IndicatorMatch]:
+        """Any indicator for `value`, trying IP, hash, domain and exact string in turn."""
+        value = value.strip()
+        if parse_address(value) is not None:
+            return self.match_ip(value, now)
+        return (self.match_hash(value, now) or self.match_domain(value, now)
+                or self._live(self._state.other.get(value), now))
+
+    # --- loading ---
+
+    async def load(self, db):
+        """
+        Rebuild from the unexpired rows of `threat_indicators` and swap the
+        new state in atomically.
+        """
+        from datetime import datetime
+        from sqlalchemy import not_, select
+        from app.models.threat import ThreatIndicator
+        from app.services.threat_aging import expired_clause, row_epochs
+
+        fresh = ThreatIndicatorIndex()
+        result = await db.stream(
+            select(ThreatIndicator.indicator_value, ThreatIndicator.indicator_type, ThreatIndicator.source,
+                   ThreatIndicator.description, ThreatIndicator.confidence,
+                   ThreatIndicator.last_updated, ThreatIndicator.expires_at)
+            .where(not_(expired_clause(datetime.utcnow())))
+            .execution_options(yield_per=10000)
+        )
+        async for value, indicator_type, source, description, confidence, last_updated, expires in result:
+            fresh.add(value, indicator_type, source, description, confidence, *row_epochs(last_updated, expires))
+
+        with self._lock:
+            self._state = fresh._state
+            self.loaded = True
+            self.loaded_at = time.time()
+        logger.info(f"Threat indicator index loaded: {len(self)} indicators")
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "loaded": self.loaded,
+            "loaded_at": self.loaded_at,
+            "exact_ips": len(state.exact_ips),
+            "ranges": len(state.ranges[4]) + len(state.ranges[6]),
+            "domains": len(state.domains),
+            "hashes": len(state.hashes),
+            "other": len(state.other),
+        }
+
+
+async def maintain_threat_index(index: ThreatIndicatorIndex, session_factory, refresh_seconds: float):
+    """
+    Background loop: full reload every `refresh_seconds` to pick up
+    indicators ingested by other workers.
+    """
+    while True:
+        await asyncio.sleep(refresh_seconds)
+        try:
+            async with session_factory() as db:
+                await index.load(db)
+        except Exception:
+            logger.exception("Threat indicator refresh failed; keeping previous index")
+
+
+threat_index = ThreatIndicatorIndex()
@@ -0,0 +1,64 @@
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel for expiring many keys cheaply.
+
+    Keys are dropped into the slot for their deadline tick; `advance` only
+    visits the slots that elapsed since the last call, so scheduling and
+    expiring are O(1) amortised. Deadlines further out than one revolution
+    simply stay in their slot until the wheel comes round to the right tick.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 3600,
+                 on_expire: Optional[Callable[[Any], None]] = None):
+        self.tick_seconds = tick_seconds
+        self.slots: List[Set[Any]] = [set() for _ in range(slots)]
+        self.on_expire = on_expire
+        self._deadline: Dict[Any, int] = {}
+        self._current_tick = self._tick(time.time()) - 1
+
+    def __len__(self) -> int:
+        return len(self._deadline)
+
+    def _tick(self, ts: float) -> int:
+        return int(ts // self.tick_seconds)
+
+    def schedule(self, key: Any, expires_at: float):
+        self.cancel(key)
+        # Round up so nothing expires early; already-due keys go in the
+        # next slot to be swept.
+        tick = max(math.ceil(expires_at / self.tick_seconds), self._current_tick + 1)
+        self._deadline[key] = tick
+        self.slots[tick % len(self.slots)].add(key)
+
+    def cancel(self, key: Any):
+        tick = self._deadline.pop(key, None)
+        if tick is not None:
+            self.slots[tick % len(self.slots)].discard(key)
+
+    def advance(self, now: Optional[float] = None) -> List[Any]:
+        """
+        Expire everything due up to `now`; returns the expired keys.
+        """
+        now_tick = self._tick(now if now is not None else time.time())
+        expired = []
+        # Never sweep more than one revolution: that already covers every slot.
+        start = max(self._current_tick + 1, now_tick - len(self.slots) + 1)
+        for tick in range(start, now_tick + 1):
+            slot = self.slots[tick % len(self.slots)]
+            if not slot:
+                continue
+            due = [k for k in slot if self._deadline.get(k, now_tick + 1) <= now_tick]
+            for key in due:
+                slot.discard(key)
+                del self._deadline[key]
+                expired.append(key)
+        self._current_tick = now_tick
+        if self.on_expire:
+            for key in expired:
+                self.on_expire(key)
+        return expired
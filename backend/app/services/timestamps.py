@@ -0,0 +1,13 @@
+import math
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def to_epoch(expires_at: Optional[datetime]) -> float:
+    """Expiry as a UTC epoch; permanent entries never expire (inf)."""
+    if expires_at is None:
+        return math.inf
+    if expires_at.tzinfo is None:
+        # Model timestamps are naive UTC (datetime.utcnow)
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at.timestamp()
@@ -1,12 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core import security
+from app.core.hashing import password_hasher
 
 async def create_user(db: AsyncSession, user_in: UserCreate, organization_id: int = None):
     db_obj = User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=await password_hasher.hash(user_in.password),
         full_name=user_in.full_name,
         role="org_admin", # default
         organization_id=organization_id,
@@ -1,39 +1,125 @@
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
+from app.services.signatures import SignatureEngine, SignatureMatch, SignatureRule
+from app.services.sliding_window import InMemoryWindowBackend, create_window_backend
+from app.services.threat_index import threat_index
 # In a real app, this would query Redis/DB for rate limiting and history
 # For Phase 0, we'll use simple in-memory or rule logic assuming the input has context, or just return basic classification
 
+WEB_FIELDS = ("url", "payload", "user_agent")
+
+# Reported when no signature fires but the source address is a known indicator
+THREAT_INTEL_ATTACK = "Threat Intel Match"
+
+DEFAULT_WEB_RULES = [
+    # SQL Injection (Basic)
+    SignatureRule("SQL Injection", "UNION SELECT", "critical"),
+    SignatureRule("SQL Injection", "OR 1=1", "critical"),
+    SignatureRule("SQL Injection", "DROP TABLE", "critical"),
+    # XSS
+    SignatureRule("XSS Attempt", "<script>", "high"),
+    # Scanners
+    SignatureRule("Vulnerability Scanner", "sqlmap", "high", fields=("user_agent",)),
+    SignatureRule("Vulnerability Scanner", "nikto", "high", fields=("user_agent",)),
+    SignatureRule("Vulnerability Scanner", "nmap", "high", fields=("user_agent",)),
+]
+
 class WebDetectionService:
-    def detect_web_attack(self, method: str, url: str, user_agent: str, payload: str = "") -> Tuple[Optional[str], str]:
+    def __init__(self, rules: Iterable[SignatureRule] = DEFAULT_WEB_RULES):
+        # Rules are compiled once per load (see CompiledSignatures). Literal
+        # rules are matched with str.find on the lowercased fields, not via a
+        # regex; only regex rules share one combined pattern. Verdicts use
+        # first_match, which stops at the most severe hit.
+        self.engine = SignatureEngine(rules, WEB_FIELDS)
+
+    def load_rules(self, rules: Iterable[SignatureRule]) -> None:
+        """
+        Replace the active rule set. In-flight scans finish on the old set.
+        """
+        self.engine.load_rules(rules)
+
+    def scan(self, url: str, user_agent: str, payload: str = "") -> List[SignatureMatch]:
+        """
+        Returns every signature match, most severe first.
+        """
+        return self.engine.scan(url=url, payload=payload or "", user_agent=user_agent or "")
+
+    def detect_web_attack(self, method: str, url: str, user_agent: str, payload: str = "",
+                          ip: Optional[str] = None) -> Tuple[Optional[str], str]:
         """
         Returns (Attack Type, Severity)
+        Signatures win; otherwise a source `ip` listed in threat intel is reported.
         """
-        # SQL Injection (Basic)
-        sql_patterns = ["UNION SELECT", "OR 1=1", "DROP TABLE"]
-        if any(p in payload.upper() or p in url.upper() for p in sql_patterns):
-            return "SQL Injection", "critical"
-            
-        # XSS
-        if "<script>" in payload or "<script>" in url:
-            return "XSS Attempt", "high"
-            
-        # Scanners
-        scanners = ["sqlmap", "nikto", "nmap"]
-        if any(s in user_agent.lower() for s in scanners):
-            return "Vulnerability Scanner", "high"
-            
+        rule = self.engine.first_match(url=url, payload=payload or "", user_agent=user_agent or "")
+        if rule:
+            return rule.attack_type, rule.severity
+        if ip and threat_index.match_ip(ip):
+            return THREAT_INTEL_ATTACK, "high"
         return None, "low"
 
+    def detect_batch(self, events: Iterable[Tuple[str, ...]]) -> List[Tuple[Optional[str], str]]:
+        """
+        Verdicts for many (method, url, user_agent, payload[, ip]) tuples, in order.
+        The whole batch is judged against one rule snapshot.
+        """
+        compiled = self.engine.snapshot()
+        verdicts = []
+        for method, url, user_agent, payload, *ip in events:
+            rule = compiled.first_match({"url": url, "payload": payload or "", "user_agent": user_agent or ""})
+            if rule:
+                verdicts.append((rule.attack_type, rule.severity))
+            elif ip and ip[0] and threat_index.match_ip(ip[0]):
+                verdicts.append((THREAT_INTEL_ATTACK, "high"))
+            else:
+                verdicts.append((None, "low"))
+        return verdicts
+
 class LoginDetectionService:
-    # We ideally need state (Redis) to detect brute force (N failed attempts)
-    # This service will be called AFTER database insert usually to check windows
-    
-    def detect_login_anomaly(self, username: str, success: bool, ip: str) -> Tuple[Optional[str], str]:
+    """
+    Stateful failed-login detector. Every failure updates two sliding
+    windows, one keyed by source IP (members: usernames tried) and one by
+    username (members: source IPs), each a fixed ring of time buckets.
+    """
+    # Failures against one account inside the window
+    BRUTE_FORCE_USER_FAILURES = 10
+    # Failures from one IP against a handful of accounts
+    BRUTE_FORCE_IP_FAILURES = 20
+    # Distinct accounts failed from one IP
+    SPRAY_MIN_USERS = 5
+    # Many accounts, roughly one attempt each: replayed credential lists
+    STUFFING_MIN_USERS = 20
+    STUFFING_MAX_ATTEMPTS_PER_USER = 2.0
+
+    def __init__(self, backend=None):
+        self.backend = backend or InMemoryWindowBackend()
+
+    async def init_backend(self, redis_url: Optional[str]):
+        self.backend = await create_window_backend(redis_url)
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+    async def detect_login_anomaly(self, username: str, success: bool, ip: str, org_id: int = 0,
+                                   now: Optional[float] = None) -> Tuple[Optional[str], str]:
         """
-        In a real implementation, we would check Redis for fail count.
-        For now, we just return None unless we simulate.
+        Returns (Attack Type, Severity). Only failures feed the windows.
         """
-        # Placeholder for Brute Force Logic (implemented in API or here via Redis)
+        if success:
+            return None, "low"
+
+        ip_failures, ip_users = await self.backend.record(f"{org_id}:ip:{ip}", username, now)
+        user_failures, user_ips = await self.backend.record(f"{org_id}:user:{username}", ip, now)
+
+        if (ip_users >= self.STUFFING_MIN_USERS
+                and ip_failures / ip_users <= self.STUFFING_MAX_ATTEMPTS_PER_USER):
+            return "credential_stuffing", "critical"
+        if ip_users >= self.SPRAY_MIN_USERS:
+            return "password_spraying", "high"
+        if user_failures >= self.BRUTE_FORCE_USER_FAILURES:
+            # Many source IPs against one account is a distributed attack
+            return "brute_force", "critical" if user_ips >= self.SPRAY_MIN_USERS else "high"
+        if ip_failures >= self.BRUTE_FORCE_IP_FAILURES:
+            return "brute_force", "high"
         return None, "low"
 
 web_detector = WebDetectionService()
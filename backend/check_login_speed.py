@@ -1,18 +1,87 @@
+"""
+Concurrent login benchmark.
+
+Fires CONCURRENCY parallel logins (TOTAL in all) while a probe thread hits
+the cheap `GET /` health route every PROBE_INTERVAL seconds. If Argon2 ran
+on the event loop, probe latency would climb to the hash time multiplied by
+the number of queued logins; with the hashing executor it should stay in
+the low milliseconds. 503 responses are load shedding (Retry-After).
+
+Usage: python check_login_speed.py [concurrency] [total]
+"""
+import sys
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
-URL = "http://127.0.0.1:8000/api/v1/auth/login"
+BASE = "http://127.0.0.1:8000"
+URL = f"{BASE}/api/v1/auth/login"
 DATA = {"username": "admin@velvet.astro", "password": "admin"}
 
-print(f"[*] Testing login speed for {URL}...")
-start = time.time()
-try:
-    res = requests.post(URL, data=DATA)
-    end = time.time()
-    duration = end - start
-    print(f"Status: {res.status_code}")
-    print(f"Time: {duration:.4f} seconds")
-    if res.status_code != 200:
-        print(res.text)
-except Exception as e:
-    print(f"[-] Error: {e}")
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+TOTAL = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+PROBE_INTERVAL = 0.01
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def login(_):
+    start = time.perf_counter()
+    try:
+        res = requests.post(URL, data=DATA, timeout=30)
+        return res.status_code, time.perf_counter() - start
+    except Exception:
+        return "error", time.perf_counter() - start
+
+
+def probe(stop: threading.Event, samples: list):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            session.get(f"{BASE}/", timeout=10)
+            samples.append(time.perf_counter() - start)
+        except Exception:
+            pass
+        time.sleep(PROBE_INTERVAL)
+
+
+def main():
+    print(f"[*] Single login against {URL}...")
+    status, duration = login(0)
+    print(f"Status: {status}  Time: {duration:.4f} seconds")
+
+    print(f"\n[*] {TOTAL} logins, {CONCURRENCY} concurrent, probing event loop via GET /")
+    stop = threading.Event()
+    probe_samples = []
+    prober = threading.Thread(target=probe, args=(stop, probe_samples), daemon=True)
+    prober.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        results = list(pool.map(login, range(TOTAL)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    statuses = Counter(status for status, _ in results)
+    latencies = [d for status, d in results if status == 200]
+    print(f"Wall time: {elapsed:.2f}s  Throughput: {TOTAL / elapsed:.1f} logins/s")
+    print(f"Statuses: {dict(statuses)}")
+    print(f"Login latency  p50={percentile(latencies, 50) * 1000:.1f}ms  "
+          f"p95={percentile(latencies, 95) * 1000:.1f}ms  max={max(latencies, default=0) * 1000:.1f}ms")
+    print(f"Probe latency  p50={percentile(probe_samples, 50) * 1000:.1f}ms  "
+          f"p99={percentile(probe_samples, 99) * 1000:.1f}ms  max={max(probe_samples, default=0) * 1000:.1f}ms  "
+          f"(n={len(probe_samples)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Seed BehavioralProfile login baselines from historical LoginEvent rows.
+
+Resumable: progress is committed per chunk with a watermark, so re-running
+continues after the last processed event. Run from backend/:
+
+  python -m scripts.backfill_baselines [--org ID] [--chunk-size N] [--max-events N] [--reset]
+
+Or queue it on a worker:  celery -A app.core.celery_app call anomaly.backfill_baselines
+"""
+import argparse
+import asyncio
+import sys
+
+from app.services.baseline_backfill import BACKFILL_CHUNK_SIZE, BaselineBackfill
+
+# Windows requires this for asyncio loop
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+def print_progress(stats: dict):
+    pct = 100.0 * stats["processed"] / stats["total"] if stats["total"] else 100.0
+    print(f"[{stats['job']}] {stats['processed']}/{stats['total']} events ({pct:.1f}%) "
+          f"watermark={stats['watermark']} created={stats['profiles_created']} "
+          f"updated={stats['profiles_updated']} {stats['events_per_s']:.0f} ev/s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--org", type=int, default=None, help="Only backfill this organization")
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument("--max-events", type=int, default=None, help="Stop after this many events")
+    parser.add_argument("--reset", action="store_true", help="Restart from the first event (empty baselines only)")
+    args = parser.parse_args()
+
+    job = BaselineBackfill(chunk_size=args.chunk_size, org_id=args.org, progress=print_progress)
+    stats = await job.run(reset=args.reset, max_events=args.max_events)
+    print(f"Done: {stats['processed']} events in {stats['elapsed_s']}s, "
+          f"{stats['profiles_created']} profiles created, {stats['profiles_updated']} updated, "
+          f"watermark={stats['watermark']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
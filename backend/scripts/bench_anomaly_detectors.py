@@ -0,0 +1,100 @@
+"""
+Login-time anomaly detectors: IsolationForest (batch refit) vs the streaming
+hour-of-day sketch, on synthetic per-user login histories.
+
+Each user gets 50 historical logins drawn around one or two habitual hours,
+then is scored on fresh logins from the same habit (label: normal) and on
+logins at least 5 hours away from every habit (label: anomalous). Only the
+login-time component is compared; the new-IP rule is shared by both.
+
+Run from backend/:  python -m scripts.bench_anomaly_detectors [users]
+"""
+import random
+import sys
+import time
+
+from app.services.anomaly import fit_login_model
+from app.services.online_detector import HourOfDaySketch
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+HISTORY = 50
+PROBES = 20
+HABITS = [(9.0,), (13.5,), (22.0,), (8.5, 14.0), (2.0,)]
+
+
+def circular_distance(a: float, b: float) -> float:
+    d = abs(a - b) % 24
+    return min(d, 24 - d)
+
+
+def make_user(rng: random.Random):
+    modes = rng.choice(HABITS)
+    spread = rng.uniform(0.5, 1.5)
+
+    def draw():
+        return rng.gauss(rng.choice(modes), spread) % 24
+
+    history = [draw() for _ in range(HISTORY)]
+    normal = [draw() for _ in range(PROBES)]
+    anomalous = []
+    while len(anomalous) < PROBES:
+        hour = rng.uniform(0, 24)
+        if all(circular_distance(hour, m) >= 5 for m in modes):
+            anomalous.append(hour)
+    return history, normal, anomalous
+
+
+def report(name, tp, fp, fn, tn, timings):
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    accuracy = (tp + tn) / (tp + fp + fn + tn)
+    print(f"{name:<18} acc={accuracy:.3f} precision={precision:.3f} recall={recall:.3f} f1={f1:.3f}")
+    for label, samples in timings.items():
+        mean = sum(samples) / len(samples) * 1e6
+        print(f"{'':<18} {label:<22} {mean:>12.1f} us/event")
+
+
+def main():
+    rng = random.Random(7)
+    users = [make_user(rng) for _ in range(USERS)]
+    sketch = HourOfDaySketch()
+
+    # IsolationForest: what detect_login_anomaly did before caching (fit + score per login)
+    counts = [0, 0, 0, 0]
+    fit_times, score_times = [], []
+    for history, normal, anomalous in users:
+        start = time.perf_counter()
+        clf = fit_login_model(history)
+        fit_times.append(time.perf_counter() - start)
+        for label, hours in ((False, normal), (True, anomalous)):
+            for hour in hours:
+                start = time.perf_counter()
+                flagged = clf.decision_function([[hour]])[0] < 0
+                score_times.append(time.perf_counter() - start)
+                counts[(0 if flagged else 2) + (0 if label == flagged else 1)] += 1
+    tp, fp, fn, tn = counts[0], counts[1], counts[3], counts[2]
+    report("isolation_forest", tp, fp, fn, tn,
+           {"fit (per baseline change)": fit_times, "score (cached model)": score_times})
+
+    # Streaming sketch: O(1) update per login, microsecond scoring
+    counts = [0, 0, 0, 0]
+    update_times, score_times = [], []
+    for history, normal, anomalous in users:
+        state = sketch.new_state()
+        for hour in history:
+            start = time.perf_counter()
+            state = sketch.update(state, hour)
+            update_times.append(time.perf_counter() - start)
+        for label, hours in ((False, normal), (True, anomalous)):
+            for hour in hours:
+                start = time.perf_counter()
+                flagged, _ = sketch.score(state, hour)
+                score_times.append(time.perf_counter() - start)
+                counts[(0 if flagged else 2) + (0 if label == flagged else 1)] += 1
+    tp, fp, fn, tn = counts[0], counts[1], counts[3], counts[2]
+    report("streaming", tp, fp, fn, tn, {"update": update_times, "score": score_times})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Baseline encoding: stored size and per-login update cost of the original
+free-form JSON (unbounded ip_history list) vs the compact v2 layout, as JSON
+and as a packed binary blob.
+
+Each update includes the JSON round-trip the database driver performs,
+since the whole document is rewritten on every login.
+
+Run from backend/:  python -m scripts.bench_baseline_encoding [logins] [distinct_ips]
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime
+
+from app.services.baseline_codec import LoginBaseline
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+DISTINCT_IPS = int(sys.argv[2]) if len(sys.argv) > 2 else 800
+
+
+def legacy_apply(data: dict, login_time: datetime, ip_address: str) -> dict:
+    # Original update_login_baseline body, kept here for comparison.
+    hour = login_time.hour + (login_time.minute / 60.0)
+    login_times = data.get("login_times", [])
+    login_times.append(hour)
+    if len(login_times) > 50:
+        login_times = login_times[-50:]
+    data["login_times"] = login_times
+    ip_history = data.get("ip_history", [])
+    if ip_address not in ip_history:
+        ip_history.append(ip_address)
+    data["ip_history"] = ip_history
+    return data
+
+
+def workload(seed: int = 5):
+    rng = random.Random(seed)
+    # A roaming user: a handful of carrier/office networks, many addresses in each
+    networks = [f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(40)]
+    pool = [f"{rng.choice(networks)}.{rng.randrange(1, 255)}" for _ in range(DISTINCT_IPS)]
+    return [(datetime(2025, 1, 1, int(rng.gauss(10, 2)) % 24, rng.randrange(60)), rng.choice(pool))
+            for _ in range(LOGINS)]
+
+
+def run(name, events, apply_fn):
+    row = json.dumps({})
+    start = time.perf_counter()
+    for login_time, ip in events:
+        row = json.dumps(apply_fn(json.loads(row), login_time, ip))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} row={len(row):>7} bytes   update={elapsed / len(events) * 1e6:>8.1f} us/login")
+    return row
+
+
+def v2(binary: bool):
+    def apply_fn(data, login_time, ip):
+        baseline = LoginBaseline.decode(data)
+        baseline.add_login(login_time.hour + login_time.minute / 60.0, ip)
+        return baseline.encode(binary=binary)
+    return apply_fn
+
+
+def main():
+    events = workload()
+    print(f"{LOGINS} logins from {DISTINCT_IPS} distinct addresses\n")
+    legacy_row = run("v1 json", events, legacy_apply)
+    run("v2 json", events, v2(False))
+    run("v2 binary", events, v2(True))
+
+    # Transparent migration: a v1 row decodes and re-encodes in the new layout
+    start = time.perf_counter()
+    migrated = json.dumps(LoginBaseline.decode(json.loads(legacy_row)).encode())
+    print(f"\nmigrate v1 -> v2: {len(legacy_row)} -> {len(migrated)} bytes "
+          f"in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
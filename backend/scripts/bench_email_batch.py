@@ -0,0 +1,47 @@
+"""
+Batch email analysis: one message at a time on the event loop (what
+/email/ingest does per call) vs EmailBatchAnalyzer on a process pool, for a
+few worker counts and chunk sizes. Throughput only scales up to the number
+of cores; the first batch per pool also pays for spawning the workers, so
+each configuration is warmed up before it is timed.
+
+Run from backend/:  python -m scripts.bench_email_batch [mails]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from app.services.email_batch import EmailBatchAnalyzer
+from app.services.email_detection import email_detector
+from scripts.bench_email_detection import make_corpus
+
+MAILS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+
+def report(label: str, elapsed: float, mails: int):
+    print(f"{label:<28} {elapsed:.3f}s  {mails / elapsed:>12,.0f} mails/s")
+
+
+async def main():
+    corpus = make_corpus(MAILS)
+    print(f"[*] {MAILS} mails, {os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    expected = [email_detector.analyze_email(*mail) for mail in corpus]
+    report("sequential", time.perf_counter() - start, MAILS)
+
+    for workers in (1, 2, 4):
+        for chunk_size in (100, 500, 2000):
+            analyzer = EmailBatchAnalyzer(email_detector, workers=workers, chunk_size=chunk_size)
+            await analyzer.analyze(corpus[:workers * chunk_size * 2])
+            start = time.perf_counter()
+            verdicts = await analyzer.analyze(corpus)
+            elapsed = time.perf_counter() - start
+            analyzer.shutdown()
+            assert verdicts == expected, "batch verdicts differ from sequential ones"
+            report(f"pool workers={workers} chunk={chunk_size}", elapsed, MAILS)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
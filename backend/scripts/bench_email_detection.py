@@ -0,0 +1,130 @@
+"""
+Benchmark: compiled email rules vs the original per-keyword / per-domain
+loops, over a synthetic mail corpus. The compiled side also runs the
+threat intel lookups (against an empty index), the legacy side has none.
+Verdicts are compared too; they differ
+only where the old substring checks misfired (".top" inside a path,
+"bit.ly" inside "bit.lyrics.com", look-alike brand domains).
+
+Run from backend/:  python -m scripts.bench_email_detection [mails]
+"""
+import random
+import string
+import sys
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from app.services.email_detection import EmailDetectionService
+from app.services.email_rules import BrandRule, CompiledEmailRules
+
+MAILS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+KEYWORDS = ["reset password", "urgent", "verify account", "bank", "invoice"]
+SUSPICIOUS = ["bit.ly", "tinyurl.com", ".xyz", ".top"]
+
+
+def legacy_analyze(sender: str, subject: str, body: str, links: List[str],
+                   keywords=KEYWORDS, suspicious=SUSPICIOUS) -> Tuple[Optional[str], float, str]:
+    # Original EmailDetectionService.analyze_email, threat intel step aside.
+    severity = "low"
+    confidence = 0.0
+    attack_type = None
+    keyword_hits = sum(1 for k in keywords if k in subject.lower() or k in body.lower())
+    if keyword_hits >= 2:
+        confidence += 0.4
+        attack_type = "Potential Phishing"
+        severity = "medium"
+    for link in links:
+        if any(d in link for d in suspicious):
+            confidence += 0.5
+            attack_type = "Malicious Link"
+            severity = "high"
+            break
+    if "paypal" in sender.lower() and "paypal.com" not in sender.lower():
+        confidence = 0.9
+        attack_type = "Brand Spoofing"
+        severity = "critical"
+    if confidence > 0.0 and attack_type is None:
+        attack_type = "Suspicious Content"
+    return attack_type, min(confidence, 1.0), severity
+
+
+def make_corpus(n: int, seed: int = 5):
+    rng = random.Random(seed)
+    words = ("the report meeting schedule attached please review team quarterly numbers account "
+             "password update project deadline customer order shipping").split()
+    phrases = ["", "", "", "urgent", "verify account", "reset password", "invoice", "bank"]
+    hosts = ["docs.example.com", "intranet.corp.local", "cdn.shop.example", "www.github.com",
+             "news.example.org", "mail.example.net"]
+    bad_hosts = ["bit.ly", "x7.tinyurl.com", "promo.win.xyz", "login-secure.top"]
+    # Legitimate hosts and paths the old substring checks flagged
+    decoys = ["https://docs.example.com/desktop.topics.html", "https://bit.lyrics.com/song",
+              "https://shop.example/laptop.xyzzy"]
+    senders = ["Alice <alice@example.com>", "billing@vendor.example", "PayPal <service@paypal.com>",
+               "PayPal Support <help@paypal.com.secure-login.top>", "paypal@evil.example"]
+    # Mail keeps linking the same handful of URLs
+    link_pool = [f"https://{rng.choice(hosts)}/{''.join(rng.choices(string.ascii_lowercase, k=8))}"
+                 for _ in range(2000)]
+    corpus = []
+    for _ in range(n):
+        body_words = [rng.choice(words) for _ in range(rng.randint(40, 400))]
+        for _ in range(rng.randint(0, 2)):
+            body_words.insert(rng.randrange(len(body_words)), rng.choice(phrases))
+        links = [rng.choice(link_pool) for _ in range(rng.randint(0, 6))]
+        roll = rng.random()
+        if roll < 0.05:
+            links.append(f"http://{rng.choice(bad_hosts)}/{rng.randrange(10**6)}")
+        elif roll < 0.08:
+            links.append(rng.choice(decoys))
+        sender = rng.choice(senders) if rng.random() < 0.1 else senders[0]
+        corpus.append((sender, f"{rng.choice(phrases)} {rng.choice(words)}".strip(), " ".join(body_words), links))
+    return corpus
+
+
+def run(label: str, fn, corpus) -> float:
+    start = time.perf_counter()
+    for sender, subject, body, links in corpus:
+        fn(sender, subject, body, links)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:.3f}s  {len(corpus) / elapsed:>12,.0f} mails/s  {elapsed / len(corpus) * 1e6:.2f} us/mail")
+    return elapsed
+
+
+def main():
+    corpus = make_corpus(MAILS)
+    service = EmailDetectionService()
+
+    changed = Counter()
+    for sender, subject, body, links in corpus:
+        old = legacy_analyze(sender, subject, body, links)[0]
+        new = service.analyze_email(sender, subject, body, links)[0]
+        if old != new:
+            changed[(old, new)] += 1
+    print(f"[*] {MAILS} mails, verdict changes vs legacy: {sum(changed.values())}")
+    for (old, new), count in changed.most_common():
+        print(f"    {old} -> {new}: {count}")
+
+    legacy = run("legacy", legacy_analyze, corpus)
+    compiled = run("compiled", service.analyze_email, corpus)
+    print(f"[*] speedup: {legacy / compiled:.2f}x")
+
+    # Scaling: larger keyword and domain lists, as loaded from a real config.
+    # The legacy loop gets slow enough that a slice of the corpus will do.
+    corpus = corpus[:5000]
+    rng = random.Random(9)
+    for n_keywords, n_domains in ((50, 1000), (200, 20000)):
+        keywords = KEYWORDS + ["".join(rng.choices(string.ascii_lowercase + " ", k=rng.randint(6, 14)))
+                               for _ in range(n_keywords)]
+        domains = ["bit.ly", "tinyurl.com"] + [f"{''.join(rng.choices(string.ascii_lowercase, k=9))}.example"
+                                               for _ in range(n_domains)]
+        rules = CompiledEmailRules(keywords, 2, domains, ["xyz", "top"], [BrandRule("paypal", ("paypal.com",))])
+        print(f"\n[*] {len(keywords)} keywords, {len(domains)} domains")
+        legacy = run("legacy", lambda s, sub, b, l: legacy_analyze(s, sub, b, l, keywords, domains + [".xyz", ".top"]),
+                     corpus)
+        compiled = run("compiled", EmailDetectionService(rules).analyze_email, corpus)
+        print(f"[*] speedup: {legacy / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Indicator aging under continuous ingestion: every simulated day a feed
+re-publishes part of yesterday's indicators plus a batch of new ones, the
+clock moves forward a day (all expiries shift back) and, with aging on, the
+sweeper removes what expired. Reports table size, index size, sweep time
+and DB/index lookup latency per day, against a scratch SQLite database.
+
+Run from backend/:  python -m scripts.bench_threat_aging [days] [new_per_day] [ttl_days]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.models.threat import ThreatIndicator, ThreatIndicatorArchive
+from app.services.threat import ThreatIntelService
+from app.services.threat_aging import IndicatorSweeper
+from app.services.threat_index import ThreatIndicatorIndex, threat_index
+
+DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+NEW_PER_DAY = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+TTL_DAYS = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+# Share of yesterday's indicators a feed publishes again
+REPUBLISHED = 0.3
+LOOKUPS = 2000
+
+
+def address(n: int) -> str:
+    return f"{(n >> 24) % 223 + 1}.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+async def lookup_latency(db, probes):
+    threat_index.loaded = False
+    service = ThreatIntelService(db)
+    start = time.perf_counter()
+    for ip in probes:
+        await service.check_ip(ip)
+    db_us = (time.perf_counter() - start) / len(probes) * 1e6
+    threat_index.loaded = True
+    start = time.perf_counter()
+    for ip in probes:
+        threat_index.match_ip(ip)
+    index_us = (time.perf_counter() - start) / len(probes) * 1e6
+    return db_us, index_us
+
+
+async def run(aging: bool):
+    path = os.path.join(tempfile.mkdtemp(), "bench_aging.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(ThreatIndicator.__table__.create)
+        await conn.run_sync(ThreatIndicatorArchive.__table__.create)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    settings.THREAT_SOURCE_TTL_DAYS = {"feed": TTL_DAYS}
+    threat_index._state = ThreatIndicatorIndex()._state
+    sweeper = IndicatorSweeper(sessions, threat_index, batch_size=settings.THREAT_SWEEP_BATCH_SIZE, archive=False)
+
+    rng = random.Random(11)
+    next_id = 0
+    yesterday = []
+    print(f"--- aging {'on' if aging else 'off'} (ttl {TTL_DAYS:g} days) ---")
+    print(f"{'day':>4} {'table':>9} {'index':>9} {'swept':>8} {'sweep_s':>8} {'db_us':>8} {'index_us':>9}")
+    for day in range(1, DAYS + 1):
+        fresh = [address(next_id + i) for i in range(NEW_PER_DAY)]
+        next_id += NEW_PER_DAY
+        today = fresh + rng.sample(yesterday, int(len(yesterday) * REPUBLISHED))
+        async with sessions() as db:
+            await ThreatIntelService(db).ingest_feed("feed", [{"value": v, "type": "IP"} for v in today])
+            # Advance the clock a day: everything was seen a day earlier
+            # (SQLite date arithmetic; stored timestamps are ISO strings)
+            await db.execute(update(ThreatIndicator).values(
+                last_updated=func.datetime(ThreatIndicator.last_updated, "-1 day"),
+                expires_at=func.datetime(ThreatIndicator.expires_at, "-1 day"),
+            ))
+            await db.commit()
+        yesterday = today
+
+        swept, sweep_s = 0, 0.0
+        if aging:
+            stats = await sweeper.sweep()
+            swept, sweep_s = stats["removed"], stats["elapsed_s"]
+        async with sessions() as db:
+            # The periodic full reload; it skips expired rows either way
+            await threat_index.load(db)
+            rows = await db.scalar(select(func.count()).select_from(ThreatIndicator))
+            probes = [address(rng.randrange(next_id)) for _ in range(LOOKUPS)]
+            db_us, index_us = await lookup_latency(db, probes)
+        print(f"{day:>4} {rows:>9} {len(threat_index):>9} {swept:>8} {sweep_s:>8.2f} {db_us:>8.1f} {index_us:>9.2f}")
+
+    await engine.dispose()
+
+
+async def main():
+    await run(aging=False)
+    await run(aging=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
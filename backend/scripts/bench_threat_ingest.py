@@ -0,0 +1,93 @@
+"""
+Threat feed ingest: the original one-SELECT-per-indicator loop vs the
+chunked INSERT ... ON CONFLICT upsert, against a scratch SQLite database.
+
+The bulk path is measured on a fresh feed (all inserts), on the same feed
+again (all unchanged) and on a feed where half the indicators moved source.
+The legacy loop only runs on a slice of the feed, it is that slow.
+
+Run from backend/:  python -m scripts.bench_threat_ingest [indicators] [legacy_indicators]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.future import select
+
+from app.models.threat import ThreatIndicator
+from app.services.threat import ThreatIntelService
+
+INDICATORS = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+LEGACY_INDICATORS = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+
+def feed(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        if i % 3:
+            value = f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+            items.append({"value": value, "type": "IP", "desc": "Scanner"})
+        else:
+            items.append({"value": f"host{i}.bad-{rng.randrange(10000)}.example", "type": "DOMAIN", "desc": "Phishing"})
+    # Real feeds repeat themselves
+    items += rng.sample(items, count // 20)
+    return items
+
+
+async def legacy_ingest(db: AsyncSession, source_name: str, indicators: list):
+    # Original ThreatIntelService.ingest_feed body, kept here for comparison.
+    for item in indicators:
+        val = item.get("value")
+        result = await db.execute(select(ThreatIndicator).where(ThreatIndicator.indicator_value == val))
+        existing = result.scalars().first()
+        if existing:
+            existing.last_updated = datetime.utcnow()
+            existing.source = source_name
+        else:
+            db.add(ThreatIndicator(
+                indicator_value=val,
+                indicator_type=item.get("type", "IP"),
+                source=source_name,
+                description=item.get("desc"),
+                confidence=80.0
+            ))
+    await db.commit()
+
+
+async def main():
+    path = os.path.join(tempfile.mkdtemp(), "bench_threat.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(ThreatIndicator.__table__.create)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    items = feed(INDICATORS)
+    moved = [dict(item) for item in items[::2]]
+
+    async with sessions() as db:
+        start = time.perf_counter()
+        await legacy_ingest(db, "legacy", items[:LEGACY_INDICATORS])
+        elapsed = time.perf_counter() - start
+        print(f"{'legacy loop':<22} {LEGACY_INDICATORS:>8} indicators {elapsed:>8.2f}s "
+              f"{LEGACY_INDICATORS / elapsed:>10.0f}/s")
+
+    for name, source, batch in (("bulk (new+legacy)", "feed-a", items), ("bulk (re-ingest)", "feed-a", items),
+                                ("bulk (half moved)", "feed-b", moved)):
+        async with sessions() as db:
+            start = time.perf_counter()
+            stats = await ThreatIntelService(db).ingest_feed(source, batch)
+            elapsed = time.perf_counter() - start
+        print(f"{name:<22} {len(batch):>8} indicators {elapsed:>8.2f}s {len(batch) / elapsed:>10.0f}/s  "
+              f"inserted={stats['inserted']} updated={stats['updated']} unchanged={stats['unchanged']}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
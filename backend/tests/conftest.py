@@ -0,0 +1,34 @@
+import asyncio
+import os
+import tempfile
+
+# Point the app's default engine at a scratch file before anything imports
+# app.db.session, so no test touches local_dev.db
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db")
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import app.db.base  # noqa: F401  registers every model on Base.metadata
+import app.models.auth_provider  # noqa: F401
+import app.models.defense_rule  # noqa: F401
+from app.db.session import Base
+from app.models.organization import Organization
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a fresh SQLite file with every table created and organization 1."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/db.sqlite")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with factory() as db:
+            db.add(Organization(id=1, name="Org"))
+            await db.commit()
+
+    asyncio.run(setup())
+    yield factory
+    asyncio.run(engine.dispose())
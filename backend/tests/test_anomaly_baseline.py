@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.models.behavior import BehavioralProfile
+from app.services.anomaly import AnomalyService
+from app.services.baseline_codec import LoginBaseline
+
+
+def _profiles(session_factory):
+    async def go():
+        async with session_factory() as db:
+            return (await db.execute(select(BehavioralProfile))).scalars().all()
+    return asyncio.run(go())
+
+
+def test_concurrent_first_logins_create_one_profile(session_factory):
+    async def login(minute):
+        async with session_factory() as db:
+            await AnomalyService(db).update_login_baseline(1, 7, datetime(2025, 1, 1, 9, minute), f"10.0.0.{minute}")
+
+    async def go():
+        await asyncio.gather(*(login(minute) for minute in range(10)))
+
+    asyncio.run(go())
+    profiles = _profiles(session_factory)
+    assert len(profiles) == 1
+    assert profiles[0].baseline_version == 10
+    assert len(LoginBaseline.decode(profiles[0].baseline_data).login_times) == 10
+
+
+def test_concurrent_updates_to_existing_profile_all_land(session_factory):
+    async def login(minute):
+        async with session_factory() as db:
+            await AnomalyService(db).update_login_baseline(1, 7, datetime(2025, 1, 1, 10, minute), "10.0.0.1")
+
+    async def go():
+        await login(0)
+        await asyncio.gather(*(login(minute) for minute in range(1, 13)))
+
+    asyncio.run(go())
+    profiles = _profiles(session_factory)
+    assert [p.baseline_version for p in profiles] == [13]
+    assert len(LoginBaseline.decode(profiles[0].baseline_data).login_times) == 13
+
+
+def test_get_or_create_profile_is_idempotent_under_concurrency(session_factory):
+    async def fetch():
+        async with session_factory() as db:
+            return (await AnomalyService(db).get_or_create_profile(1, "user", "9")).id
+
+    async def go():
+        return await asyncio.gather(*(fetch() for _ in range(8)))
+
+    ids = asyncio.run(go())
+    assert len(set(ids)) == 1
+    assert len(_profiles(session_factory)) == 1
+
+
+def test_simulate_training_seeds_current_users_baseline(session_factory):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.deps import get_current_user, get_db
+    from app.api.v1.endpoints import anomaly
+    from app.models.user import User
+
+    async def db():
+        async with session_factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(anomaly.router, prefix="/anomaly")
+    app.dependency_overrides[get_db] = db
+    app.dependency_overrides[get_current_user] = lambda: User(id=7, organization_id=1, email="u@example.com")
+
+    response = TestClient(app).post("/anomaly/train/simulate")
+    assert response.status_code == 200
+    profiles = _profiles(session_factory)
+    assert [(p.org_id, p.entity_id, p.baseline_version) for p in profiles] == [(1, "7", 30)]
+
+
+def test_repeated_logins_reuse_the_cached_model(session_factory, monkeypatch):
+    from app.services import anomaly
+    from app.services.model_registry import ModelRegistry
+
+    registry = ModelRegistry(workers=1)
+    monkeypatch.setattr(anomaly, "model_registry", registry)
+    monkeypatch.setattr(anomaly.settings, "ANOMALY_MODEL_REFIT_LOGINS", 10)
+
+    async def go():
+        async with session_factory() as db:
+            service = AnomalyService(db)
+            for minute in range(10):
+                await service.update_login_baseline(1, 7, datetime(2025, 1, 1, 9, minute), "10.0.0.1")
+            for minute in range(10, 30):
+                result = await service.analyze_and_learn(1, 7, datetime(2025, 1, 1, 9, minute), "10.0.0.1",
+                                                         detector=anomaly.DETECTOR_ISOLATION_FOREST)
+                assert result["reason"] != "Insufficient data"
+
+    try:
+        asyncio.run(go())
+    finally:
+        registry.shutdown()
+    # Versions 10..29 span two training epochs: two fits, every other login a hit
+    assert registry.misses == 2
+    assert registry.hits == 18
@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.future import select
+
+from app.models.behavior import BehavioralProfile
+from app.models.job_watermark import JobWatermark
+from app.models.login_event import LoginEvent
+from app.services import baseline_backfill
+from app.services.baseline_backfill import BaselineBackfill, ChunkConflict
+from app.services.baseline_codec import LoginBaseline
+
+START = datetime(2025, 1, 1, 8, 0)
+
+
+def _events():
+    events = []
+    for i in range(60):
+        events.append(LoginEvent(organization_id=1, user_id=1 + i % 3, source_ip=f"10.0.{i % 3}.{i}",
+                                 success=True, timestamp=START + timedelta(hours=5 * i, minutes=i)))
+    # Skipped: failed logins and unknown users
+    events += [
+        LoginEvent(organization_id=1, user_id=1, source_ip="192.0.2.1", success=False, timestamp=START),
+        LoginEvent(organization_id=1, user_id=None, source_ip="192.0.2.2", success=True, timestamp=START),
+    ]
+    return events
+
+
+def _seed(session_factory):
+    async def go():
+        async with session_factory() as db:
+            db.add_all(_events())
+            await db.commit()
+    asyncio.run(go())
+
+
+def _state(session_factory):
+    async def go():
+        async with session_factory() as db:
+            profiles = (await db.execute(select(BehavioralProfile).order_by(BehavioralProfile.entity_id))).scalars()
+            baselines = {}
+            for p in profiles:
+                baseline = LoginBaseline.decode(p.baseline_data)
+                baselines[p.entity_id] = (p.baseline_version, baseline.login_times, dict(baseline.prefixes),
+                                          baseline.sketch["n"])
+            watermark = await db.get(JobWatermark, "baseline_backfill:all")
+            return baselines, (watermark.last_id, watermark.processed) if watermark else None
+    return asyncio.run(go())
+
+
+@pytest.fixture
+def reference(tmp_path_factory):
+    """Baselines and watermark after one uninterrupted run over the same events."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from app.db.session import Base
+    from app.models.organization import Organization
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path_factory.mktemp('ref')}/db.sqlite")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with factory() as db:
+            db.add(Organization(id=1, name="Org"))
+            await db.commit()
+
+    asyncio.run(setup())
+    _seed(factory)
+    stats = asyncio.run(BaselineBackfill(factory, chunk_size=1000).run())
+    assert (stats["processed"], stats["chunks"], stats["profiles_created"]) == (60, 1, 3)
+    state = _state(factory)
+    asyncio.run(engine.dispose())
+    return state
+
+
+def test_resuming_after_max_events_matches_one_run(session_factory, reference):
+    _seed(session_factory)
+    backfill = BaselineBackfill(session_factory, chunk_size=7)
+    first = asyncio.run(backfill.run(max_events=25))
+    assert (first["processed"], first["chunks"]) == (25, 4)
+    assert _state(session_factory)[1] == (first["watermark"], 25)
+
+    second = asyncio.run(backfill.run())
+    assert (second["start_id"], second["total"], second["processed"]) == (first["watermark"], 35, 35)
+    assert _state(session_factory) == reference
+    # Nothing left: a third run is a no-op
+    assert asyncio.run(backfill.run())["processed"] == 0
+
+
+def test_failed_chunk_rolls_back_and_is_redone_on_resume(session_factory, reference, monkeypatch):
+    _seed(session_factory)
+    write = BaselineBackfill._write_chunk
+    calls = []
+
+    async def failing_write(self, db, groups, last_id, processed):
+        calls.append(last_id)
+        result = await write(self, db, groups, last_id, processed)
+        if len(calls) == 3:
+            raise RuntimeError("worker died mid-chunk")
+        return result
+
+    monkeypatch.setattr(BaselineBackfill, "_write_chunk", failing_write)
+    with pytest.raises(RuntimeError):
+        asyncio.run(BaselineBackfill(session_factory, chunk_size=10).run())
+    # The third chunk's profile writes went with its uncommitted watermark
+    assert _state(session_factory)[1] == (calls[1], 20)
+
+    monkeypatch.setattr(BaselineBackfill, "_write_chunk", write)
+    stats = asyncio.run(BaselineBackfill(session_factory, chunk_size=10).run())
+    assert (stats["start_id"], stats["processed"]) == (calls[1], 40)
+    assert _state(session_factory) == reference
+
+
+def test_conflicting_chunk_is_retried(session_factory, reference, monkeypatch):
+    _seed(session_factory)
+    write = BaselineBackfill._write_chunk
+    conflicts = []
+
+    async def racing_write(self, db, groups, last_id, processed):
+        if not conflicts:
+            conflicts.append(last_id)
+            await db.rollback()
+            raise ChunkConflict()
+        return await write(self, db, groups, last_id, processed)
+
+    monkeypatch.setattr(BaselineBackfill, "_write_chunk", racing_write)
+    sleep = asyncio.sleep
+    monkeypatch.setattr(baseline_backfill.asyncio, "sleep", lambda _: sleep(0))
+    stats = asyncio.run(BaselineBackfill(session_factory, chunk_size=1000).run())
+    assert len(conflicts) == 1 and stats["processed"] == 60
+    assert _state(session_factory) == reference
@@ -0,0 +1,78 @@
+import base64
+import json
+
+import pytest
+
+from app.services.baseline_codec import (
+    BASELINE_FORMAT, LOGIN_HISTORY_LIMIT, MAX_IP_PREFIXES, LoginBaseline, ip_prefix
+)
+from app.services.online_detector import hour_sketch
+
+V1 = {
+    "login_times": [9.0, 9.5, 10.25, 14.0, 23.75],
+    "ip_history": ["10.0.0.1", "10.0.0.2", "2001:db8:1:2::5", "192.168.7.9", "10.0.0.99", "not-an-ip"],
+}
+
+
+def test_ip_prefix():
+    assert ip_prefix("10.1.2.3") == "10.1.2.0/24"
+    assert ip_prefix("2001:db8:1:2:3:4:5:6") == "2001:db8:1:2::/64"
+    assert ip_prefix("unknown") == "unknown"
+
+
+def test_v1_documents_decode_to_prefix_counts():
+    for stored in (V1, json.dumps(V1)):
+        baseline = LoginBaseline.decode(stored)
+        assert baseline.login_times == V1["login_times"]
+        # Newest last: 10.0.0.0/24 was seen again after the others
+        assert list(baseline.prefixes.items()) == [
+            ("2001:db8:1:2::/64", 1), ("192.168.7.0/24", 1), ("10.0.0.0/24", 3), ("not-an-ip", 1)
+        ]
+        assert baseline.knows_ip("10.0.0.200") and not baseline.knows_ip("10.0.1.1")
+        # No stored sketch: seeded from the history on demand
+        assert baseline.sketch is None
+        assert baseline.sketch_state() == hour_sketch.seed(V1["login_times"])
+    assert not LoginBaseline.decode(None) and not LoginBaseline.decode({})
+
+
+def test_v1_history_is_trimmed_to_the_v2_limits():
+    baseline = LoginBaseline.decode({
+        "login_times": [float(i % 24) for i in range(80)],
+        "ip_history": [f"10.{i}.0.1" for i in range(100)],
+    })
+    assert len(baseline.login_times) == LOGIN_HISTORY_LIMIT
+    assert baseline.login_times[-1] == 79 % 24
+    assert len(baseline.prefixes) == MAX_IP_PREFIXES
+    assert next(iter(baseline.prefixes)) == f"10.{100 - MAX_IP_PREFIXES}.0.0/24"
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_v2_round_trip(binary):
+    baseline = LoginBaseline.decode(V1)
+    baseline.add_login(8.5, "10.0.0.7")
+    baseline.add_logins([22.0, 0.25], ["172.16.0.1", None])
+
+    data = baseline.encode(binary=binary)
+    assert data["v"] == BASELINE_FORMAT
+    if binary:
+        assert set(data) == {"v", "enc", "data"}
+    decoded = LoginBaseline.decode(json.loads(json.dumps(data)))
+    assert decoded.login_times == baseline.login_times
+    assert list(decoded.prefixes.items()) == list(baseline.prefixes.items())
+    assert decoded.sketch["n"] == baseline.sketch["n"] == len(V1["login_times"]) + 3
+    assert decoded.sketch["hist"] == pytest.approx(baseline.sketch["hist"], abs=1e-5)
+
+
+def test_updates_migrate_v1_profiles_on_write():
+    baseline = LoginBaseline.decode(V1)
+    baseline.add_login(11.0, "10.0.0.3")
+    data = baseline.encode()
+    assert data["v"] == BASELINE_FORMAT and "ip_history" not in data and "login_times" not in data
+    assert data["login_minutes"][-1] == 11 * 60
+    assert data["ip_prefixes"][-1] == ["10.0.0.0/24", 4]
+
+
+def test_binary_blob_with_wrong_magic_is_rejected():
+    blob = base64.b64encode(b"XX" + bytes(200)).decode()
+    with pytest.raises(ValueError):
+        LoginBaseline.decode({"v": BASELINE_FORMAT, "enc": "bin", "data": blob})
@@ -0,0 +1,90 @@
+import asyncio
+import ipaddress
+from datetime import datetime, timedelta
+
+from app.services.blocklist import GLOBAL_ORG, BlocklistIndex
+from app.services.defense import BlockedIP
+from app.services.prefix_trie import PrefixTrie
+
+
+def test_prefix_trie_longest_match_and_accept():
+    trie = PrefixTrie(4)
+    trie.insert(ipaddress.ip_network("10.0.0.0/8"), "wide")
+    trie.insert(ipaddress.ip_network("10.1.2.0/24"), "narrow")
+    address = int(ipaddress.ip_address("10.1.2.3"))
+
+    assert trie.longest_match(address) == (24, "narrow")
+    assert trie.longest_match(address, lambda value: value != "narrow") == (8, "wide")
+    assert trie.longest_match(int(ipaddress.ip_address("11.0.0.1"))) is None
+    assert trie.remove(ipaddress.ip_network("10.1.2.0/24"))
+    assert trie.longest_match(address) == (8, "wide")
+    assert len(trie) == 1
+
+
+def test_exact_and_range_blocks_per_org():
+    index = BlocklistIndex()
+    index.add(1, "203.0.113.7")
+    index.add(1, "198.51.100.0/24")
+    index.add(GLOBAL_ORG, "2001:db8::/32")
+
+    assert index.is_blocked(1, "203.0.113.7")
+    assert index.is_blocked(1, "198.51.100.200")
+    assert not index.is_blocked(2, "203.0.113.7")
+    # Global blocks apply to every organization; IPv4-mapped IPv6 is folded
+    assert index.is_blocked(2, "2001:db8::1")
+    assert index.is_blocked(1, "::ffff:203.0.113.7")
+    assert not index.is_blocked(1, "not an ip")
+
+
+def test_expired_narrow_range_does_not_hide_live_broad_range():
+    index = BlocklistIndex()
+    now = datetime.utcnow()
+    index.add(1, "10.0.0.0/8")
+    index.add(1, "10.1.2.0/24", now + timedelta(seconds=30))
+    later = (now + timedelta(seconds=60) - datetime(1970, 1, 1)).total_seconds()
+
+    # The /24 has expired but the wheel has not swept it yet
+    assert index.is_blocked(1, "10.1.2.3", now=later)
+    index.remove(1, "10.0.0.0/8")
+    assert not index.is_blocked(1, "10.1.2.3", now=later)
+
+
+def test_temporary_blocks_expire_on_the_wheel():
+    index = BlocklistIndex()
+    now = datetime.utcnow()
+    index.add(1, "203.0.113.7", now + timedelta(seconds=5))
+    index.add(1, "203.0.113.8")
+    assert len(index) == 2
+    assert index.expire((now + timedelta(seconds=10) - datetime(1970, 1, 1)).total_seconds()) == 1
+    assert len(index) == 1
+    assert not index.is_blocked(1, "203.0.113.7")
+    # Already expired blocks are not added at all
+    index.add(1, "203.0.113.9", now - timedelta(seconds=1))
+    assert not index.is_blocked(1, "203.0.113.9")
+
+
+def test_unparseable_values_are_ignored():
+    index = BlocklistIndex()
+    index.add(1, "999.1.1.1")
+    index.remove(1, "not-an-ip")
+    assert len(index) == 0
+
+
+def test_load_skips_expired_rows(session_factory):
+    async def go():
+        async with session_factory() as db:
+            db.add_all([
+                BlockedIP(organization_id=1, ip_address="203.0.113.7", reason="test"),
+                BlockedIP(organization_id=1, ip_address="203.0.113.8", reason="test",
+                          expires_at=datetime.utcnow() - timedelta(minutes=1)),
+            ])
+            await db.commit()
+        index = BlocklistIndex()
+        async with session_factory() as db:
+            await index.load(db)
+        return index
+
+    index = asyncio.run(go())
+    assert index.loaded
+    assert index.is_blocked(1, "203.0.113.7")
+    assert not index.is_blocked(1, "203.0.113.8")
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.services.anomaly import ANOMALY_DETECTORS, AnomalyService
+
+DAY_HOURS = [8, 9, 9, 10, 11, 13, 14, 14, 15, 16, 17, 9, 10, 11, 12, 13, 14, 15, 16, 10]
+
+
+def _seed(db):
+    async def go():
+        service = AnomalyService(db)
+        for i, hour in enumerate(DAY_HOURS):
+            await service.update_login_baseline(1, 1, datetime(2025, 1, 1 + i, hour, 5 * (i % 12)), "10.0.0.5")
+            await service.update_login_baseline(1, 4, datetime(2025, 1, 1 + i, (hour + 12) % 24, 0), "172.16.4.2")
+        # Too little history for a model of its own
+        await service.update_login_baseline(1, 2, datetime(2025, 1, 1, 9, 0), "10.9.9.9")
+    return go()
+
+
+@pytest.mark.parametrize("detector", ANOMALY_DETECTORS)
+def test_bulk_scores_match_one_at_a_time(session_factory, detector):
+    records = [
+        {"user_id": 1, "ip_address": "10.0.0.77", "timestamp": datetime(2025, 3, 1, 10, 30)},
+        {"user_id": 1, "ip_address": "10.0.0.77", "timestamp": datetime(2025, 3, 1, 3, 10)},
+        {"user_id": 4, "ip_address": "172.16.4.2", "timestamp": datetime(2025, 3, 1, 22, 0)},
+        {"user_id": 2, "ip_address": "10.9.9.1", "timestamp": datetime(2025, 3, 1, 9, 0)},
+        {"user_id": 2, "ip_address": "192.0.2.1", "timestamp": datetime(2025, 3, 1, 9, 0)},
+        {"user_id": 3, "ip_address": "192.0.2.1", "timestamp": datetime(2025, 3, 1, 9, 0)},
+        {"user_id": 1, "ip_address": "198.51.100.1", "timestamp": datetime(2025, 3, 1, 14, 45)},
+        {"user_id": 4, "ip_address": "172.16.4.9", "timestamp": datetime(2025, 3, 1, 11, 0)},
+    ]
+
+    async def go():
+        async with session_factory() as db:
+            await _seed(db)
+            service = AnomalyService(db)
+            bulk = await service.score_logins_bulk(1, records, detector)
+            single = [
+                await service.score_stored_baseline(1, r["user_id"], r["timestamp"], r["ip_address"], detector)
+                for r in records
+            ]
+            return bulk, single
+
+    bulk, single = asyncio.run(go())
+    assert len(bulk) == len(records)
+    for got, expected in zip(bulk, single):
+        assert got["is_anomaly"] == expected["is_anomaly"]
+        assert got["score"] == pytest.approx(expected["score"])
+        assert (got["confidence"], got["reason"]) == (expected["confidence"], expected["reason"])
+    assert bulk[5]["reason"] == "No baseline"
+    # Thin history: only a new network counts
+    assert bulk[4]["is_anomaly"] and not bulk[3]["is_anomaly"]
+    # A 3 AM login and a new network for a daytime user
+    assert bulk[1]["is_anomaly"] and bulk[6]["is_anomaly"]
+
+
+def test_bulk_scoring_does_not_learn(session_factory):
+    record = {"user_id": 1, "ip_address": "203.0.113.50", "timestamp": datetime(2025, 3, 1, 10, 0)}
+
+    async def go():
+        async with session_factory() as db:
+            await _seed(db)
+            service = AnomalyService(db)
+            first = await service.score_logins_bulk(1, [record] * 3)
+            again = await service.score_logins_bulk(1, [record])
+            return first, again, await service.score_logins_bulk(1, [])
+
+    first, again, empty = asyncio.run(go())
+    # Scoring never folds logins into the baseline, so the network stays new
+    assert all("New IP" in r["reason"] for r in first + again)
+    assert empty == []
@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.middleware import defense
+from app.middleware.defense import BLOCKED_BODY, DefenseMetrics, DefenseMiddleware, unverified_org_claim
+from app.services import blocklist
+from app.services.blocklist import BlocklistIndex
+
+
+def _token(claims) -> bytes:
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=")
+    return b"Bearer eyJhbGciOiJIUzI1NiJ9." + payload + b".signature"
+
+
+def _call(middleware, ip, headers=(), kind="http"):
+    """Runs one request through the middleware; returns (reached the app, messages sent)."""
+    reached = []
+    sent = []
+
+    async def app(scope, receive, send):
+        reached.append(scope["type"])
+
+    async def receive():
+        return {"type": f"{kind}.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    middleware.app = app
+    scope = {"type": kind, "client": (ip, 40000) if ip else None, "headers": list(headers)}
+    asyncio.run(middleware(scope, receive, send))
+    return bool(reached), sent
+
+
+def _middleware(monkeypatch):
+    index = BlocklistIndex()
+    monkeypatch.setattr(defense, "blocklist_index", index)
+    metrics = DefenseMetrics()
+    return index, metrics, DefenseMiddleware(None, metrics)
+
+
+def test_global_block_is_rejected_before_the_app(monkeypatch):
+    index, metrics, middleware = _middleware(monkeypatch)
+    index.add(None, "198.51.100.0/24")
+
+    reached, sent = _call(middleware, "198.51.100.7")
+    assert not reached
+    assert sent[0]["status"] == 403
+    assert (b"content-length", str(len(BLOCKED_BODY)).encode()) in sent[0]["headers"]
+    assert sent[1]["body"] == BLOCKED_BODY
+
+    reached, sent = _call(middleware, "203.0.113.1")
+    assert reached and not sent
+    assert metrics.snapshot()["blocked"] == 1
+
+
+def test_org_blocks_follow_the_token_claim(monkeypatch):
+    index, _, middleware = _middleware(monkeypatch)
+    index.add(7, "2001:db8::1")
+
+    assert _call(middleware, "2001:db8::1", [(b"authorization", _token({"org": 7}))])[1][0]["status"] == 403
+    # Another tenant, no token, or an unreadable token: only the global list applies
+    assert _call(middleware, "2001:db8::1", [(b"authorization", _token({"org": 8}))])[1] == []
+    assert _call(middleware, "2001:db8::1")[1] == []
+    assert _call(middleware, "2001:db8::1", [(b"authorization", b"Bearer not-a-jwt")])[1] == []
+
+
+def test_expired_blocks_and_unknown_clients_pass(monkeypatch):
+    index, _, middleware = _middleware(monkeypatch)
+    index.add(None, "192.0.2.1", datetime.utcnow() + timedelta(seconds=60))
+    assert _call(middleware, "192.0.2.1")[1][0]["status"] == 403
+    # Past its expiry, before the timer wheel has swept it
+    later = time.time() + 120
+    monkeypatch.setattr(blocklist, "time", SimpleNamespace(time=lambda: later))
+    assert _call(middleware, "192.0.2.1") == (True, [])
+    # No client address (e.g. a unix socket) or a non-IP one: nothing to check
+    assert _call(middleware, None) == (True, [])
+    assert _call(middleware, "testclient")[1] == []
+
+
+def test_websockets_are_closed_and_lifespan_passes_through(monkeypatch):
+    index, _, middleware = _middleware(monkeypatch)
+    index.add(None, "192.0.2.9")
+    reached, sent = _call(middleware, "192.0.2.9", kind="websocket")
+    assert not reached
+    assert sent == [{"type": "websocket.close", "code": 1008}]
+
+    passed = []
+
+    async def app(scope, receive, send):
+        passed.append(scope["type"])
+
+    asyncio.run(DefenseMiddleware(app)({"type": "lifespan"}, None, None))
+    assert passed == ["lifespan"]
+
+
+def test_unverified_org_claim():
+    assert unverified_org_claim([(b"authorization", _token({"org": 3, "sub": "x"}))]) == 3
+    assert unverified_org_claim([(b"authorization", _token({"org": "3"}))]) is None
+    assert unverified_org_claim([(b"authorization", b"Basic dXNlcjpwYXNz")]) is None
+    assert unverified_org_claim([(b"authorization", b"Bearer a.!!!.c")]) is None
+    assert unverified_org_claim([(b"host", b"example")]) is None
@@ -0,0 +1,75 @@
+import asyncio
+
+from app.services.email_batch import EmailBatchAnalyzer
+from app.services.email_detection import EmailDetectionService
+
+
+def make_messages(count):
+    messages = []
+    for i in range(count):
+        if i % 3 == 0:
+            messages.append(("billing@bank-support.xyz", "Urgent: verify account",
+                             "Please reset password for your bank account", ["http://bit.ly/x"]))
+        else:
+            messages.append((f"colleague{i}@example.com", "Lunch", "See you at noon", []))
+    return messages
+
+
+def test_batch_matches_inline_analysis():
+    detector = EmailDetectionService()
+    analyzer = EmailBatchAnalyzer(detector, workers=2, chunk_size=4)
+    messages = make_messages(30)
+    try:
+        verdicts = asyncio.run(analyzer.analyze(messages))
+    finally:
+        analyzer.shutdown()
+
+    assert verdicts == [detector.analyze_email(*message) for message in messages]
+
+
+def test_rule_reload_does_not_cancel_queued_chunks():
+    detector = EmailDetectionService()
+    # One worker and one message per chunk, so most chunks are still queued at the reload
+    analyzer = EmailBatchAnalyzer(detector, workers=1, chunk_size=1)
+    messages = make_messages(40)
+
+    async def go():
+        first = asyncio.create_task(analyzer.analyze(messages))
+        await asyncio.sleep(0)
+        old_pool = analyzer._executor
+        detector.engine.load_rules(["lunch"], 1, [], [], [])
+        second = await analyzer.analyze(messages)
+        assert analyzer._executor is not old_pool
+        return await first, second
+
+    try:
+        before, after = asyncio.run(go())
+    finally:
+        analyzer.shutdown()
+
+    assert len(before) == len(messages)
+    assert before[1][0] is None
+    assert after[1][0] is not None
+
+
+def test_broken_pool_is_replaced_and_batch_retried():
+    detector = EmailDetectionService()
+    analyzer = EmailBatchAnalyzer(detector, workers=2, chunk_size=4)
+    messages = make_messages(20)
+
+    async def go():
+        await analyzer.analyze(messages)
+        broken = analyzer._executor
+        for process in list(broken._processes.values()):
+            process.kill()
+            process.join()
+        verdicts = await analyzer.analyze(messages)
+        assert analyzer._executor is not broken
+        return verdicts
+
+    try:
+        verdicts = asyncio.run(go())
+    finally:
+        analyzer.shutdown()
+
+    assert verdicts == [detector.analyze_email(*message) for message in messages]
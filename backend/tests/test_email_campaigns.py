@@ -0,0 +1,127 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.models.email_event import EmailCampaign, EmailEvent
+from app.services.email_campaigns import CampaignTracker
+
+CLEAN = (None, 0.0, "low")
+PHISHING = ("Potential Phishing", 0.4, "medium")
+MALICIOUS = ("Malicious Link", 0.9, "high")
+
+WORDS = ("account invoice payment team please review attached meeting report update security notice "
+         "storage mailbox deadline customer order shipping delivery confirm details portal access").split()
+
+
+def template(seed, length=60):
+    return random.Random(seed).choices(WORDS, k=length)
+
+
+def variant(words, name, seed):
+    """The template personalized like a mail merge: name, numbers, tracking link, a couple of edits."""
+    rng = random.Random(seed)
+    words = list(words)
+    for _ in range(2):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return (f"Dear {name}, {' '.join(words)} ref {rng.randrange(10**8)} "
+            f"https://track.example/c/{rng.randrange(10**9)}")
+
+
+def tracker(session_factory=None):
+    return CampaignTracker(num_perm=64, bands=16, similarity=0.5, max_clusters=1000, window_hours=72,
+                           session_factory=session_factory)
+
+
+def test_near_duplicates_share_a_campaign_and_unrelated_mail_does_not():
+    campaigns = tracker()
+    wave = template(1)
+    ids = {campaigns.observe(1, "x@evil.test", "Invoice 4411", variant(wave, name, i), PHISHING)[1]
+           for i, name in enumerate(["Ana", "Wei", "Lars", "Priya", "Tom"])}
+    assert len(ids) == 1 and None not in ids
+
+    _, other = campaigns.observe(1, "y@evil.test", "Meeting", variant(template(2), "Ana", 9), PHISHING)
+    assert other not in ids
+
+
+def test_campaigns_do_not_span_organizations():
+    campaigns = tracker()
+    wave = template(1)
+    _, first = campaigns.observe(1, "x@evil.test", "Invoice", variant(wave, "Ana", 1), PHISHING)
+    _, second = campaigns.observe(2, "x@evil.test", "Invoice", variant(wave, "Ana", 2), PHISHING)
+    assert first and second and first != second
+
+
+def test_short_messages_are_not_clustered():
+    campaigns = tracker()
+    for _ in range(3):
+        assert campaigns.observe(1, "x@evil.test", "hi", "hello 42 there", PHISHING) == (PHISHING, None)
+    assert len(campaigns.index) == 0
+
+
+def test_members_inherit_the_campaign_verdict_and_escalate_it():
+    campaigns = tracker()
+    wave = template(1)
+    # Clean until a member is detected: no campaign id
+    assert campaigns.observe(1, "x@evil.test", "Invoice", variant(wave, "Ana", 1), CLEAN) == (CLEAN, None)
+    verdict, campaign_id = campaigns.observe(1, "x@evil.test", "Invoice", variant(wave, "Wei", 2), PHISHING)
+    assert verdict == PHISHING and campaign_id
+
+    # A member the rules miss takes the campaign verdict
+    assert campaigns.observe(1, "x@evil.test", "Invoice", variant(wave, "Tom", 3), CLEAN) == (PHISHING, campaign_id)
+
+    # A stronger verdict escalates the campaign; weaker ones don't lower it
+    assert campaigns.observe(1, "x@evil.test", "Invoice", variant(wave, "Lars", 4), MALICIOUS) == (MALICIOUS, campaign_id)
+    assert campaigns.observe(1, "x@evil.test", "Invoice", variant(wave, "Priya", 5), PHISHING) == (MALICIOUS, campaign_id)
+    campaign = campaigns.index._campaigns[campaign_id]
+    assert campaign.escalated == 2 and campaign.count == 5
+
+
+def test_flush_writes_campaigns_and_relabels_stored_members(session_factory):
+    campaigns = tracker(session_factory)
+    wave = template(1)
+    now = datetime.utcnow()
+    _, campaign_id = campaigns.observe(1, "x@evil.test", "Invoice", variant(wave, "Ana", 1), PHISHING, now)
+
+    async def go():
+        assert await campaigns.flush() == 1
+        async with session_factory() as db:
+            db.add(EmailEvent(organization_id=1, sender_email="x@evil.test", subject="Invoice",
+                              attack_type=PHISHING[0], confidence_score=PHISHING[1], severity=PHISHING[2],
+                              campaign_id=campaign_id))
+            await db.commit()
+
+        campaigns.observe(1, "x@evil.test", "Invoice", variant(wave, "Wei", 2), MALICIOUS, now + timedelta(minutes=1))
+        assert await campaigns.flush() == 1
+        # Second re-label pass for members that were still queued during the first
+        assert await campaigns.flush() == 1
+        assert await campaigns.flush() == 0
+
+        async with session_factory() as db:
+            row = (await db.execute(select(EmailCampaign))).scalars().one()
+            event = (await db.execute(select(EmailEvent))).scalars().one()
+        return row, event
+
+    row, event = asyncio.run(go())
+    assert (row.id, row.organization_id, row.message_count) == (campaign_id, 1, 2)
+    assert (row.attack_type, row.severity) == (MALICIOUS[0], MALICIOUS[2])
+    assert (event.attack_type, event.confidence_score, event.severity) == MALICIOUS
+
+    # A restarted tracker picks the campaign back up
+    async def reload():
+        fresh = tracker(session_factory)
+        async with session_factory() as db:
+            await fresh.load(db)
+        return fresh.observe(1, "x@evil.test", "Invoice", variant(wave, "Tom", 3), CLEAN)
+
+    assert asyncio.run(reload()) == (MALICIOUS, campaign_id)
+
+
+def test_window_accepts_fractional_hours(monkeypatch):
+    from app.core.config import Settings
+
+    monkeypatch.setenv("EMAIL_CAMPAIGN_WINDOW_HOURS", "1.5")
+    hours = Settings().EMAIL_CAMPAIGN_WINDOW_HOURS
+    assert hours == 1.5
+    assert CampaignTracker(num_perm=16, bands=4, window_hours=hours).window == timedelta(minutes=90)
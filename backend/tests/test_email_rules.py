@@ -0,0 +1,70 @@
+import pytest
+
+from app.services.email_detection import EmailDetectionService
+from app.services.email_rules import BrandRule, CompiledEmailRules, host_suffixes, link_host, sender_domain
+
+
+def make_rules(**overrides):
+    options = dict(keywords=["urgent", "verify account"], keyword_threshold=2,
+                   suspicious_domains=["bit.ly", ".tinyurl.com."], suspicious_tlds=["top", ".xyz"],
+                   brands=[BrandRule("paypal", ("paypal.com",))])
+    options.update(overrides)
+    return CompiledEmailRules(**options)
+
+
+@pytest.mark.parametrize("link, host", [
+    ("https://Login.Example.COM./reset?x=1", "login.example.com"),
+    ("example.com/path", "example.com"),
+    ("http://user:pw@10.0.0.1:8080/", "10.0.0.1"),
+    ("http://[::1", None),
+    ("", None),
+])
+def test_link_host(link, host):
+    assert link_host(link) == host
+
+
+def test_host_and_sender_helpers():
+    assert list(host_suffixes("a.b.example.com")) == ["a.b.example.com", "b.example.com", "example.com", "com"]
+    assert list(host_suffixes("localhost")) == ["localhost"]
+    assert sender_domain("PayPal <Service@PayPal.com.>") == "paypal.com"
+
+
+@pytest.mark.parametrize("host, suspicious", [
+    ("bit.ly", True),
+    ("x.bit.ly", True),
+    ("bit.lyrics.com", False),
+    ("notbit.ly", False),
+    ("go.tinyurl.com", True),
+    ("evil.top", True),
+    ("evil.xyz", True),
+    ("top.example.com", False),
+    ("desktop.topics.com", False),
+    ("example.com", False),
+])
+def test_suspicious_host_matches_whole_label_suffixes(host, suspicious):
+    rules = make_rules()
+    assert rules.suspicious_host(host) is suspicious
+    # Memoized verdicts give the same answer
+    assert rules.suspicious_host(host) is suspicious
+
+
+def test_tld_in_link_path_is_not_a_match():
+    detector = EmailDetectionService(make_rules())
+    verdict = detector.analyze_content("a@example.com", "Hello", "Hi",
+                                       ["https://example.com/desktop.top/file", "https://bit.lyrics.com/x"])
+    assert verdict.attack_type is None
+    verdict = detector.analyze_content("a@example.com", "Hello", "Hi", ["https://cdn.evil.top/file"])
+    assert verdict.attack_type == "Malicious Link"
+
+
+def test_keyword_threshold_and_separator():
+    rules = make_rules()
+    assert rules.keyword_hits("URGENT", "please verify account") == 2
+    # A keyword split across subject and body does not count
+    assert rules.keyword_hits("please verify", "account now") == 0
+
+
+def test_brand_spoofing_allows_subdomains_of_the_brand():
+    rules = make_rules()
+    assert rules.spoofed_brand("PayPal <service@mail.paypal.com>", "mail.paypal.com") is None
+    assert rules.spoofed_brand("PayPal <service@paypal.com.evil.top>", "paypal.com.evil.top") == "paypal"
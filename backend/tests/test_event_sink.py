@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.future import select
+
+from app.core.event_sink import EventSink
+from app.models.behavior import AnomalyEvent
+from app.models.web_event import WebEvent
+from app.services.anomaly import AnomalyService
+
+
+def _anomaly(i, event_type="login_anomaly"):
+    return {"org_id": 1, "event_type": event_type, "severity_score": float(i), "confidence_score": 0.5, "details": {}}
+
+
+def _web(i):
+    return {"organization_id": 1, "source_ip": f"10.0.0.{i}", "target_url": "/", "method": "GET",
+            "timestamp": datetime(2025, 1, 1)}
+
+
+def _count(session_factory, model):
+    async def go():
+        async with session_factory() as db:
+            return (await db.execute(select(func.count()).select_from(model))).scalar()
+    return asyncio.run(go())
+
+
+class FlakyFactory:
+    """Session factory whose first `failures` sessions raise a transient error."""
+
+    def __init__(self, session_factory, failures):
+        self.session_factory = session_factory
+        self.failures = failures
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return self.session_factory()
+
+
+def test_rejected_rows_are_isolated(session_factory):
+    sink = EventSink(session_factory=session_factory)
+    rows = [_anomaly(i) for i in range(10)]
+    rows[3] = _anomaly(3, event_type=None)  # NOT NULL violation
+    rows[8] = _anomaly(8, event_type=None)
+
+    async def go():
+        await sink.put_many(AnomalyEvent, rows)
+        await sink.put_many(WebEvent, [_web(i) for i in range(5)])
+
+    asyncio.run(go())
+    assert _count(session_factory, AnomalyEvent) == 8
+    assert _count(session_factory, WebEvent) == 5
+    assert (sink.flushed, sink.failed) == (13, 2)
+
+
+def test_tables_commit_independently(session_factory):
+    sink = EventSink(session_factory=session_factory)
+    batch = [(WebEvent, _web(i)) for i in range(3)] + [(AnomalyEvent, _anomaly(0, event_type=None))]
+    asyncio.run(sink._flush(batch))
+    assert _count(session_factory, WebEvent) == 3
+    assert _count(session_factory, AnomalyEvent) == 0
+
+
+def test_transient_errors_are_retried(session_factory):
+    sink = EventSink(session_factory=FlakyFactory(session_factory, failures=3), retry_backoff=0)
+    asyncio.run(sink.put_many(WebEvent, [_web(i) for i in range(4)]))
+    assert _count(session_factory, WebEvent) == 4
+    assert (sink.flushed, sink.failed, sink.retried) == (4, 0, 3)
+
+
+def test_gives_up_after_max_retries(session_factory):
+    sink = EventSink(session_factory=FlakyFactory(session_factory, failures=100), retry_backoff=0, max_retries=2)
+    asyncio.run(sink.put_many(WebEvent, [_web(i) for i in range(4)]))
+    assert _count(session_factory, WebEvent) == 0
+    assert (sink.flushed, sink.failed, sink.retried) == (0, 4, 2)
+
+
+def test_running_sink_keeps_enqueue_time(session_factory):
+    sink = EventSink(session_factory=session_factory, flush_interval=0.05)
+    result = {"score": 90.0, "confidence": 0.8, "reason": "odd hour"}
+    record = AnomalyService._anomaly_event(1, 7, "10.0.0.1", result)
+    queued_at = record["created_at"]
+
+    async def go():
+        await sink.start()
+        await sink.put(AnomalyEvent, record)
+        await asyncio.sleep(0.2)
+        await sink.stop()
+        async with session_factory() as db:
+            return (await db.execute(select(AnomalyEvent.created_at))).scalar()
+
+    created_at = asyncio.run(go())
+    assert abs(created_at.replace(tzinfo=None) - queued_at) < timedelta(milliseconds=1)
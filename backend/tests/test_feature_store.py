@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from app.services import feature_store as store_module
+from app.services.anomaly import feature_signals
+from app.services.feature_store import MAX_PREFIXES, EntityFeatures, FeatureStore, _epoch
+
+MONDAY = datetime(2025, 3, 3, 9, 30)
+
+
+def _weekday_user(weeks: int = 5) -> EntityFeatures:
+    features = EntityFeatures()
+    for week in range(weeks):
+        for day in range(5):
+            features.add_login(MONDAY + timedelta(days=7 * week + day), "10.0.0.4", success=True)
+    return features
+
+
+def test_failures_count_but_do_not_teach_habits():
+    features = EntityFeatures()
+    features.add_login(MONDAY, "10.0.0.4", success=True)
+    for _ in range(3):
+        features.add_login(MONDAY.replace(hour=3), "192.0.2.1", success=False)
+    assert (features.logins, features.failures, features.successes) == (4, 3, 1)
+    assert 0.25 < features.failure_rate < 0.3
+    assert sum(features.hour_hist) == 1.0
+    assert not features.knows_prefix("192.0.2.1") and features.knows_prefix("10.0.0.200")
+
+
+def test_per_entity_state_is_bounded():
+    features = EntityFeatures()
+    for i in range(MAX_PREFIXES + 10):
+        features.add_login(MONDAY, f"10.{i}.0.1", success=True)
+    assert len(features.prefixes) == MAX_PREFIXES
+    # Least recently seen evicted first
+    assert not features.knows_prefix("10.0.0.1") and features.knows_prefix(f"10.{MAX_PREFIXES + 9}.0.1")
+    for i in range(20):
+        features.add_device(f"device-{i}")
+    assert len(features.devices) == store_module.MAX_DEVICES
+
+
+def test_request_rate_decays_with_time():
+    features = EntityFeatures()
+    start = _epoch(MONDAY)
+    for i in range(60):
+        features.add_request(start + i)
+    now = start + 60
+    assert features.requests_per_minute(now) > features.requests_per_minute(now + 600) > 0.0
+    assert EntityFeatures().requests_per_minute(now) == 0.0
+
+
+def test_store_is_lru_bounded_and_summarizes_per_org():
+    store = FeatureStore(max_entities=3)
+    for i in range(4):
+        for _ in range(8):
+            store.record_login(1 if i < 3 else 2, "account", f"user{i}", MONDAY, "10.0.0.1", success=i == 1)
+    assert store.get(1, "account", "user0") is None
+    assert store.stats() == {"entities": 3, "max_entities": 3, "orgs": 2, "evictions": 1}
+    summary = store.org_summary(1)
+    assert (summary["entities"], summary["failing_accounts"]) == (2, 1)
+    store.record_request(2, "ip", "10.0.0.1", datetime.utcnow())
+    assert store.org_summary(2)["requests_per_minute"] > 0
+
+
+def test_feature_signals_flag_rare_weekdays_and_failure_runs():
+    features = _weekday_user()
+    assert feature_signals(features, MONDAY + timedelta(weeks=6)) == (0.0, [])
+    points, reasons = feature_signals(features, datetime(2025, 4, 13, 10, 0))
+    assert (points, reasons) == (15, ["Unusual Login Day (Sunday)"])
+
+    for _ in range(8):
+        features.add_login(MONDAY, "192.0.2.1", success=False)
+    points, reasons = feature_signals(features, MONDAY + timedelta(weeks=6))
+    assert (points, reasons) == (20, ["Recent Failed Logins"])
+    assert feature_signals(None, MONDAY) == (0.0, [])
+    # Too few successful logins for weekday habits to count
+    assert feature_signals(_weekday_user(weeks=1), datetime(2025, 4, 13, 10, 0)) == (0.0, [])
@@ -0,0 +1,119 @@
+import asyncio
+import io
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.future import select
+
+from app.api.deps import get_current_user, get_db
+from app.api.v1.endpoints import threat as threat_endpoints
+from app.models.threat import ThreatIndicator
+from app.services import feed_parsers, threat
+from app.services.feed_parsers import iter_json_array, normalize_indicator, parse_csv, parse_plaintext, parse_stix
+from app.services.threat_index import ThreatIndicatorIndex
+
+ELEMENTS = [
+    {"type": "indicator", "pattern": "[ipv4-addr:value = '203.0.113.5']", "name": "a ] tricky } name"},
+    {"nested": [[1, 2], {"s": "quote \" and backslash \\"}]},
+    "a string with ] and }",
+    42,
+    -1.5e3,
+    123456789012345678901234567890,
+    True,
+    None,
+    [],
+]
+
+
+def _bundle(elements=ELEMENTS) -> str:
+    return json.dumps({"type": "bundle", "id": "bundle--1", "objects": elements}, indent=1)
+
+
+def test_json_array_elements_survive_any_read_split():
+    document = _bundle()
+    for read_size in range(1, 24):
+        assert list(iter_json_array(io.StringIO(document), read_size=read_size)) == ELEMENTS
+
+
+def test_json_array_retries_an_element_only_once_complete(monkeypatch):
+    calls = []
+
+    class CountingDecoder(json.JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            calls.append(idx)
+            return super().raw_decode(s, idx)
+
+    monkeypatch.setattr(feed_parsers.json, "JSONDecoder", CountingDecoder)
+    # One element far larger than the read size, then a few small ones
+    elements = [{"description": "x" * 200_000, "list": list(range(5000))}, 1, 2, 3]
+    assert list(iter_json_array(io.StringIO(_bundle(elements)), read_size=256)) == elements
+    # At most one failed attempt per element, not one per read
+    assert len(calls) <= 2 * len(elements)
+
+
+def test_json_array_truncated_or_malformed_is_a_value_error():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"objects": [{"a": 1}, {"b": ')))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"objects": [{"a": nope}]}')))
+    assert list(iter_json_array(io.StringIO('{"other": []}'))) == []
+
+
+def test_stix_patterns_and_observables():
+    bundle = _bundle([
+        {"type": "indicator", "name": "C2", "pattern_type": "stix",
+         "pattern": "[ipv4-addr:value = '198.51.100.1'] OR [domain-name:value = 'Evil.Example']"},
+        {"type": "indicator", "pattern": "[file:hashes.'SHA-256' = '" + "A" * 64 + "']"},
+        {"type": "indicator", "pattern_type": "yara", "pattern": "rule x {}"},
+        {"type": "url", "value": "https://phish.example/login"},
+        {"type": "malware", "name": "ignored"},
+    ])
+    items = [normalize_indicator(item) for item in parse_stix(io.StringIO(bundle))]
+    assert [(item["value"], item["type"]) for item in items] == [
+        ("198.51.100.1", "IP"), ("evil.example", "DOMAIN"), ("a" * 64, "FILE_HASH"),
+        ("https://phish.example/login", "URL"),
+    ]
+    assert items[0]["desc"] == "C2"
+
+
+def test_csv_and_plaintext_feeds():
+    with_header = ["# comment\n", "indicator,kind,comment\n", "10.0.0.0/8,CIDR,range\n", "bad,,\n"]
+    assert list(parse_csv(with_header)) == [
+        {"value": "10.0.0.0/8", "type": "CIDR", "desc": "range"}, {"value": "bad", "type": "", "desc": ""}
+    ]
+    assert list(parse_csv(["1.2.3.4,x\n", "5.6.7.8,y\n"])) == [{"value": "1.2.3.4"}, {"value": "5.6.7.8"}]
+    assert list(parse_plaintext(["# list\n", "\n", "1.2.3.4  scanner\n", "; note\n"])) == [{"value": "1.2.3.4"}]
+    assert normalize_indicator({"value": "10.1.2.3/8", "type": "CIDR"})["value"] == "10.0.0.0/8"
+    assert normalize_indicator({"value": "not an ip", "type": "IP"}) is None
+
+
+def test_file_upload_is_ingested_in_chunks(session_factory, monkeypatch):
+    monkeypatch.setattr(threat, "threat_index", ThreatIndicatorIndex())
+    app = FastAPI()
+    app.include_router(threat_endpoints.router, prefix="/threat")
+
+    async def db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = db
+    app.dependency_overrides[get_current_user] = lambda: type("User", (), {"role": "admin"})()
+    client = TestClient(app)
+
+    bundle = _bundle([{"type": "ipv4-addr", "value": f"192.0.2.{i}"} for i in range(10)])
+    response = client.post("/threat/ingest/file", data={"source": "upload"},
+                           files={"file": ("feed.json", bundle.encode(), "application/json")})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["format"], body["inserted"], body["rejected"]) == ("stix", 10, 0)
+
+    async def count():
+        async with session_factory() as session:
+            return len((await session.execute(select(ThreatIndicator.id))).all())
+    assert asyncio.run(count()) == 10
+
+    broken = client.post("/threat/ingest/file", data={"source": "upload", "format": "stix"},
+                         files={"file": ("feed.json", b'{"objects": [{"type": ', "application/json")})
+    assert broken.status_code == 400
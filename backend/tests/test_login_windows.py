@@ -0,0 +1,73 @@
+import asyncio
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.sliding_window import InMemoryWindowBackend, RedisWindowBackend
+from app.services.web_detection import LoginDetectionService
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    async def execute(self):
+        if self.client.down:
+            raise RedisConnectionError("Connection refused")
+        self.client.executed += 1
+        # incr, expire, pfadd, expire, mget of the window's counters, pfcount
+        return [1, True, 1, True, ["1"], 1]
+
+
+class FakeRedis:
+    def __init__(self, down=False):
+        self.down = down
+        self.executed = 0
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+def test_in_memory_windows_flag_brute_force():
+    detector = LoginDetectionService(InMemoryWindowBackend())
+
+    async def go():
+        return [await detector.detect_login_anomaly("alice", False, "10.0.0.1", now=1000.0 + i) for i in range(20)]
+
+    verdicts = asyncio.run(go())
+    assert verdicts[8] == (None, "low")
+    assert verdicts[9] == ("brute_force", "high")
+
+
+def test_redis_outage_falls_back_to_in_process_windows():
+    client = FakeRedis(down=True)
+    backend = RedisWindowBackend(client, retry_seconds=60)
+    detector = LoginDetectionService(backend)
+
+    async def go():
+        return [await detector.detect_login_anomaly("alice", False, "10.0.0.1", now=1000.0 + i) for i in range(10)]
+
+    verdicts = asyncio.run(go())
+    assert verdicts[-1] == ("brute_force", "high")
+    # Redis was tried once, then skipped until retry_seconds pass
+    stats = detector.stats()
+    assert (stats["degraded"], stats["errors"], stats["fallback_events"]) == (True, 1, 20)
+
+
+def test_redis_is_retried_after_cooldown():
+    client = FakeRedis(down=True)
+    backend = RedisWindowBackend(client, retry_seconds=0)
+
+    async def go():
+        first = await backend.record("k", "m", 1000.0)
+        client.down = False
+        second = await backend.record("k", "m", 1001.0)
+        return first, second
+
+    first, second = asyncio.run(go())
+    assert first == (1, 1)
+    assert second == (1, 1) and client.executed == 1
+    assert backend.stats()["degraded"] is False
@@ -0,0 +1,185 @@
+import asyncio
+import base64
+import hashlib
+import io
+
+from app.services import mail_parser
+from app.services.email_batch import EmailBatchAnalyzer, ingest_mailbox
+from app.services.email_campaigns import CampaignTracker
+from app.services.mail_parser import iter_mail, iter_mbox, parse_eml
+
+PAYLOAD = bytes(range(256)) * 300
+
+
+def _multipart(subject="Report", charset="utf-8"):
+    attachment = base64.encodebytes(PAYLOAD).decode()
+    return (
+        "From: Alice <alice@example.com>\n"
+        "To: Bob <bob@corp.example>\n"
+        f"Subject: {subject}\n"
+        "MIME-Version: 1.0\n"
+        "Content-Type: multipart/mixed; boundary=\"outer\"\n\n"
+        "This preamble is ignored\n"
+        "--outer\n"
+        "Content-Type: multipart/alternative; boundary=\"inner\"\n\n"
+        "--inner\n"
+        f"Content-Type: text/plain; charset=\"{charset}\"\n"
+        "Content-Transfer-Encoding: quoted-printable\n\n"
+        "Open https://docs.example.com/a/very/long/=\n"
+        "path?id=3D42 today\n"
+        "--inner\n"
+        "Content-Type: text/html\n\n"
+        "<p>Hi<script>var u = 'http://script.example/';</script>"
+        "<a href=\"https://html.example/login\">here</a></p>\n"
+        "--inner--\n"
+        "--outer\n"
+        "Content-Type: application/pdf; name=\"report.pdf\"\n"
+        "Content-Disposition: attachment; filename=\"report.pdf\"\n"
+        "Content-Transfer-Encoding: base64\n\n"
+        f"{attachment}"
+        "--outer--\n"
+        "epilogue --outer\n"
+    ).encode()
+
+
+def test_multipart_text_links_and_attachment_digest():
+    mail = parse_eml(io.BytesIO(_multipart()))
+    assert mail.sender == "Alice <alice@example.com>"
+    assert mail.recipient == "bob@corp.example"
+    assert mail.subject == "Report"
+    # Quoted-printable soft break and =3D decoded, so the URL stays whole
+    assert "https://docs.example.com/a/very/long/path?id=42" in mail.links
+    assert "https://html.example/login" in mail.links
+    assert "http://script.example/" not in mail.links
+    assert "preamble" not in mail.body
+    [attachment] = mail.attachments
+    assert (attachment.filename, attachment.content_type) == ("report.pdf", "application/pdf")
+    assert attachment.size == len(PAYLOAD)
+    assert attachment.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert mail.error is None
+
+
+def test_crlf_line_endings_give_same_result():
+    assert parse_eml(io.BytesIO(_multipart().replace(b"\n", b"\r\n"))) == parse_eml(io.BytesIO(_multipart()))
+
+
+def test_boundary_lookalike_inside_part_is_content():
+    raw = (b"Subject: x\nContent-Type: multipart/mixed; boundary=b\n\n--b\nContent-Type: text/plain\n\n"
+           b"--bogus line stays\n--b--\n")
+    assert "--bogus line stays" in parse_eml(io.BytesIO(raw)).body
+
+
+def test_nested_multiparts_and_attached_message():
+    inner = base64.encodebytes(b"zip bytes").decode()
+    raw = (
+        "Subject: nested\n"
+        "Content-Type: multipart/mixed; boundary=a\n\n"
+        "--a\n"
+        "Content-Type: multipart/related; boundary=b\n\n"
+        "--b\n"
+        "Content-Type: multipart/alternative; boundary=c\n\n"
+        "--c\n"
+        "Content-Type: text/plain\n\n"
+        "deep https://deep.example/x\n"
+        "--c--\n"
+        "--b\n"
+        "Content-Type: application/zip\n"
+        "Content-Transfer-Encoding: base64\n\n"
+        f"{inner}"
+        "--b--\n"
+        "--a\n"
+        "Content-Type: message/rfc822\n\n"
+        "Subject: forwarded\n\n"
+        "see https://forwarded.example/\n"
+        "--a--\n"
+    ).encode()
+    mail = parse_eml(io.BytesIO(raw))
+    assert mail.subject == "nested"
+    assert mail.links == ["https://deep.example/x", "https://forwarded.example/"]
+    [attachment] = mail.attachments
+    assert attachment.content_type == "application/zip"
+    assert attachment.sha256 == hashlib.sha256(b"zip bytes").hexdigest()
+
+
+def test_base64_and_quoted_printable_text_parts():
+    url = "https://b64.example/" + "x" * 120
+    encoded = base64.encodebytes(f"click {url} now".encode("utf-16")).decode()
+    raw = (
+        "Subject: encoded\n"
+        "Content-Type: multipart/alternative; boundary=z\n\n"
+        "--z\n"
+        "Content-Type: text/plain; charset=utf-16\n"
+        "Content-Transfer-Encoding: base64\n\n"
+        f"{encoded}"
+        "--z\n"
+        "Content-Type: text/html; charset=iso-8859-1\n"
+        "Content-Transfer-Encoding: quoted-printable\n\n"
+        "<a href=3D\"https://qp.example/r\">caf=E9</a>\n"
+        "--z--\n"
+    ).encode()
+    mail = parse_eml(io.BytesIO(raw))
+    # The base64 lines split the URL; it comes back whole
+    assert mail.links == [url, "https://qp.example/r"]
+    assert "café" in mail.body
+
+
+def test_malformed_boundaries_keep_what_can_be_read():
+    head = b"Subject: x\nContent-Type: multipart/mixed; boundary=b\n\n"
+    # Closing delimiter missing: the last part runs to the end of the message
+    unclosed = parse_eml(io.BytesIO(head + b"--b\nContent-Type: text/plain\n\nhttps://one.example/\n"))
+    assert unclosed.links == ["https://one.example/"]
+    # Boundary declared but never used, or not declared at all: the body is read as text
+    unused = parse_eml(io.BytesIO(head + b"no parts https://two.example/\n"))
+    assert unused.links == ["https://two.example/"]
+    undeclared = parse_eml(io.BytesIO(b"Subject: x\nContent-Type: multipart/mixed\n\nhttps://three.example/\n"))
+    assert undeclared.links == ["https://three.example/"]
+    assert (unclosed.error, unused.error, undeclared.error) == (None, None, None)
+
+
+def test_mbox_splits_messages_and_unescapes_from_lines():
+    archive = (
+        b"From alice@example.com Mon Jan  1 00:00:00 2024\n"
+        b"Subject: one\n\n"
+        b"body one\n>From the top\nFrom inside a paragraph is not a separator\n\n"
+        b"From bob@example.com Mon Jan  1 00:00:01 2024\n"
+        b"Subject: two\n\n"
+        b"body two\n"
+    )
+    mails = list(iter_mbox(io.BytesIO(archive)))
+    assert [m.subject for m in mails] == ["one", "two"]
+    assert "From the top" in mails[0].body
+    assert ">From" not in mails[0].body
+    assert "From inside a paragraph" in mails[0].body
+    assert mails[1].body.strip() == "body two"
+
+
+def test_malformed_charsets_fall_back_to_utf8():
+    for charset in ("utf-8\\x00", "no-such-charset"):
+        raw = _multipart(charset=charset).replace(b"\\x00", b"\x00")
+        mail = parse_eml(io.BytesIO(raw))
+        assert mail.error is None
+        assert "https://docs.example.com/a/very/long/path?id=42" in mail.links
+
+
+def test_broken_message_is_skipped_not_fatal(monkeypatch):
+    consume = mail_parser._consume_part
+
+    def fragile_consume(collector, part):
+        if part.get("Subject") == "boom":
+            raise RuntimeError("parser bug")
+        return consume(collector, part)
+
+    monkeypatch.setattr(mail_parser, "_consume_part", fragile_consume)
+    archive = b"".join(
+        b"From x@example.com Mon Jan  1 00:00:00 2024\nSubject: %s\n\nbody of %s\n\n" % (s, s)
+        for s in (b"first", b"boom", b"last")
+    )
+    mails = list(iter_mail(io.BytesIO(archive), "mbox"))
+    assert [m.subject for m in mails] == ["first", "", "last"]
+    assert mails[1].error == "RuntimeError: parser bug"
+
+    stats = asyncio.run(ingest_mailbox(
+        1, iter_mail(io.BytesIO(archive), "mbox"),
+        analyzer=EmailBatchAnalyzer(workers=0), campaigns=CampaignTracker()
+    ))
+    assert (stats["messages"], stats["malformed"], stats["detected"]) == (3, 1, 0)
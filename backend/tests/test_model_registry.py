@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.model_registry import ModelRegistry
+
+
+def test_cancelled_caller_does_not_fail_shared_fit():
+    registry = ModelRegistry(workers=1)
+    release = threading.Event()
+    fits = []
+
+    def fit():
+        fits.append(1)
+        release.wait(5)
+        return "model"
+
+    async def go():
+        first = asyncio.create_task(registry.get_or_fit("alice", 1, fit))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(registry.get_or_fit("alice", 1, fit))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    try:
+        assert asyncio.run(go()) == "model"
+    finally:
+        registry.shutdown()
+    assert len(fits) == 1
+    assert registry._entries["alice"].model == "model"
+    assert not registry._inflight
+
+
+def test_fit_error_reaches_every_waiter():
+    registry = ModelRegistry(workers=1)
+    release = threading.Event()
+
+    def fit():
+        release.wait(5)
+        raise ValueError("not enough samples")
+
+    async def go():
+        waiters = [asyncio.create_task(registry.get_or_fit("bob", 1, fit)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    try:
+        results = asyncio.run(go())
+    finally:
+        registry.shutdown()
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not registry._inflight
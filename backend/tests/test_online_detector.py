@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+from app.services.anomaly import DETECTOR_STREAMING, AnomalyService
+from app.services.online_detector import HourOfDaySketch, hour_sketch
+
+OFFICE_HOURS = [9.0, 9.5, 10.25, 11.0, 13.5, 14.0, 15.75, 16.5, 17.0] * 6
+
+
+def test_update_many_matches_one_update_per_login():
+    sketch = HourOfDaySketch(half_life=7.0)
+    start = sketch.seed([8.0, 12.5])
+    hours = [23.75, 0.5, 9.0, 9.0, 17.25, 3.9]
+
+    sequential = start
+    for hour in hours:
+        sequential = sketch.update(sequential, hour)
+    bulk = sketch.update_many(start, hours)
+
+    assert bulk["n"] == sequential["n"] == 8
+    assert np.allclose(bulk["hist"], sequential["hist"])
+    assert sketch.update_many(start, []) == start
+
+
+def test_logins_split_between_neighbouring_bins_and_wrap_midnight():
+    state = HourOfDaySketch(half_life=1e9).update(None, 23.75)
+    assert state["hist"][23] == 0.25
+    assert state["hist"][0] == 0.75
+    assert sum(state["hist"]) == 1.0
+
+
+def test_old_logins_decay_by_half_life():
+    sketch = HourOfDaySketch(half_life=10.0)
+    state = sketch.update(None, 3.0)
+    state = sketch.update_many(state, [15.0] * 10)
+    assert abs(state["hist"][3] - 0.5) < 1e-9
+
+
+def test_habitual_hours_are_normal_and_night_logins_are_not():
+    state = hour_sketch.seed(OFFICE_HOURS)
+    assert hour_sketch.score(state, 10.0) == (False, 10.0)
+    assert hour_sketch.score(state, 16.0) == (False, 10.0)
+    is_anomaly, score = hour_sketch.score(state, 3.0)
+    assert is_anomaly and 50.0 <= score <= 100.0
+    # Density is smooth: an hour next to the habitual ones scores no worse than one far away
+    assert hour_sketch.relative_density(state, 8.0) > hour_sketch.relative_density(state, 3.0)
+
+
+def test_score_many_matches_score():
+    states = [hour_sketch.seed(OFFICE_HOURS), hour_sketch.seed([22.0, 23.5, 0.25] * 4), hour_sketch.new_state()]
+    rows = np.array([0, 0, 1, 1, 2, 0])
+    hours = np.array([10.0, 3.0, 23.0, 12.0, 5.5, 24.5])
+    is_anomaly, scores = hour_sketch.score_many(hour_sketch.bin_probabilities(states), rows, hours)
+    expected = [hour_sketch.score(states[r], h) for r, h in zip(rows, hours)]
+    assert is_anomaly.tolist() == [e[0] for e in expected]
+    assert np.allclose(scores, [e[1] for e in expected])
+    # An empty sketch is uniform, never anomalous
+    assert abs(hour_sketch.relative_density(hour_sketch.new_state(), 5.5) - 1.0) < 1e-9
+
+
+def test_streaming_detector_learns_and_flags_per_login(session_factory):
+    async def go():
+        async with session_factory() as db:
+            service = AnomalyService(db)
+            for i, hour in enumerate(OFFICE_HOURS[:20]):
+                await service.update_login_baseline(
+                    1, 5, datetime(2025, 1, 1 + i % 28, int(hour), int(hour % 1 * 60)), "10.1.2.3"
+                )
+            day = await service.analyze_and_learn(1, 5, datetime(2025, 2, 1, 10, 15), "10.1.2.9",
+                                                  detector=DETECTOR_STREAMING)
+            night = await service.analyze_and_learn(1, 5, datetime(2025, 2, 2, 3, 0), "10.1.2.9",
+                                                    detector=DETECTOR_STREAMING)
+            return day, night
+
+    day, night = asyncio.run(go())
+    assert not day["is_anomaly"]
+    assert night["is_anomaly"] and night["reason"].startswith("Unusual Login Time (3:00)")
@@ -0,0 +1,27 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_current_user
+from app.api.v1.endpoints import orgs
+from app.core.hashing import HashingBusy, password_hasher
+from app.db.session import get_db
+from app.models.user import User
+
+
+def test_invite_sheds_load_when_hashing_is_busy(session_factory, monkeypatch):
+    async def db():
+        async with session_factory() as session:
+            yield session
+
+    async def busy(password):
+        raise HashingBusy(3)
+
+    app = FastAPI()
+    app.include_router(orgs.router, prefix="/orgs")
+    app.dependency_overrides[get_db] = db
+    app.dependency_overrides[get_current_user] = lambda: User(id=1, organization_id=1, role="org_admin")
+    monkeypatch.setattr(password_hasher, "hash", busy)
+
+    response = TestClient(app).post("/orgs/invite", params={"email": "new@example.com"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
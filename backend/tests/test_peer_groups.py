@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+
+from app.services.anomaly import peer_score_logins
+from app.services.baseline_codec import LoginBaseline
+from app.services.peer_groups import CohortStats, peer_vector
+
+
+def office_hours_cohort(size=30, seed=3):
+    rng = random.Random(seed)
+    members = []
+    for i in range(size):
+        baseline = LoginBaseline()
+        for _ in range(rng.randint(10, 40)):
+            baseline.add_login(rng.uniform(8, 18), f"10.0.{rng.randint(0, 3)}.{rng.randint(1, 200)}")
+        members.append((str(i), peer_vector(baseline), frozenset(baseline.prefixes)))
+    return members
+
+
+def thin_baseline(hours, ip="10.0.1.5"):
+    baseline = LoginBaseline()
+    for hour in hours:
+        baseline.add_login(hour, ip)
+    return baseline
+
+
+def test_incremental_updates_match_a_full_build():
+    members = office_hours_cohort()
+    built = CohortStats.build(members)
+    incremental = CohortStats()
+    for entity_id, vector, prefixes in members:
+        incremental.upsert(entity_id, np.zeros_like(vector), frozenset())
+        incremental.upsert(entity_id, vector, prefixes)
+
+    assert np.allclose(built.mean(), incremental.mean())
+    assert np.allclose(built.std(), incremental.std())
+    assert built.prefix_users == incremental.prefix_users
+
+
+def test_logins_like_the_cohort_are_not_flagged():
+    cohort = CohortStats.build(office_hours_cohort())
+    baselines = [thin_baseline([]), thin_baseline([9.5]), thin_baseline([9, 11, 15]), thin_baseline([9, 10, 11, 16])]
+    results = peer_score_logins(cohort, baselines, np.array([10.0, 14.0, 10.5, 13.0]), ["10.0.1.5"] * 4)
+    assert [r["is_anomaly"] for r in results] == [False] * 4
+    assert all(r["score"] == 0.0 and r["peer_distance"] < 2.0 for r in results)
+
+
+def test_far_from_cohort_vector_is_flagged():
+    cohort = CohortStats.build(office_hours_cohort())
+    baselines = [thin_baseline([]), thin_baseline([2, 3, 2.5, 3]), thin_baseline([9, 11])]
+    results = peer_score_logins(cohort, baselines, np.array([3.0, 3.0, 20.0]), ["10.0.1.5"] * 3)
+    for result in results:
+        assert result["is_anomaly"]
+        assert result["peer_distance"] >= 2.0
+        assert 50.0 <= result["score"] <= 100.0
+        assert result["reason"].startswith("Unusual Login Pattern for Peer Group")
+    # Further from the cohort scores higher
+    assert results[0]["score"] > results[2]["score"]
+
+
+def test_network_unknown_to_the_cohort_is_flagged():
+    cohort = CohortStats.build(office_hours_cohort())
+    result = peer_score_logins(cohort, [thin_baseline([10])], np.array([11.0]), ["203.0.113.9"])[0]
+    assert result["is_anomaly"]
+    assert result["reason"] == "New IP Address (Peer Group)"
+    assert result["score"] == 60.0
@@ -0,0 +1,77 @@
+import asyncio
+
+from sqlalchemy import select, update
+
+from app.core.principal_cache import PrincipalCache, principal_cache
+from app.models.user import User
+
+
+def _seed(session_factory):
+    async def go():
+        async with session_factory() as db:
+            user = User(id=5, email="eve@example.com", hashed_password="x", organization_id=1,
+                        role="org_admin", is_active=True)
+            db.add(user)
+            await db.commit()
+            return user
+
+    user = asyncio.run(go())
+    principal_cache.clear()
+    principal_cache.put("token", {}, user)
+    return user
+
+
+def test_user_change_invalidates_after_commit_not_at_flush(session_factory):
+    _seed(session_factory)
+
+    async def go():
+        async with session_factory() as db:
+            user = (await db.execute(select(User).where(User.id == 5))).scalars().one()
+            user.is_active = False
+            await db.flush()
+            cached_after_flush = principal_cache.get("token") is not None
+            await db.commit()
+            return cached_after_flush
+
+    assert asyncio.run(go()) is True
+    assert principal_cache.get("token") is None
+
+
+def test_rolled_back_change_keeps_entry(session_factory):
+    _seed(session_factory)
+
+    async def go():
+        async with session_factory() as db:
+            user = (await db.execute(select(User).where(User.id == 5))).scalars().one()
+            user.role = "employee"
+            await db.flush()
+            await db.rollback()
+
+    asyncio.run(go())
+    assert principal_cache.get("token") is not None
+
+
+def test_bulk_update_invalidates_after_commit(session_factory):
+    _seed(session_factory)
+
+    async def go():
+        async with session_factory() as db:
+            await db.execute(update(User).where(User.id == 5).values(role="employee"))
+            cached_before_commit = principal_cache.get("token") is not None
+            await db.commit()
+            return cached_before_commit
+
+    assert asyncio.run(go()) is True
+    assert principal_cache.get("token") is None
+
+
+def test_put_read_before_invalidation_is_not_cached():
+    cache = PrincipalCache()
+    user = User(id=9, email="mallory@example.com", organization_id=1, role="employee", is_active=True)
+    generation = cache.generation
+    cache.invalidate_user(9)
+    principal = cache.put("token", {}, user, generation)
+    assert principal.user_id == 9
+    assert cache.get("token") is None
+    cache.put("token", {}, user, cache.generation)
+    assert cache.get("token") is not None
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from sqlalchemy.future import select
+
+from app.models.behavior import BehavioralProfile
+from app.models.user import User
+from app.services import risk
+from app.services.risk import RiskEngine
+from app.services.threat import DEFAULT_INDICATOR_CONFIDENCE
+from app.services.threat_index import ThreatIndicatorIndex
+
+USER = User(id=3, organization_id=1, email="carol@example.com")
+ANOMALY = {"is_anomaly": True, "score": 50.0, "confidence": 0.8, "reason": "Unusual Login Time (3:00)"}
+DEVICE = {"is_known": False, "risk_score": 20.0}
+
+
+def empty_index(monkeypatch):
+    index = ThreatIndicatorIndex()
+    index.loaded = True
+    monkeypatch.setattr(risk, "threat_index", index)
+    return index
+
+
+def test_factor_missing_its_budget_is_reported_unavailable(monkeypatch):
+    empty_index(monkeypatch)
+    engine = RiskEngine(None, session_factory=None, budgets={"geo": 0.05})
+
+    async def slow_geo(ip_address, features=None):
+        await asyncio.sleep(5)
+        return 30.0, "Tor Exit Node (30 pts)"
+
+    monkeypatch.setattr(engine, "_geo_factor", slow_geo)
+    start = time.perf_counter()
+    result = asyncio.run(engine.calculate_risk(USER, "10.0.0.1", device_result=DEVICE, anomaly_result=ANOMALY))
+
+    assert time.perf_counter() - start < 1.0
+    assert result["unavailable"] == ["geo"]
+    assert result["factor_details"]["geo"]["status"] == "unavailable"
+    assert result["total_score"] == 60
+    assert result["factors"] == ["Behavioral Anomaly (40 pts): Unusual Login Time (3:00)", "Device Risk (20 pts)"]
+
+
+def test_failing_factor_does_not_fail_the_assessment(monkeypatch):
+    empty_index(monkeypatch)
+    engine = RiskEngine(None, session_factory=None)
+
+    async def broken(ip_address, features=None):
+        raise RuntimeError("geo database missing")
+
+    monkeypatch.setattr(engine, "_geo_factor", broken)
+    result = asyncio.run(engine.calculate_risk(USER, "10.0.0.1", device_result=DEVICE, anomaly_result=ANOMALY))
+    assert result["unavailable"] == ["geo"]
+    assert result["total_score"] == 60
+
+
+def test_threat_intel_reads_the_shared_index(monkeypatch):
+    index = empty_index(monkeypatch)
+    index.add("203.0.113.7", "IP", "feed", "Botnet C2", confidence=DEFAULT_INDICATOR_CONFIDENCE)
+
+    def no_service(db):
+        raise AssertionError("ThreatIntelService built per call")
+
+    monkeypatch.setattr(risk, "ThreatIntelService", no_service)
+    engine = RiskEngine(None, session_factory=None)
+    result = asyncio.run(engine.calculate_risk(USER, "203.0.113.7", anomaly_result={"score": 0}))
+    assert result["factor_details"]["threat_intel"]["status"] == "ok"
+    assert result["total_score"] == 50
+    assert result["factors"] == ["Threat Intelligence Match (50 pts): Botnet C2"]
+
+
+def test_anomaly_factor_without_a_result_writes_nothing(session_factory, monkeypatch):
+    empty_index(monkeypatch)
+
+    async def no_writes(*args, **kwargs):
+        raise AssertionError("risk scoring queued an anomaly event")
+
+    monkeypatch.setattr(risk.AnomalyService, "get_or_create_profile", no_writes)
+    monkeypatch.setattr("app.services.anomaly.event_sink.put", no_writes)
+    engine = RiskEngine(None, session_factory=session_factory, budgets={"anomaly": 5.0})
+    result = asyncio.run(engine.calculate_risk(USER, "10.0.0.1"))
+
+    assert result["factor_details"]["anomaly"]["status"] == "ok"
+
+    async def profiles():
+        async with session_factory() as db:
+            return (await db.execute(select(BehavioralProfile))).scalars().all()
+
+    assert asyncio.run(profiles()) == []
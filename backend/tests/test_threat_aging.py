@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.future import select
+
+from app.models.threat import ThreatIndicator, ThreatIndicatorArchive
+from app.services.threat_aging import IndicatorSweeper, expires_at, row_epochs, source_ttl
+from app.services.threat_index import ThreatIndicatorIndex
+from app.services.timestamps import to_epoch
+
+
+def test_source_ttl_and_row_epochs(monkeypatch):
+    from app.services import threat_aging
+    monkeypatch.setattr(threat_aging.settings, "THREAT_SOURCE_TTL_DAYS", {"noisy": 1.0})
+    monkeypatch.setattr(threat_aging.settings, "THREAT_INDICATOR_TTL_DAYS", 30.0)
+    seen = datetime(2025, 1, 1)
+
+    assert source_ttl("noisy") == timedelta(days=1)
+    assert source_ttl(None) == timedelta(days=30)
+    assert expires_at("noisy", seen) == datetime(2025, 1, 2)
+    # Rows without expires_at age from last_updated with the default TTL
+    assert row_epochs(seen, None) == (to_epoch(seen), to_epoch(seen) + 30 * 86400.0)
+    assert row_epochs(seen, datetime(2025, 1, 2)) == (to_epoch(seen), to_epoch(datetime(2025, 1, 2)))
+
+
+def _seed(session_factory, rows):
+    async def go():
+        async with session_factory() as db:
+            db.add_all(rows)
+            await db.commit()
+    asyncio.run(go())
+
+
+def _values(session_factory, model):
+    async def go():
+        async with session_factory() as db:
+            return sorted((await db.execute(select(model.indicator_value))).scalars().all())
+    return asyncio.run(go())
+
+
+def test_sweep_removes_expired_rows_in_batches_and_archives(session_factory):
+    now = datetime.utcnow()
+    _seed(session_factory, [
+        ThreatIndicator(indicator_value=f"203.0.113.{i}", indicator_type="IP", source="feed",
+                        last_updated=now - timedelta(days=2), expires_at=now - timedelta(days=1))
+        for i in range(5)
+    ] + [
+        ThreatIndicator(indicator_value="198.51.100.1", indicator_type="IP", source="feed",
+                        last_updated=now, expires_at=now + timedelta(days=1)),
+        # No expires_at: ages from last_updated with the default TTL
+        ThreatIndicator(indicator_value="198.51.100.2", indicator_type="IP", source="feed",
+                        last_updated=now - timedelta(days=365)),
+    ])
+    index = ThreatIndicatorIndex()
+    for i in range(5):
+        index.add(f"203.0.113.{i}", "IP", "feed", expires_at=to_epoch(now - timedelta(days=1)))
+    sweeper = IndicatorSweeper(session_factory, index, batch_size=2, archive=True)
+
+    stats = asyncio.run(sweeper.sweep(now))
+    assert (stats["removed"], stats["archived"], stats["batches"]) == (6, 6, 3)
+    assert _values(session_factory, ThreatIndicator) == ["198.51.100.1"]
+    assert len(_values(session_factory, ThreatIndicatorArchive)) == 6
+    assert len(index) == 0
+
+
+def test_sweep_keeps_index_entry_reingested_after_the_delete(session_factory):
+    now = datetime.utcnow()
+    _seed(session_factory, [
+        ThreatIndicator(indicator_value="203.0.113.7", indicator_type="IP", source="feed",
+                        last_updated=now - timedelta(days=2), expires_at=now - timedelta(days=1)),
+    ])
+    index = ThreatIndicatorIndex()
+    # A concurrent ingest re-reported the indicator and indexed it with a fresh expiry
+    index.add("203.0.113.7", "IP", "feed", expires_at=to_epoch(now + timedelta(days=30)))
+
+    stats = asyncio.run(IndicatorSweeper(session_factory, index).sweep(now))
+    assert stats["removed"] == 1
+    assert index.match_ip("203.0.113.7") is not None
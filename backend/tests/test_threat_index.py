@@ -0,0 +1,88 @@
+import asyncio
+import math
+from datetime import datetime, timedelta
+
+from app.models.threat import ThreatIndicator
+from app.services.threat_index import ThreatIndicatorIndex
+
+NOW = 1_000_000.0
+
+
+def test_lookups_by_kind():
+    index = ThreatIndicatorIndex()
+    index.add("203.0.113.7", "IP", "feed", "C2")
+    index.add("198.51.100.0/24", "CIDR", "feed", "Bulletproof hosting")
+    index.add("*.Evil.example.", "DOMAIN", "feed", "Phishing kit")
+    index.add("ABCDEF0123", "SHA256", "feed", "Dropper")
+    index.add("https://x.test/login", "URL", "feed", "Phishing page")
+    index.add("not-an-ip", "IP", "feed")
+
+    assert index.match_ip("203.0.113.7").description == "C2"
+    assert index.match_ip("::ffff:203.0.113.7").description == "C2"
+    assert index.match_ip("198.51.100.42").description == "Bulletproof hosting"
+    assert index.match_ip("192.0.2.1") is None
+    assert index.match_domain("login.EVIL.example").description == "Phishing kit"
+    assert index.match_domain("notevil.example") is None
+    assert index.match_hash("abcdef0123").description == "Dropper"
+    assert index.match("https://x.test/login").description == "Phishing page"
+    assert index.match("198.51.100.1").description == "Bulletproof hosting"
+    assert len(index) == 5
+
+
+def test_update_keeps_confidence_and_description_unless_given():
+    index = ThreatIndicatorIndex()
+    index.add("203.0.113.7", "IP", "feed-a", "C2", confidence=90.0)
+    index.add("203.0.113.7", "IP", "feed-b")
+    match = index.match_ip("203.0.113.7")
+    assert (match.source, match.description, match.confidence) == ("feed-b", "C2", 90.0)
+    assert index.remove("203.0.113.7", "IP")
+    assert index.match_ip("203.0.113.7") is None
+
+
+def test_expired_entries_never_match_and_confidence_decays():
+    index = ThreatIndicatorIndex()
+    index.add("203.0.113.7", "IP", "feed", confidence=80.0, seen_at=NOW, expires_at=NOW + 100)
+    match = index.match_ip("203.0.113.7", NOW + 50)
+    assert math.isclose(match.confidence_at(NOW + 50), 40.0)
+    assert index.match_ip("203.0.113.7", NOW + 100) is None
+
+
+def test_expired_exact_ip_falls_through_to_live_range():
+    index = ThreatIndicatorIndex()
+    index.add("10.0.0.0/8", "CIDR", "feed", "wide")
+    index.add("10.1.0.0/16", "CIDR", "feed", "narrow", seen_at=NOW, expires_at=NOW + 10)
+    index.add("10.1.2.3", "IP", "feed", "host", seen_at=NOW, expires_at=NOW + 10)
+
+    assert index.match_ip("10.1.2.3", NOW).description == "host"
+    assert index.match_ip("10.1.2.3", NOW + 20).description == "wide"
+
+
+def test_expired_subdomain_falls_through_to_live_parent():
+    index = ThreatIndicatorIndex()
+    index.add("evil.example", "DOMAIN", "feed", "parent")
+    index.add("cdn.evil.example", "DOMAIN", "feed", "child", seen_at=NOW, expires_at=NOW + 10)
+
+    assert index.match_domain("a.cdn.evil.example", NOW).description == "child"
+    assert index.match_domain("a.cdn.evil.example", NOW + 20).description == "parent"
+
+
+def test_load_builds_from_unexpired_rows(session_factory):
+    async def go():
+        now = datetime.utcnow()
+        async with session_factory() as db:
+            db.add_all([
+                ThreatIndicator(indicator_value="203.0.113.7", indicator_type="IP", source="feed",
+                                confidence=70.0, last_updated=now, expires_at=now + timedelta(days=1)),
+                ThreatIndicator(indicator_value="203.0.113.8", indicator_type="IP", source="feed",
+                                confidence=70.0, last_updated=now, expires_at=now - timedelta(days=1)),
+            ])
+            await db.commit()
+        index = ThreatIndicatorIndex()
+        async with session_factory() as db:
+            await index.load(db)
+        return index
+
+    index = asyncio.run(go())
+    assert index.loaded
+    assert index.match_ip("203.0.113.7").confidence == 70.0
+    assert index.match_ip("203.0.113.8") is None
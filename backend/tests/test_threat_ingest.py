@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.future import select
+
+from app.models.threat import ThreatIndicator
+from app.services import threat
+from app.services.threat import ThreatIntelService
+from app.services.threat_index import ThreatIndicatorIndex
+
+
+def _ingest(session_factory, source, indicators):
+    async def go():
+        async with session_factory() as db:
+            return await ThreatIntelService(db).ingest_feed(source, indicators)
+    return asyncio.run(go())
+
+
+def _rows(session_factory):
+    async def go():
+        async with session_factory() as db:
+            rows = (await db.execute(select(ThreatIndicator).order_by(ThreatIndicator.indicator_value))).scalars()
+            return {row.indicator_value: row for row in rows}
+    return asyncio.run(go())
+
+
+def test_reingest_refreshes_source_and_expiry_but_keeps_stored_fields(session_factory, monkeypatch):
+    index = ThreatIndicatorIndex()
+    monkeypatch.setattr(threat, "threat_index", index)
+    stats = _ingest(session_factory, "feed-a", [
+        {"value": "evil.example", "type": "DOMAIN", "desc": "Phishing kit"},
+        {"value": "203.0.113.9", "type": "IP", "desc": "Scanner"},
+    ])
+    assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (2, 0, 0)
+    before = _rows(session_factory)
+
+    stats = _ingest(session_factory, "feed-b", [
+        # Conflicts: a different type and description must not overwrite the stored ones
+        {"value": "evil.example", "type": "URL", "desc": "Something else"},
+        {"value": "203.0.113.9", "type": "IP"},
+        {"value": "198.51.100.7", "type": "IP", "desc": "New"},
+    ])
+    assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (1, 2, 0)
+    after = _rows(session_factory)
+
+    domain = after["evil.example"]
+    assert (domain.indicator_type, domain.description, domain.source) == ("DOMAIN", "Phishing kit", "feed-b")
+    assert (after["203.0.113.9"].description, after["203.0.113.9"].source) == ("Scanner", "feed-b")
+    assert after["198.51.100.7"].description == "New"
+    assert domain.expires_at > before["evil.example"].expires_at
+    assert domain.expires_at > datetime.utcnow() + timedelta(days=1)
+
+    # The in-memory index mirrors the rows: still a domain (so subdomains match), same description
+    match = index.match_domain("login.evil.example")
+    assert (match.source, match.description) == ("feed-b", "Phishing kit")
+    assert index.match_ip("203.0.113.9").description == "Scanner"
+
+    # Same source again: refreshed, but nothing changed
+    stats = _ingest(session_factory, "feed-b", [{"value": "203.0.113.9", "type": "IP"}])
+    assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (0, 0, 1)
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.v1.deps_subscription import check_subscription_active
+from app.api.v1.endpoints import web
+
+EVENT = {"url": "/login", "method": "POST", "user_agent": "curl", "ip": "10.0.0.1"}
+
+
+def _status(raw: bytes, content_type: str = "application/json") -> int:
+    with pytest.raises(HTTPException) as exc:
+        web._parse_web_batch(raw, content_type)
+    return exc.value.status_code
+
+
+def test_json_array_and_ndjson_parse():
+    assert len(web._parse_web_batch(json.dumps([EVENT, EVENT]).encode(), "application/json")) == 2
+    ndjson = "\n".join(json.dumps(EVENT) for _ in range(3)).encode()
+    assert len(web._parse_web_batch(ndjson, "application/x-ndjson")) == 3
+
+
+def test_non_utf8_body_is_a_client_error():
+    assert _status(b"[\xff\xfe]") == 400
+    assert _status(b"\xff\n", "application/x-ndjson") == 400
+
+
+def test_limits_apply_before_parsing(monkeypatch):
+    monkeypatch.setattr(web, "MAX_WEB_BATCH", 2)
+    # Lines are counted before any is decoded: the bad third line is never parsed
+    assert _status(f"{json.dumps(EVENT)}\n{json.dumps(EVENT)}\nnot json\n".encode(), "application/x-ndjson") == 413
+    monkeypatch.setattr(web, "MAX_WEB_BATCH_BYTES", 16)
+    assert _status(json.dumps([EVENT]).encode()) == 413
+
+
+def test_endpoint_rejects_declared_oversize_and_bad_encoding(monkeypatch):
+    app = FastAPI()
+    app.include_router(web.router, prefix="/monitor")
+    app.dependency_overrides[check_subscription_active] = lambda: type("Org", (), {"id": 1})()
+    client = TestClient(app)
+
+    assert client.post("/monitor/log/web/batch", content=b"[\xff]",
+                       headers={"content-type": "application/json"}).status_code == 400
+    monkeypatch.setattr(web, "MAX_WEB_BATCH_BYTES", 8)
+    assert client.post("/monitor/log/web/batch", content=json.dumps([EVENT]).encode(),
+                       headers={"content-type": "application/json"}).status_code == 413